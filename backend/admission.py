@@ -0,0 +1,232 @@
+"""Admission control for expensive endpoints.
+
+Each limited route (keyed by method and path template, e.g.
+`POST /api/fica-calculation/{owner_id}`) gets a `RouteLimiter` that allows a
+fixed number of requests to run at once and queues a bounded number more.
+A request arriving to a full queue, or one that waits longer than the queue
+timeout, is answered straight away with `503` and `Retry-After` instead of
+piling onto the database pool. A limiter can also give each owner (the
+route's `owner_id` path parameter) a token bucket, so one tenant's burst is
+answered with `429` before it takes the slots every other tenant shares.
+
+Routes without a limit, lead capture among them, are not touched. How long
+an admitted request queued is reported in its `Server-Timing` header and in
+the `admission_queue_wait_seconds` histogram; rejections are counted in
+`admission_rejected_total` by reason.
+
+Limits come from `DEFAULT_LIMITS`, overridden per route by the JSON object in
+`ADMISSION_LIMITS`, e.g. `{"GET /api/leads": {"concurrency": 32}}` (a route
+mapped to null is left unlimited), and `ADMISSION_CONTROL=false` turns the
+whole thing off.
+"""
+import asyncio
+import json
+import math
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from starlette.responses import JSONResponse
+
+from metrics import ADMISSION_QUEUE_WAIT, ADMISSION_REJECTED, match_route, track_admission
+
+SERVER_TIMING_HEADER = b"server-timing"
+OWNER_PARAM = "owner_id"
+# Idle owners' buckets are full again, so forgetting the least recently seen is safe
+MAX_TRACKED_OWNERS = 10000
+
+DEFAULT_QUEUE_TIMEOUT_SECONDS = float(os.environ.get('ADMISSION_QUEUE_TIMEOUT_SECONDS', '5'))
+DEFAULT_RETRY_AFTER_SECONDS = int(os.environ.get('ADMISSION_RETRY_AFTER_SECONDS', '1'))
+
+DEFAULT_LIMITS: Dict[str, Dict[str, Any]] = {
+    "POST /api/fica-calculation/{owner_id}": {
+        "concurrency": 8, "queue_depth": 32, "owner_rate": 5, "owner_burst": 20,
+    },
+    "POST /api/fica-calculation/{owner_id}/scenarios": {
+        "concurrency": 4, "queue_depth": 16, "owner_rate": 2, "owner_burst": 10,
+    },
+    "GET /api/fica-calculation/history/{owner_id}": {
+        "concurrency": 16, "queue_depth": 64, "owner_rate": 10, "owner_burst": 40,
+    },
+    "GET /api/employees/business/{owner_id}": {
+        "concurrency": 16, "queue_depth": 64, "owner_rate": 10, "owner_burst": 40,
+    },
+    "GET /api/leads": {"concurrency": 16, "queue_depth": 64},
+    "GET /api/business-owners": {"concurrency": 16, "queue_depth": 64},
+    "GET /api/eligibility": {"concurrency": 16, "queue_depth": 64},
+}
+
+
+class Rejected(Exception):
+    """A request turned away by admission control"""
+
+    def __init__(self, status_code: int, reason: str, detail: str, retry_after: int):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.reason = reason
+        self.detail = detail
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """`rate` requests per second on average, with bursts of up to `burst`"""
+
+    def __init__(self, rate: float, burst: float, now: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = now
+
+    def take(self, now: float) -> float:
+        """Spend a token; returns 0 on success, else the seconds until one is available"""
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def refund(self):
+        """Give back a token spent on a request that was never admitted"""
+        self.tokens = min(self.burst, self.tokens + 1)
+
+
+class RouteLimiter:
+    def __init__(
+        self,
+        name: str,
+        concurrency: int,
+        queue_depth: int,
+        queue_timeout: float = DEFAULT_QUEUE_TIMEOUT_SECONDS,
+        owner_rate: Optional[float] = None,
+        owner_burst: Optional[float] = None,
+        retry_after: int = DEFAULT_RETRY_AFTER_SECONDS,
+    ):
+        self.name = name
+        self.concurrency = concurrency
+        self.queue_depth = queue_depth
+        self.queue_timeout = queue_timeout
+        self.owner_rate = owner_rate
+        self.owner_burst = owner_burst or max(1.0, owner_rate or 0)
+        self.retry_after = retry_after
+        self.in_flight = 0
+        self.queued = 0
+        self._slots = asyncio.Semaphore(concurrency)
+        self._buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+
+    def check_owner(self, owner_id: Optional[str]):
+        """Raise Rejected (429) if `owner_id` has used up its share of this route"""
+        if not self.owner_rate or owner_id is None:
+            return
+        now = time.monotonic()
+        bucket = self._buckets.get(owner_id)
+        if bucket is None:
+            bucket = self._buckets[owner_id] = TokenBucket(self.owner_rate, self.owner_burst, now)
+            if len(self._buckets) > MAX_TRACKED_OWNERS:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(owner_id)
+        wait = bucket.take(now)
+        if wait:
+            raise Rejected(429, "owner_rate", "Too many requests for this business owner, please retry",
+                           max(1, math.ceil(wait)))
+
+    def refund_owner(self, owner_id: Optional[str]):
+        """Return the token `check_owner` took when the request is then turned away for capacity"""
+        bucket = self._buckets.get(owner_id) if owner_id is not None else None
+        if bucket is not None:
+            bucket.refund()
+
+    async def acquire(self) -> float:
+        """Take a concurrency slot, queueing if none is free; returns the seconds spent queued"""
+        if not self._slots.locked():
+            await self._slots.acquire()
+            self.in_flight += 1
+            return 0.0
+        if self.queued >= self.queue_depth:
+            raise Rejected(503, "queue_full", "Server is busy, please retry", self.retry_after)
+
+        started = time.perf_counter()
+        self.queued += 1
+        try:
+            await asyncio.wait_for(self._slots.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            raise Rejected(503, "queue_timeout", "Server is busy, please retry", self.retry_after)
+        finally:
+            self.queued -= 1
+        self.in_flight += 1
+        return time.perf_counter() - started
+
+    def release(self):
+        self.in_flight -= 1
+        self._slots.release()
+
+
+def load_limits(raw: Optional[str] = None) -> Dict[str, Dict[str, Any]]:
+    """DEFAULT_LIMITS with the per-route overrides from `raw` (ADMISSION_LIMITS) applied"""
+    raw = raw if raw is not None else os.environ.get('ADMISSION_LIMITS', '')
+    limits = dict(DEFAULT_LIMITS)
+    for route, limit in (json.loads(raw) if raw.strip() else {}).items():
+        if limit is None:
+            limits.pop(route, None)
+        else:
+            limits[route] = {**limits.get(route, {}), **limit}
+    return limits
+
+
+class AdmissionMiddleware:
+    """ASGI middleware bounding concurrency, queueing and per-owner rate on limited routes"""
+
+    def __init__(self, app, limits: Optional[Dict[str, Dict[str, Any]]] = None, enabled: Optional[bool] = None):
+        self.app = app
+        if enabled is None:
+            enabled = os.environ.get('ADMISSION_CONTROL', 'true').lower() in ('1', 'true', 'yes')
+        limits = limits if limits is not None else load_limits()
+        self.limiters: Dict[str, RouteLimiter] = {}
+        if enabled:
+            for route, limit in limits.items():
+                limiter = self.limiters[route] = RouteLimiter(route, **limit)
+                track_admission(limiter)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.limiters:
+            await self.app(scope, receive, send)
+            return
+
+        template, path_params = match_route(scope)
+        limiter = self.limiters.get(f"{scope['method']} {template}")
+        if limiter is None:
+            await self.app(scope, receive, send)
+            return
+
+        owner_id = path_params.get(OWNER_PARAM)
+        try:
+            limiter.check_owner(owner_id)
+            try:
+                waited = await limiter.acquire()
+            except Rejected:
+                # A 503 is the server's doing, so it must not count against the owner's rate
+                limiter.refund_owner(owner_id)
+                raise
+        except Rejected as rejected:
+            ADMISSION_REJECTED.labels(limiter.name, rejected.reason).inc()
+            response = JSONResponse(
+                {"detail": rejected.detail}, status_code=rejected.status_code,
+                headers={"Retry-After": str(rejected.retry_after)},
+            )
+            await response(scope, receive, send)
+            return
+
+        ADMISSION_QUEUE_WAIT.labels(limiter.name).observe(waited)
+        timing = f"admission;dur={waited * 1000:.1f}".encode()
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", ())) + [(SERVER_TIMING_HEADER, timing)]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            limiter.release()
@@ -0,0 +1,51 @@
+"""Strong ETags and conditional GETs for polled read endpoints.
+
+A route derives its ETag from a version marker that the write paths bump (the
+benefit plan catalog's content hash, or an owner's counters in the
+`owner_versions` store) together with the request's query string and response
+variant, so the tag can be checked before any of the body is read or built.
+A request whose `If-None-Match` already names the current tag gets
+`304 Not Modified` with no body; anything else is built as usual and carries
+the tag. `Cache-Control: no-cache` makes browsers revalidate every poll
+rather than serve a stale copy.
+"""
+import hashlib
+from typing import Any, Awaitable, Callable
+
+from fastapi import Request
+from fastapi.responses import Response
+
+from pagination import wants_ndjson
+
+ETAG_HEADER = "ETag"
+CACHE_CONTROL = "no-cache"
+
+
+def make_etag(*parts: Any) -> str:
+    """A strong entity tag over `parts`"""
+    digest = hashlib.sha256("\x1f".join(str(part) for part in parts).encode()).hexdigest()
+    return f'"{digest[:32]}"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """Whether the request's If-None-Match names `etag` (GET uses the weak comparison)"""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    candidates = [candidate.strip() for candidate in header.split(",")]
+    return "*" in candidates or any(candidate.removeprefix("W/") == etag for candidate in candidates)
+
+
+async def conditional_get(request: Request, response: Response, version: str,
+                          build: Callable[[], Awaitable[Any]]):
+    """Answer 304 if the client holds the representation for `version`, else return `build()` tagged with it"""
+    etag = make_etag(version, request.url.path, request.url.query, "ndjson" if wants_ndjson(request) else "json")
+    headers = {ETAG_HEADER: etag, "Cache-Control": CACHE_CONTROL, "Vary": "Accept"}
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+
+    result = await build()
+    # Headers set on the injected response are dropped when the handler returns a Response itself
+    target = result if isinstance(result, Response) else response
+    target.headers.update(headers)
+    return result
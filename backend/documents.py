@@ -0,0 +1,72 @@
+"""Fast JSON responses built straight from stored documents.
+
+Every document in storage was produced by `Model(...).dict()`, so read
+routes don't need to rebuild a Pydantic model per row only for FastAPI to
+validate and encode it a second time through `response_model`. Instead the
+document is trimmed to the model's fields (filling defaults for fields added
+after it was written) and encoded with orjson. Routes keep their
+`response_model`, so the OpenAPI schema is unchanged.
+
+Set `VALIDATE_STORED_DOCUMENTS=1` to validate each document through its model
+before it is sent, e.g. while migrating stored data.
+"""
+import os
+from typing import Any, Dict, Iterable, Mapping, Optional, Type
+
+import orjson
+from fastapi.responses import Response
+from pydantic import BaseModel
+
+JSON_MEDIA_TYPE = "application/json"
+VALIDATE_STORED_DOCUMENTS = os.environ.get('VALIDATE_STORED_DOCUMENTS', '').lower() in ('1', 'true', 'yes')
+
+
+class DocumentShape:
+    """Trims a stored document to one model's fields, in the model's field order"""
+
+    def __init__(self, model: Type[BaseModel]):
+        self.model = model
+        self.fields = tuple(model.model_fields)
+        self.field_set = frozenset(self.fields)
+        self.defaults = {
+            name: field.default for name, field in model.model_fields.items()
+            if not field.is_required() and field.default_factory is None
+        }
+
+    def __call__(self, doc: Mapping[str, Any]) -> Dict[str, Any]:
+        if VALIDATE_STORED_DOCUMENTS:
+            return self.model(**doc).model_dump()
+        if doc.keys() == self.field_set:
+            return {name: doc[name] for name in self.fields}
+        return {
+            name: doc[name] if name in doc else self.defaults[name]
+            for name in self.fields if name in doc or name in self.defaults
+        }
+
+
+_shapes: Dict[Type[BaseModel], DocumentShape] = {}
+
+
+def shape_for(model: Type[BaseModel]) -> DocumentShape:
+    shape = _shapes.get(model)
+    if shape is None:
+        shape = _shapes[model] = DocumentShape(model)
+    return shape
+
+
+def dumps(content: Any) -> bytes:
+    return orjson.dumps(content)
+
+
+def document_response(doc: Mapping[str, Any], model: Type[BaseModel], status_code: int = 200,
+                      headers: Optional[Mapping[str, str]] = None) -> Response:
+    """Serialize one stored document as `model` without building the model"""
+    return Response(dumps(shape_for(model)(doc)), status_code=status_code, headers=headers,
+                    media_type=JSON_MEDIA_TYPE)
+
+
+def documents_response(docs: Iterable[Mapping[str, Any]], model: Type[BaseModel],
+                       headers: Optional[Mapping[str, str]] = None) -> Response:
+    """Serialize stored documents as a JSON array of `model`"""
+    shape = shape_for(model)
+    return Response(dumps([shape(doc) for doc in docs]), headers=headers, media_type=JSON_MEDIA_TYPE)
@@ -0,0 +1,79 @@
+"""Eligibility rules for the FICA reduction program.
+
+The rules are data: each `EligibilityRule` checks one fact about a business
+owner (its roster size, years in business or industry) and carries the reason
+reported when the check fails. `evaluate` applies the whole set to one owner's
+facts, and the same call backs the single-owner check, the bulk evaluation
+job and the refresh after an owner's roster changes, so the stored results
+cannot drift from what the check endpoint reports.
+"""
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Tuple
+
+# Bump when a rule changes, so stored results can be told apart from current ones
+RULES_VERSION = 1
+
+ALL_CRITERIA_MET = "All eligibility criteria met"
+MIN_EMPLOYEES = 2
+MIN_YEARS_IN_BUSINESS = 1
+# Compared by equality, which str enums from the memory backend also satisfy
+RESTRICTED_INDUSTRIES = ("other",)
+
+Facts = Dict[str, Any]
+
+# Owner fields the rules read; the headcount comes from the owner's roster rollup
+OWNER_FIELDS = ["id", "created_at", "business_name", "industry", "years_in_business"]
+
+
+class EligibilityRule:
+    def __init__(self, name: str, reason: str, check: Callable[[Facts], bool]):
+        self.name = name
+        self.reason = reason
+        self.check = check
+
+
+RULES: Tuple[EligibilityRule, ...] = (
+    EligibilityRule(
+        "min_employees",
+        f"Business must have at least {MIN_EMPLOYEES} employees",
+        lambda facts: facts["employee_count"] >= MIN_EMPLOYEES,
+    ),
+    EligibilityRule(
+        "min_years_in_business",
+        f"Business must be operating for at least {MIN_YEARS_IN_BUSINESS} year",
+        lambda facts: facts["years_in_business"] >= MIN_YEARS_IN_BUSINESS,
+    ),
+    EligibilityRule(
+        "industry_review",
+        "Industry type may require special review",
+        lambda facts: facts["industry"] not in RESTRICTED_INDUSTRIES,
+    ),
+)
+
+
+def owner_facts(owner: Dict[str, Any], employee_count: int) -> Facts:
+    """Facts for an owner document (with at least OWNER_FIELDS) and its current headcount"""
+    return {**{field: owner[field] for field in OWNER_FIELDS}, "employee_count": employee_count}
+
+
+def evaluate(facts: Facts) -> List[str]:
+    """Reasons `facts` fail the rule set; empty when the owner is eligible"""
+    return [rule.reason for rule in RULES if not rule.check(facts)]
+
+
+def eligibility_result(facts: Facts, evaluated_at: datetime) -> Dict[str, Any]:
+    """The stored result for one owner's facts (see EligibilityRepository.facts)"""
+    failures = evaluate(facts)
+    return {
+        "id": facts["id"],
+        "business_owner_id": facts["id"],
+        "business_name": facts["business_name"],
+        "industry": facts["industry"],
+        "years_in_business": facts["years_in_business"],
+        "employee_count": facts["employee_count"],
+        "eligible": not failures,
+        "reasons": failures or [ALL_CRITERIA_MET],
+        "rules_version": RULES_VERSION,
+        "evaluated_at": evaluated_at,
+        "created_at": facts["created_at"],
+    }
@@ -0,0 +1,167 @@
+"""Background exports of whole collections to Parquet or gzipped CSV.
+
+An export streams documents from a storage repository's `export` cursor and
+appends them to a file under `EXPORT_DIR` one chunk at a time, as a Parquet
+row group or a run of CSV lines, so memory stays bounded by the chunk size
+however large the collection is. Encoding and file writes run in a worker
+thread. The file is written under a temporary name and renamed when complete;
+the API then hands it to the storage layer (GridFS on Mongo), so any worker
+can serve the download, and removes the local copy. `EXPORT_DIR` is only a
+staging area. Stored files, and staging files abandoned by a crash, older than
+`EXPORT_RETENTION_HOURS` are removed when the next export starts.
+"""
+import asyncio
+import csv
+import gzip
+import json
+import os
+import time
+import typing
+from datetime import date, datetime
+from enum import Enum
+from pathlib import Path
+from typing import Any, AsyncIterator, Callable, Dict, List
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+from pydantic import BaseModel
+
+DEFAULT_EXPORT_DIR = Path(__file__).parent / "exports"
+EXPORT_DIR = Path(os.environ.get('EXPORT_DIR', DEFAULT_EXPORT_DIR))
+EXPORT_RETENTION_SECONDS = float(os.environ.get('EXPORT_RETENTION_HOURS', '24')) * 3600
+# Documents encoded and written per step
+EXPORT_CHUNK_SIZE = int(os.environ.get('EXPORT_CHUNK_SIZE', '5000'))
+PARTIAL_SUFFIX = ".partial"
+
+
+class ExportFormat(str, Enum):
+    PARQUET = "parquet"
+    CSV = "csv"
+
+
+EXTENSIONS = {ExportFormat.PARQUET: ".parquet", ExportFormat.CSV: ".csv.gz"}
+MEDIA_TYPES = {ExportFormat.PARQUET: "application/vnd.apache.parquet", ExportFormat.CSV: "application/gzip"}
+
+_ARROW_TYPES = {
+    str: pa.string(),
+    # bool before int, which it subclasses
+    bool: pa.bool_(),
+    int: pa.int64(),
+    float: pa.float64(),
+    datetime: pa.timestamp("us"),
+    date: pa.date32(),
+}
+
+
+def _arrow_type(annotation) -> pa.DataType:
+    args = [arg for arg in typing.get_args(annotation) if arg is not type(None)]
+    if typing.get_origin(annotation) is typing.Union and len(args) == 1:
+        annotation = args[0]
+    for python_type, arrow_type in _ARROW_TYPES.items():
+        if isinstance(annotation, type) and issubclass(annotation, python_type):
+            return arrow_type
+    # Lists, dicts and anything else are written as JSON text
+    return pa.string()
+
+
+def arrow_schema(model) -> pa.Schema:
+    """A Parquet schema with one column per model field"""
+    return pa.schema([(name, _arrow_type(field.annotation)) for name, field in model.model_fields.items()])
+
+
+def _cell(value: Any, arrow_type: pa.DataType) -> Any:
+    if value is None:
+        return None
+    if isinstance(value, Enum):
+        return value.value
+    if arrow_type == pa.string() and not isinstance(value, str):
+        return json.dumps(value, default=str)
+    return value
+
+
+class ParquetExportWriter:
+    def __init__(self, path: Path, model):
+        self.schema = arrow_schema(model)
+        self._writer = pq.ParquetWriter(path, self.schema, compression="zstd")
+
+    def write(self, docs: List[Dict[str, Any]]):
+        columns = {
+            field.name: [_cell(doc.get(field.name), field.type) for doc in docs] for field in self.schema
+        }
+        self._writer.write_table(pa.Table.from_pydict(columns, schema=self.schema))
+
+    def close(self):
+        self._writer.close()
+
+
+class CSVExportWriter:
+    def __init__(self, path: Path, model):
+        self.fields = list(model.model_fields)
+        self._file = gzip.open(path, "wt", encoding="utf-8", newline="")
+        self._writer = csv.writer(self._file)
+        self._writer.writerow(self.fields)
+
+    @staticmethod
+    def _text(value: Any) -> Any:
+        if value is None:
+            return ""
+        if isinstance(value, Enum):
+            return value.value
+        if isinstance(value, (datetime, date)):
+            return value.isoformat()
+        if isinstance(value, (dict, list)):
+            return json.dumps(value, default=str)
+        return value
+
+    def write(self, docs: List[Dict[str, Any]]):
+        self._writer.writerows([self._text(doc.get(field)) for field in self.fields] for doc in docs)
+
+    def close(self):
+        self._file.close()
+
+
+WRITERS = {ExportFormat.PARQUET: ParquetExportWriter, ExportFormat.CSV: CSVExportWriter}
+
+
+def export_path(export_id: str, file_format: ExportFormat) -> Path:
+    return EXPORT_DIR / f"{export_id}{EXTENSIONS[file_format]}"
+
+
+def prune_exports(max_age: float = EXPORT_RETENTION_SECONDS):
+    """Delete staging files (complete or partial) left behind for more than `max_age` seconds"""
+    if not EXPORT_DIR.is_dir():
+        return
+    cutoff = time.time() - max_age
+    for path in EXPORT_DIR.iterdir():
+        if path.is_file() and path.stat().st_mtime < cutoff:
+            path.unlink(missing_ok=True)
+
+
+async def write_export(docs: AsyncIterator[Dict[str, Any]], model: typing.Type[BaseModel], path: Path,
+                       file_format: ExportFormat, on_chunk: Callable[[int], None] = lambda rows: None,
+                       chunk_size: int = EXPORT_CHUNK_SIZE) -> int:
+    """Write every document from `docs` to `path` as `model`'s columns; returns the row count"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    partial = path.with_name(path.name + PARTIAL_SUFFIX)
+    writer = await asyncio.to_thread(WRITERS[file_format], partial, model)
+    rows = 0
+    try:
+        chunk = []
+        async for doc in docs:
+            chunk.append(doc)
+            if len(chunk) >= chunk_size:
+                await asyncio.to_thread(writer.write, chunk)
+                rows += len(chunk)
+                on_chunk(rows)
+                chunk = []
+        if chunk or rows == 0:
+            await asyncio.to_thread(writer.write, chunk)
+            rows += len(chunk)
+            on_chunk(rows)
+    except BaseException:
+        await asyncio.to_thread(writer.close)
+        partial.unlink(missing_ok=True)
+        raise
+    await asyncio.to_thread(writer.close)
+    partial.replace(path)
+    return rows
@@ -0,0 +1,213 @@
+"""Vectorized FICA savings engine.
+
+Salaries and premium flags for a roster are loaded into NumPy arrays once and
+every tax is computed per employee in a single pass, so large rosters cost a
+handful of array operations instead of a Python loop per employee.
+
+Pre-tax benefits reduce FICA wages. Each employee's annual pre-tax amount is
+the selected plan premium for each line of coverage (health, life). A line
+with no plan selected adds nothing, so a calculation with no plans reports no
+new savings. Employees' current premiums only matter when comparing plans
+against what they replace (`replaced_premiums`).
+
+Savings are the actual Social Security and Medicare tax on the wages moved
+pre-tax, about 7.65% of the premiums (less above the wage base), where the
+engine before version 2025.1 estimated a flat 30% of the benefit cost.
+"""
+import hashlib
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+
+# 2025 rates. Bump ENGINE_VERSION whenever any of these, or what a result means, change.
+# 2025.2: a line of coverage with no plan selected no longer moves current premiums pre-tax
+ENGINE_VERSION = "2025.2"
+SOCIAL_SECURITY_RATE = 0.062
+SOCIAL_SECURITY_WAGE_BASE = 176_100.0
+MEDICARE_RATE = 0.0145
+# Additional Medicare tax is withheld from employees only, above this threshold
+ADDITIONAL_MEDICARE_RATE = 0.009
+ADDITIONAL_MEDICARE_THRESHOLD = 200_000.0
+
+# Employee fields the engine reads
+EMPLOYEE_FIELDS = (
+    "id",
+    "first_name",
+    "last_name",
+    "annual_salary",
+    "has_current_health_insurance",
+    "has_current_life_insurance",
+    "current_health_premium",
+    "current_life_premium",
+)
+
+
+class Roster:
+    """Column arrays for one business owner's employees"""
+
+    def __init__(self, employees: Iterable[Dict[str, Any]]):
+        employees = list(employees)
+        self.ids = [emp.get("id") for emp in employees]
+        self.names = [f"{emp.get('first_name', '')} {emp.get('last_name', '')}".strip() for emp in employees]
+        self.salaries = np.fromiter(
+            (emp.get("annual_salary") or 0.0 for emp in employees), dtype=np.float64, count=len(employees)
+        )
+        self.health_flags = np.fromiter(
+            (bool(emp.get("has_current_health_insurance")) for emp in employees), dtype=bool, count=len(employees)
+        )
+        self.life_flags = np.fromiter(
+            (bool(emp.get("has_current_life_insurance")) for emp in employees), dtype=bool, count=len(employees)
+        )
+        # Current premiums are stored monthly; only count them where the flag is set
+        self.current_health_premiums = np.where(self.health_flags, np.fromiter(
+            (emp.get("current_health_premium") or 0.0 for emp in employees), dtype=np.float64, count=len(employees)
+        ), 0.0)
+        self.current_life_premiums = np.where(self.life_flags, np.fromiter(
+            (emp.get("current_life_premium") or 0.0 for emp in employees), dtype=np.float64, count=len(employees)
+        ), 0.0)
+
+    def __len__(self):
+        return len(self.ids)
+
+
+def calculation_fingerprint(roster_version: str, health_plan_id: Optional[str], life_plan_id: Optional[str],
+                            health_monthly_premium: Optional[float], life_monthly_premium: Optional[float]) -> str:
+    """Memo key for a calculation: the owner's roster version plus everything else it depends on.
+
+    The roster version changes whenever an employee is added, removed or
+    imported, so a repeat request can be matched to its stored result without
+    reading the roster. A different plan selection or premium, or a change to
+    the tax constants, also yields a new key.
+    """
+    return hashlib.sha256(repr((ENGINE_VERSION, roster_version, health_plan_id, life_plan_id,
+                                health_monthly_premium, life_monthly_premium)).encode()).hexdigest()
+
+
+def employer_fica(wages: np.ndarray):
+    """Employer Social Security and Medicare tax on an array of FICA wages"""
+    wages = np.maximum(wages, 0.0)
+    social_security = np.minimum(wages, SOCIAL_SECURITY_WAGE_BASE) * SOCIAL_SECURITY_RATE
+    medicare = wages * MEDICARE_RATE
+    return social_security, medicare
+
+
+def employee_fica(wages: np.ndarray) -> np.ndarray:
+    """Employee-side FICA, including the additional Medicare tax"""
+    wages = np.maximum(wages, 0.0)
+    social_security, medicare = employer_fica(wages)
+    additional = np.maximum(wages - ADDITIONAL_MEDICARE_THRESHOLD, 0.0) * ADDITIONAL_MEDICARE_RATE
+    return social_security + medicare + additional
+
+
+def pretax_benefits(roster: Roster, health_monthly_premium: Optional[float], life_monthly_premium: Optional[float]):
+    """Annual pre-tax benefit amount per employee; a line with no plan contributes nothing"""
+    return np.full(len(roster), (health_monthly_premium or 0.0) + (life_monthly_premium or 0.0)) * 12
+
+
+def calculate(
+    roster: Roster,
+    health_monthly_premium: Optional[float] = None,
+    life_monthly_premium: Optional[float] = None,
+    include_breakdown: bool = False,
+) -> Dict[str, Any]:
+    """Compute FICA totals for a roster, optionally with a per-employee breakdown.
+
+    Plan premiums are monthly per-employee amounts; pass None for a line of
+    coverage with no plan selected.
+    """
+    salaries = roster.salaries
+    pretax = np.minimum(pretax_benefits(roster, health_monthly_premium, life_monthly_premium), salaries)
+    reduced = salaries - pretax
+
+    current_ss, current_medicare = employer_fica(salaries)
+    projected_ss, projected_medicare = employer_fica(reduced)
+    ss_savings = current_ss - projected_ss
+    medicare_savings = current_medicare - projected_medicare
+    employer_savings = ss_savings + medicare_savings
+    employee_savings = employee_fica(salaries) - employee_fica(reduced)
+
+    headcount = len(roster)
+    health_cost = (health_monthly_premium or 0.0) * headcount * 12
+    life_cost = (life_monthly_premium or 0.0) * headcount * 12
+
+    result = {
+        "headcount": headcount,
+        "total_employee_salaries": float(salaries.sum()),
+        "current_fica_tax": float(current_ss.sum() + current_medicare.sum()),
+        "projected_fica_savings": float(employer_savings.sum()),
+        "social_security_savings": float(ss_savings.sum()),
+        "medicare_savings": float(medicare_savings.sum()),
+        "employee_fica_savings": float(employee_savings.sum()),
+        "total_pretax_benefits": float(pretax.sum()),
+        "health_benefit_cost": health_cost,
+        "life_insurance_cost": life_cost,
+    }
+    if include_breakdown:
+        result["employee_breakdown"] = _breakdown(roster, pretax, ss_savings, medicare_savings, employee_savings)
+    return result
+
+
+def _breakdown(roster, pretax, ss_savings, medicare_savings, employee_savings) -> List[Dict[str, Any]]:
+    employer_savings = ss_savings + medicare_savings
+    # Largest contributors first
+    order = np.argsort(-employer_savings, kind="stable")
+    columns = zip(
+        (roster.ids[i] for i in order),
+        (roster.names[i] for i in order),
+        roster.salaries[order].tolist(),
+        pretax[order].tolist(),
+        ss_savings[order].tolist(),
+        medicare_savings[order].tolist(),
+        employer_savings[order].tolist(),
+        employee_savings[order].tolist(),
+    )
+    return [
+        {
+            "employee_id": employee_id,
+            "name": name,
+            "annual_salary": salary,
+            "pretax_benefits": pretax_amount,
+            "social_security_savings": ss,
+            "medicare_savings": medicare,
+            "employer_fica_savings": employer,
+            "employee_fica_savings": employee,
+        }
+        for employee_id, name, salary, pretax_amount, ss, medicare, employer, employee in columns
+    ]
+
+
+def sweep(roster: Roster, health_premiums: List[Optional[float]], life_premiums: List[Optional[float]]) -> Dict[str, np.ndarray]:
+    """Evaluate many plan combinations against a roster in one vectorized pass.
+
+    `health_premiums[k]` and `life_premiums[k]` are the monthly premiums for
+    scenario k (None for no plan on that line). Returns per-scenario totals as
+    arrays of length k. `replaced_premiums` is what employees currently pay on
+    the lines scenario k puts a plan on, so plans can be charged only for the
+    cost above the coverage they replace.
+    """
+    health = np.array([p or 0.0 for p in health_premiums], dtype=np.float64)
+    life = np.array([p or 0.0 for p in life_premiums], dtype=np.float64)
+
+    salaries = roster.salaries[None, :]
+    pretax = np.broadcast_to(((health + life) * 12)[:, None], (len(health), len(roster)))
+    reduced = salaries - np.minimum(pretax, salaries)
+
+    current_ss, current_medicare = employer_fica(salaries)
+    projected_ss, projected_medicare = employer_fica(reduced)
+    employer_savings = (current_ss - projected_ss) + (current_medicare - projected_medicare)
+    employee_savings = employee_fica(salaries) - employee_fica(reduced)
+
+    headcount = len(roster)
+    health_cost = health * headcount * 12
+    life_cost = life * headcount * 12
+    health_selected = np.array([p is not None for p in health_premiums], dtype=bool)
+    life_selected = np.array([p is not None for p in life_premiums], dtype=bool)
+    replaced = (health_selected * roster.current_health_premiums.sum()
+                + life_selected * roster.current_life_premiums.sum()) * 12
+    return {
+        "projected_fica_savings": employer_savings.sum(axis=1),
+        "employee_fica_savings": employee_savings.sum(axis=1),
+        "health_benefit_cost": health_cost,
+        "life_insurance_cost": life_cost,
+        "replaced_premiums": replaced,
+    }
@@ -0,0 +1,80 @@
+"""Idempotency-Key support for create endpoints.
+
+A client that retries a create request with the same `Idempotency-Key` header
+gets the original response back instead of a second record. The first request
+claims the key (scoped per endpoint) in the idempotency store, runs, and
+stores its response; repeats within `IDEMPOTENCY_KEY_TTL_HOURS` replay that
+response with `Idempotent-Replayed: true`. A repeat that arrives while the
+first is still running gets 409 with Retry-After, and reusing a key with a
+different body is rejected with 422. If the request fails, the key is released
+so the client can retry; if the process dies mid-request, the claim lapses
+after `IDEMPOTENCY_LEASE_SECONDS`.
+"""
+import hashlib
+import os
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Optional
+
+from fastapi import HTTPException
+from fastapi.responses import Response
+from pydantic import BaseModel
+
+from documents import JSON_MEDIA_TYPE
+from storage.base import IdempotencyRepository
+
+IDEMPOTENCY_KEY_HEADER = "Idempotency-Key"
+REPLAYED_HEADER = "Idempotent-Replayed"
+IDEMPOTENCY_KEY_MAX_LENGTH = 255
+IDEMPOTENCY_TTL = timedelta(hours=float(os.environ.get('IDEMPOTENCY_KEY_TTL_HOURS', '24')))
+IN_PROGRESS_LEASE = timedelta(seconds=float(os.environ.get('IDEMPOTENCY_LEASE_SECONDS', '60')))
+
+
+def request_fingerprint(payload: BaseModel) -> str:
+    return hashlib.sha256(payload.model_dump_json().encode()).hexdigest()
+
+
+async def idempotent(
+    repository: IdempotencyRepository,
+    scope: str,
+    key: Optional[str],
+    payload: BaseModel,
+    create: Callable[[], Awaitable[BaseModel]],
+):
+    """Run `create` at most once per (scope, key), replaying its stored result for repeats"""
+    if key is None:
+        return await create()
+
+    now = datetime.utcnow()
+    fingerprint = request_fingerprint(payload)
+    existing = await repository.claim({
+        "scope": scope,
+        "key": key,
+        "request_fingerprint": fingerprint,
+        "state": "in_progress",
+        "response": None,
+        "created_at": now,
+        "lease_expires_at": now + IN_PROGRESS_LEASE,
+        "expires_at": now + IDEMPOTENCY_TTL,
+    }, now)
+
+    if existing is not None:
+        if existing["request_fingerprint"] != fingerprint:
+            raise HTTPException(
+                status_code=422, detail=f"{IDEMPOTENCY_KEY_HEADER} was already used with a different request"
+            )
+        if existing["state"] != "completed":
+            raise HTTPException(
+                status_code=409,
+                detail=f"A request with this {IDEMPOTENCY_KEY_HEADER} is still in progress",
+                headers={"Retry-After": "1"},
+            )
+        return Response(existing["response"], media_type=JSON_MEDIA_TYPE, headers={REPLAYED_HEADER: "true"})
+
+    try:
+        created = await create()
+    except Exception:
+        await repository.release(scope, key)
+        raise
+    # Stored already encoded, so replays keep full datetime precision on every backend
+    await repository.complete(scope, key, created.model_dump_json(), datetime.utcnow() + IDEMPOTENCY_TTL)
+    return created
@@ -0,0 +1,320 @@
+"""Declared MongoDB indexes for every collection the API touches.
+
+`ensure_indexes` creates missing indexes at startup; rebuilding an index whose
+definition changed drops it first, so that only happens from
+`manage.py ensure-indexes`, never from every worker at once.
+`verify_query_plans` explains the query shape of each hot route, failing if any
+of them falls back to a collection scan or sorts in memory.
+"""
+import asyncio
+import logging
+from typing import Any, Dict, List
+
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.errors import OperationFailure
+
+logger = logging.getLogger(__name__)
+
+# Index specs per collection. Names are explicit so reconciliation can tell a
+# changed definition apart from a new one.
+INDEX_SPECS: Dict[str, List[IndexModel]] = {
+    "leads": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("created_at", DESCENDING), ("id", DESCENDING)], name="created_at_desc"),
+    ],
+    "business_owners": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("created_at", ASCENDING), ("id", ASCENDING)], name="created_at"),
+    ],
+    "employees": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel(
+            [("business_owner_id", ASCENDING), ("created_at", ASCENDING), ("id", ASCENDING)],
+            name="business_owner_created_at",
+        ),
+    ],
+    "roster_rollups": [
+        IndexModel([("business_owner_id", ASCENDING)], name="business_owner_unique", unique=True),
+    ],
+    "benefit_plans": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("is_active", ASCENDING), ("plan_type", ASCENDING)], name="active_plan_type"),
+    ],
+    "fica_calculations": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel(
+            [("business_owner_id", ASCENDING), ("calculation_date", DESCENDING)],
+            name="business_owner_calculation_date",
+        ),
+        IndexModel(
+            [("business_owner_id", ASCENDING), ("roster_fingerprint", ASCENDING)],
+            name="business_owner_roster_fingerprint",
+            unique=True,
+            partialFilterExpression={"roster_fingerprint": {"$exists": True}},
+        ),
+    ],
+    "applications": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel(
+            [("business_owner_id", ASCENDING), ("created_at", DESCENDING)],
+            name="business_owner_created_at",
+        ),
+    ],
+    "funnel_rollups": [
+        IndexModel(
+            [("day", ASCENDING), ("industry", ASCENDING), ("employee_band", ASCENDING)],
+            name="day_industry_band_unique",
+            unique=True,
+        ),
+    ],
+    "eligibility_results": [
+        IndexModel([("business_owner_id", ASCENDING)], name="business_owner_unique", unique=True),
+        # Unfiltered pages and the employee-count range filters, which are applied while walking it
+        IndexModel([("created_at", ASCENDING), ("id", ASCENDING)], name="created_at"),
+        IndexModel([("industry", ASCENDING), ("created_at", ASCENDING), ("id", ASCENDING)], name="industry_created_at"),
+        IndexModel(
+            [("eligible", ASCENDING), ("created_at", ASCENDING), ("id", ASCENDING)],
+            name="eligible_created_at",
+        ),
+        IndexModel(
+            [("eligible", ASCENDING), ("industry", ASCENDING), ("created_at", ASCENDING), ("id", ASCENDING)],
+            name="eligible_industry_created_at",
+        ),
+    ],
+    "owner_versions": [
+        IndexModel([("business_owner_id", ASCENDING)], name="business_owner_unique", unique=True),
+    ],
+    "idempotency_keys": [
+        IndexModel([("scope", ASCENDING), ("key", ASCENDING)], name="scope_key_unique", unique=True),
+        # Records are removed by the TTL monitor once expires_at has passed
+        IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0),
+    ],
+    "jobs": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        # Finished jobs are removed once expires_at has passed; running jobs have none
+        IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0),
+    ],
+}
+
+# Query shapes issued by the routes in server.py, as (collection, filter, sort).
+# Placeholder values only need the right type; the planner picks the same index.
+# Benefit plans are served from the in-memory catalog and are not listed.
+QUERY_SHAPES: Dict[str, Dict[str, Any]] = {
+    "get_leads": {
+        "collection": "leads",
+        "filter": {},
+        "sort": [("created_at", DESCENDING), ("id", DESCENDING)],
+    },
+    "get_business_owner": {"collection": "business_owners", "filter": {"id": ""}},
+    "get_business_owners": {
+        "collection": "business_owners",
+        "filter": {},
+        "sort": [("created_at", ASCENDING), ("id", ASCENDING)],
+    },
+    "get_employees_by_business": {
+        "collection": "employees",
+        "filter": {"business_owner_id": ""},
+        "sort": [("created_at", ASCENDING), ("id", ASCENDING)],
+    },
+    "get_employee": {"collection": "employees", "filter": {"id": ""}},
+    "get_fica_calculation_history": {
+        "collection": "fica_calculations",
+        "filter": {"business_owner_id": ""},
+        "sort": [("calculation_date", DESCENDING)],
+    },
+    "calculate_fica_savings": {
+        "collection": "fica_calculations",
+        "filter": {"business_owner_id": "", "roster_fingerprint": ""},
+    },
+    "get_roster_summary": {"collection": "roster_rollups", "filter": {"business_owner_id": ""}},
+    "get_applications_by_business": {
+        "collection": "applications",
+        "filter": {"business_owner_id": ""},
+        "sort": [("created_at", DESCENDING)],
+    },
+    "get_application": {"collection": "applications", "filter": {"id": ""}},
+    # Job polls from any API worker
+    "get_job": {"collection": "jobs", "filter": {"id": ""}},
+    "get_lead_funnel": {
+        "collection": "funnel_rollups",
+        "filter": {"day": {"$gte": "", "$lte": ""}},
+        "sort": [("day", ASCENDING), ("industry", ASCENDING), ("employee_band", ASCENDING)],
+    },
+    # GET /api/eligibility, once per combination of its filters
+    "get_eligibility_results": {
+        "collection": "eligibility_results",
+        "filter": {},
+        "sort": [("created_at", ASCENDING), ("id", ASCENDING)],
+    },
+    "get_eligibility_results_by_eligible": {
+        "collection": "eligibility_results",
+        "filter": {"eligible": True},
+        "sort": [("created_at", ASCENDING), ("id", ASCENDING)],
+    },
+    "get_eligibility_results_by_industry": {
+        "collection": "eligibility_results",
+        "filter": {"industry": ""},
+        "sort": [("created_at", ASCENDING), ("id", ASCENDING)],
+    },
+    "get_eligibility_results_by_eligible_industry": {
+        "collection": "eligibility_results",
+        "filter": {"eligible": True, "industry": ""},
+        "sort": [("created_at", ASCENDING), ("id", ASCENDING)],
+    },
+    "get_eligibility_results_by_employee_count": {
+        "collection": "eligibility_results",
+        "filter": {"employee_count": {"$gte": 0, "$lte": 0}},
+        "sort": [("created_at", ASCENDING), ("id", ASCENDING)],
+    },
+    "get_eligibility_results_by_eligible_employee_count": {
+        "collection": "eligibility_results",
+        "filter": {"eligible": True, "employee_count": {"$gte": 0, "$lte": 0}},
+        "sort": [("created_at", ASCENDING), ("id", ASCENDING)],
+    },
+    "get_eligibility_results_by_industry_employee_count": {
+        "collection": "eligibility_results",
+        "filter": {"industry": "", "employee_count": {"$gte": 0, "$lte": 0}},
+        "sort": [("created_at", ASCENDING), ("id", ASCENDING)],
+    },
+    "owner_version": {"collection": "owner_versions", "filter": {"business_owner_id": ""}},
+    "idempotency_claim": {"collection": "idempotency_keys", "filter": {"scope": "", "key": ""}},
+}
+
+
+# Server error codes a concurrent reconcile can leave behind: the index was
+# already dropped, or was created meanwhile under the same name or keys
+INDEX_NOT_FOUND = 27
+INDEX_RACE_CODES = (68, 85, 86)  # IndexAlreadyExists, IndexOptionsConflict, IndexKeySpecsConflict
+
+
+class QueryPlanError(RuntimeError):
+    """Raised when a route's query shape is planned as a collection scan"""
+
+
+def _spec_matches(existing: Dict[str, Any], model: IndexModel) -> bool:
+    wanted = model.document
+    if list(existing["key"].items()) != list(wanted["key"].items()):
+        return False
+    for option in ("unique", "sparse", "expireAfterSeconds", "partialFilterExpression"):
+        if existing.get(option) != wanted.get(option):
+            return False
+    return True
+
+
+async def _create_indexes(collection, models: List[IndexModel]) -> List[str]:
+    try:
+        return await collection.create_indexes(models)
+    except OperationFailure as exc:
+        if exc.code not in INDEX_RACE_CODES:
+            raise
+    # Another process got to some of them first; create the rest one at a time
+    created = []
+    for model in models:
+        try:
+            created.extend(await collection.create_indexes([model]))
+        except OperationFailure as exc:
+            if exc.code not in INDEX_RACE_CODES:
+                raise
+            logger.warning("Index %s.%s was created concurrently: %s",
+                           collection.name, model.document["name"], exc)
+    return created
+
+
+async def _ensure_collection_indexes(db, collection_name: str, models: List[IndexModel], rebuild: bool) -> List[str]:
+    collection = db[collection_name]
+    existing = {}
+    async for index in collection.list_indexes():
+        existing[index["name"]] = index
+
+    missing = []
+    for model in models:
+        name = model.document["name"]
+        current = existing.pop(name, None)
+        if current is None:
+            missing.append(model)
+        elif not _spec_matches(current, model):
+            if not rebuild:
+                logger.warning("Index %s.%s differs from INDEX_SPECS; run `manage.py ensure-indexes` to rebuild it",
+                               collection_name, name)
+                continue
+            logger.info("Rebuilding index %s.%s with a new definition", collection_name, name)
+            try:
+                await collection.drop_index(name)
+            except OperationFailure as exc:
+                if exc.code != INDEX_NOT_FOUND:
+                    raise
+            missing.append(model)
+
+    existing.pop("_id_", None)
+    for name in existing:
+        logger.info("Index %s.%s is not declared in INDEX_SPECS", collection_name, name)
+
+    if not missing:
+        return []
+    created = await _create_indexes(collection, missing)
+    logger.info("Created indexes on %s: %s", collection_name, ", ".join(created))
+    return created
+
+
+async def ensure_indexes(db, rebuild: bool = False) -> Dict[str, List[str]]:
+    """Create missing indexes, and with `rebuild` also those whose definition has changed.
+
+    Returns the names of the indexes created per collection. Without
+    `rebuild`, changed definitions are only logged, so concurrent workers
+    starting up never drop an index. Indexes that are not declared in
+    `INDEX_SPECS` are left alone and only logged. Collections are reconciled
+    concurrently, so startup pays roughly one collection's round trips rather
+    than the sum of them.
+    """
+    names = list(INDEX_SPECS)
+    results = await asyncio.gather(
+        *(_ensure_collection_indexes(db, name, INDEX_SPECS[name], rebuild) for name in names)
+    )
+    return {name: created for name, created in zip(names, results) if created}
+
+
+def _plan_stages(plan: Dict[str, Any]):
+    yield plan.get("stage")
+    if "inputStage" in plan:
+        yield from _plan_stages(plan["inputStage"])
+    for child in plan.get("inputStages", []):
+        yield from _plan_stages(child)
+    if "queryPlan" in plan:
+        yield from _plan_stages(plan["queryPlan"])
+
+
+async def explain_query_shape(db, shape: Dict[str, Any]) -> List[str]:
+    """Return the stage names of the winning plan for a query shape"""
+    cursor = db[shape["collection"]].find(shape["filter"])
+    if shape.get("sort"):
+        cursor = cursor.sort(shape["sort"])
+    explanation = await cursor.explain()
+    winning_plan = explanation["queryPlanner"]["winningPlan"]
+    return [stage for stage in _plan_stages(winning_plan) if stage]
+
+
+async def verify_query_plans(db) -> Dict[str, List[str]]:
+    """Explain every route's query shape and raise if any uses COLLSCAN or a blocking SORT"""
+    plans = {}
+    scans = []
+    sorts = []
+    for route, shape in QUERY_SHAPES.items():
+        try:
+            stages = await explain_query_shape(db, shape)
+        except OperationFailure as exc:
+            raise QueryPlanError(f"Could not explain query for {route}: {exc}") from exc
+        plans[route] = stages
+        if "COLLSCAN" in stages:
+            scans.append(route)
+        # Keyset pages rely on the index order; an in-memory sort reads every match first
+        if "SORT" in stages:
+            sorts.append(route)
+
+    problems = []
+    if scans:
+        problems.append("Collection scan planned for: " + ", ".join(sorted(scans)))
+    if sorts:
+        problems.append("In-memory sort planned for: " + ", ".join(sorted(sorts)))
+    if problems:
+        raise QueryPlanError("; ".join(problems))
+    return plans
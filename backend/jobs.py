@@ -0,0 +1,171 @@
+"""Registry for long-running background jobs.
+
+Jobs run as asyncio tasks inside the API worker that started them and report
+progress through a `Job` record that handlers can return directly. Each record
+is also written through the storage layer when the job is created, starts and
+finishes, and every `progress_interval` seconds while it runs, so a poll that
+lands on another worker still finds it (with progress at most that stale).
+Stored records of finished jobs expire after `retention_seconds`; the worker
+keeps its own finished jobs in memory up to a fixed limit.
+"""
+import asyncio
+import logging
+import uuid
+from datetime import datetime, timedelta
+from enum import Enum
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from pydantic import BaseModel, Field, computed_field
+
+from storage.base import JobRepository
+
+logger = logging.getLogger(__name__)
+
+
+class JobState(str, Enum):
+    PENDING = "pending"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+
+
+class Job(BaseModel):
+    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    kind: str
+    state: JobState = JobState.PENDING
+    total: int = 0
+    processed: int = 0
+    failed: int = 0
+    params: Dict[str, Any] = {}
+    result: Dict[str, Any] = {}
+    error: Optional[str] = None
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+    @computed_field
+    @property
+    def elapsed_seconds(self) -> float:
+        if not self.started_at:
+            return 0.0
+        return ((self.finished_at or datetime.utcnow()) - self.started_at).total_seconds()
+
+    @computed_field
+    @property
+    def throughput_per_second(self) -> float:
+        elapsed = self.elapsed_seconds
+        return self.processed / elapsed if elapsed > 0 else 0.0
+
+    @computed_field
+    @property
+    def eta_seconds(self) -> Optional[float]:
+        if self.state != JobState.RUNNING or not self.total:
+            return None
+        throughput = self.throughput_per_second
+        if throughput <= 0:
+            return None
+        return max(self.total - self.processed, 0) / throughput
+
+
+# Derived on read, so not stored
+COMPUTED_FIELDS = set(Job.model_computed_fields)
+
+
+class JobRegistry:
+    """Tracks jobs by id, runs them as background tasks and stores their records"""
+
+    def __init__(
+        self,
+        store: JobRepository,
+        max_finished: int = 100,
+        retention_seconds: float = 86400,
+        progress_interval: float = 1.0,
+    ):
+        self.store = store
+        self.max_finished = max_finished
+        self.retention = timedelta(seconds=retention_seconds)
+        self.progress_interval = progress_interval
+        self._jobs: Dict[str, Job] = {}
+        self._tasks: Dict[str, asyncio.Task] = {}
+
+    async def create(self, kind: str, **params) -> Job:
+        job = Job(kind=kind, params=params)
+        await self._save(job)
+        self._jobs[job.id] = job
+        self._prune()
+        return job
+
+    async def get(self, job_id: str) -> Optional[Job]:
+        """The job as this worker sees it if it ran here, else its stored record"""
+        job = self._jobs.get(job_id)
+        if job is not None:
+            return job
+        record = await self.store.get(job_id)
+        return Job(**record) if record is not None else None
+
+    def start(self, job: Job, runner: Callable[[Job], Awaitable[None]]) -> Job:
+        """Run `runner(job)` in the background, recording its outcome on the job"""
+        self._tasks[job.id] = asyncio.create_task(self._run(job, runner))
+        return job
+
+    async def _run(self, job: Job, runner: Callable[[Job], Awaitable[None]]):
+        job.state = JobState.RUNNING
+        job.started_at = datetime.utcnow()
+        reporter = None
+        try:
+            await self._save(job)
+            reporter = asyncio.create_task(self._report_progress(job))
+            await runner(job)
+            job.state = JobState.COMPLETED
+        except asyncio.CancelledError:
+            job.state = JobState.FAILED
+            job.error = "Cancelled"
+            raise
+        except Exception as exc:
+            logger.exception("Job %s (%s) failed", job.id, job.kind)
+            job.state = JobState.FAILED
+            job.error = str(exc)
+        finally:
+            job.finished_at = datetime.utcnow()
+            if reporter is not None:
+                reporter.cancel()
+            self._tasks.pop(job.id, None)
+            try:
+                await self._save(job)
+            except Exception:
+                logger.exception("Could not store the outcome of job %s (%s)", job.id, job.kind)
+            logger.info(
+                "Job %s (%s) %s: %d/%d processed in %.1fs",
+                job.id, job.kind, job.state.value, job.processed, job.total, job.elapsed_seconds,
+            )
+
+    async def _report_progress(self, job: Job):
+        """Store the running job's progress every `progress_interval` seconds"""
+        while True:
+            await asyncio.sleep(self.progress_interval)
+            try:
+                await self._save(job)
+            except Exception:
+                # Polls elsewhere see older progress until the next save; the job itself carries on
+                logger.warning("Could not store progress of job %s (%s)", job.id, job.kind, exc_info=True)
+
+    async def _save(self, job: Job):
+        record = job.dict(exclude=COMPUTED_FIELDS)
+        record["expires_at"] = job.finished_at + self.retention if job.finished_at else None
+        await self.store.put(record)
+
+    async def shutdown(self):
+        """Cancel any jobs still running"""
+        for task in list(self._tasks.values()):
+            task.cancel()
+        if self._tasks:
+            await asyncio.gather(*self._tasks.values(), return_exceptions=True)
+
+    def _prune(self):
+        finished = [
+            job for job in self._jobs.values() if job.state in (JobState.COMPLETED, JobState.FAILED)
+        ]
+        excess = len(finished) - self.max_finished
+        if excess > 0:
+            for job in sorted(finished, key=lambda j: j.created_at)[:excess]:
+                del self._jobs[job.id]
@@ -0,0 +1,94 @@
+"""Maintenance commands for the FICA Reduction Program backend.
+
+Run from the backend directory, e.g. `python manage.py verify-indexes`.
+"""
+import asyncio
+
+import typer
+
+from server import (
+    DASHBOARD_VERSION,
+    RosterSummary,
+    bump_owner_versions,
+    evaluate_eligibility,
+    rebuild_all_roster_rollups,
+    rebuild_roster_rollup,
+    storage,
+)
+from indexes import ensure_indexes, verify_query_plans, QueryPlanError
+
+cli = typer.Typer(help="FICA Reduction Program maintenance commands")
+
+
+def _run(coro):
+    async def run():
+        try:
+            return await coro
+        finally:
+            await storage.close()
+    return asyncio.run(run())
+
+
+async def _rebuild_owner(owner_id: str):
+    before = await storage.rollups.get(owner_id)
+    summary = await rebuild_roster_rollup(owner_id)
+    if before is None or RosterSummary(**before) != summary:
+        # Cached dashboards still show the totals the rebuild just corrected
+        await bump_owner_versions([owner_id], DASHBOARD_VERSION)
+    # Eligibility was stored from the headcount the rebuild may have corrected
+    await evaluate_eligibility([owner_id])
+    return summary
+
+
+def _mongo_db():
+    db = getattr(storage, "db", None)
+    if db is None:
+        typer.echo(f"Index commands need the mongo storage backend (STORAGE_BACKEND={storage.name})", err=True)
+        raise typer.Exit(code=2)
+    return db
+
+
+@cli.command("ensure-indexes")
+def ensure_indexes_command():
+    """Create missing indexes and rebuild any whose definition has changed"""
+    created = _run(ensure_indexes(_mongo_db(), rebuild=True))
+    if not created:
+        typer.echo("All indexes already up to date")
+    for collection, names in created.items():
+        typer.echo(f"{collection}: created {', '.join(names)}")
+
+
+@cli.command("verify-indexes")
+def verify_indexes_command():
+    """Explain every route's query shape and fail on any COLLSCAN or in-memory SORT"""
+    try:
+        plans = _run(verify_query_plans(_mongo_db()))
+    except QueryPlanError as exc:
+        typer.echo(str(exc), err=True)
+        raise typer.Exit(code=1)
+    for route, stages in plans.items():
+        typer.echo(f"{route}: {' -> '.join(stages)}")
+
+
+@cli.command("rebuild-rollups")
+def rebuild_rollups_command(
+    owner_id: str = typer.Option(None, help="Rebuild only this business owner's rollup"),
+):
+    """Rebuild roster rollups from the employees collection and re-evaluate eligibility"""
+    if owner_id:
+        summary = _run(_rebuild_owner(owner_id))
+        typer.echo(f"{owner_id}: {summary.employee_count} employees, {summary.total_salaries:.2f} payroll")
+    else:
+        count = _run(rebuild_all_roster_rollups())
+        typer.echo(f"Rebuilt {count} roster rollups")
+
+
+@cli.command("rebuild-funnel")
+def rebuild_funnel_command():
+    """Backfill the lead funnel rollups from the leads, owners and applications"""
+    count = _run(storage.funnel.rebuild())
+    typer.echo(f"Rebuilt {count} funnel rollup rows")
+
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,194 @@
+"""Prometheus metrics for HTTP requests and MongoDB commands.
+
+`PrometheusMiddleware` records request counts, latency histograms and
+in-flight gauges labelled by route template (e.g. `/api/employees/{employee_id}`)
+rather than raw path, so label cardinality stays bounded. It also publishes
+the current route in `current_route`, which `MongoCommandMetrics` (a PyMongo
+command listener) attaches to every command's duration and document count so
+the queries behind each endpoint can be told apart. Motor runs PyMongo in an
+executor with the caller's context copied, so the route survives the hop.
+"""
+import time
+from contextvars import ContextVar
+from typing import Any, Dict, Optional, Tuple
+
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest
+from pymongo import monitoring
+from starlette.requests import Request
+from starlette.responses import Response
+from starlette.routing import Match
+
+UNMATCHED_ROUTE = "unmatched"
+NO_ROUTE = "none"
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COMMAND_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0)
+
+REQUESTS = Counter(
+    "http_requests_total", "HTTP requests handled", ["method", "route", "status"]
+)
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds", "HTTP request latency, until the response body is sent",
+    ["method", "route", "status"], buckets=LATENCY_BUCKETS,
+)
+REQUESTS_IN_PROGRESS = Gauge(
+    "http_requests_in_progress", "HTTP requests currently being handled", ["method", "route"]
+)
+MONGO_COMMAND_LATENCY = Histogram(
+    "mongo_command_duration_seconds", "MongoDB command round-trip time",
+    ["collection", "command", "route"], buckets=COMMAND_BUCKETS,
+)
+MONGO_DOCUMENTS_RETURNED = Counter(
+    "mongo_command_documents_returned_total", "Documents returned by MongoDB commands",
+    ["collection", "command", "route"],
+)
+MONGO_COMMAND_FAILURES = Counter(
+    "mongo_command_failures_total", "MongoDB commands that failed", ["collection", "command", "route"]
+)
+WRITE_BUFFER_PENDING = Gauge(
+    "write_buffer_pending", "Documents accepted by a write-behind buffer but not yet written", ["buffer"]
+)
+WRITE_BUFFER_FLUSHED = Gauge(
+    "write_buffer_flushed", "Documents written by a write-behind buffer since startup", ["buffer"]
+)
+WRITE_BUFFER_REJECTED = Gauge(
+    "write_buffer_rejected", "Documents a write-behind buffer turned away while full", ["buffer"]
+)
+ADMISSION_QUEUE_WAIT = Histogram(
+    "admission_queue_wait_seconds", "Time admitted requests waited for a concurrency slot",
+    ["route"], buckets=LATENCY_BUCKETS,
+)
+ADMISSION_REJECTED = Counter(
+    "admission_rejected_total", "Requests turned away by admission control", ["route", "reason"]
+)
+ADMISSION_IN_FLIGHT = Gauge(
+    "admission_in_flight", "Requests holding an admission slot", ["route"]
+)
+ADMISSION_QUEUED = Gauge(
+    "admission_queued", "Requests waiting for an admission slot", ["route"]
+)
+
+# Route template of the request being handled, for labelling database work
+current_route: ContextVar[str] = ContextVar("current_route", default=NO_ROUTE)
+
+# Commands whose first argument is not the collection name
+_COLLECTION_ARGUMENT = {"getMore": "collection"}
+
+
+def match_route(scope) -> Tuple[str, Dict[str, Any]]:
+    """The path template and path parameters of the route that will handle `scope`"""
+    app = scope.get("app")
+    router = getattr(app, "router", None)
+    for route in getattr(router, "routes", ()):
+        match, child_scope = route.matches(scope)
+        if match == Match.FULL:
+            return route.path, child_scope.get("path_params", {})
+    return UNMATCHED_ROUTE, {}
+
+
+def route_template(scope) -> str:
+    """The path template of the route that will handle `scope`"""
+    return match_route(scope)[0]
+
+
+class PrometheusMiddleware:
+    """ASGI middleware recording per-route request metrics"""
+
+    def __init__(self, app, skip_paths: Tuple[str, ...] = ("/metrics",)):
+        self.app = app
+        self.skip_paths = skip_paths
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in self.skip_paths:
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        route = route_template(scope)
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        token = current_route.set(route)
+        in_progress = REQUESTS_IN_PROGRESS.labels(method, route)
+        in_progress.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            in_progress.dec()
+            current_route.reset(token)
+            status = str(status_code)
+            REQUESTS.labels(method, route, status).inc()
+            REQUEST_LATENCY.labels(method, route, status).observe(elapsed)
+
+
+def _documents_returned(command_name: str, reply) -> int:
+    cursor = reply.get("cursor")
+    if cursor is not None:
+        return len(cursor.get("firstBatch") or cursor.get("nextBatch") or ())
+    if command_name == "findAndModify":
+        return 1 if reply.get("value") is not None else 0
+    return 0
+
+
+class MongoCommandMetrics(monitoring.CommandListener):
+    """Records duration and documents returned for every MongoDB command"""
+
+    def __init__(self):
+        self._pending: Dict[Tuple[Optional[object], int], Tuple[str, str]] = {}
+
+    @staticmethod
+    def _key(event):
+        return event.connection_id, event.request_id
+
+    def started(self, event):
+        argument = _COLLECTION_ARGUMENT.get(event.command_name, event.command_name)
+        collection = event.command.get(argument)
+        if not isinstance(collection, str):
+            collection = "-"
+        self._pending[self._key(event)] = (collection, current_route.get())
+
+    def succeeded(self, event):
+        collection, route = self._pending.pop(self._key(event), ("-", current_route.get()))
+        labels = (collection, event.command_name, route)
+        MONGO_COMMAND_LATENCY.labels(*labels).observe(event.duration_micros / 1e6)
+        returned = _documents_returned(event.command_name, event.reply)
+        if returned:
+            MONGO_DOCUMENTS_RETURNED.labels(*labels).inc(returned)
+
+    def failed(self, event):
+        collection, route = self._pending.pop(self._key(event), ("-", current_route.get()))
+        labels = (collection, event.command_name, route)
+        MONGO_COMMAND_LATENCY.labels(*labels).observe(event.duration_micros / 1e6)
+        MONGO_COMMAND_FAILURES.labels(*labels).inc()
+
+
+def register_mongo_listener() -> MongoCommandMetrics:
+    """Install the command listener for every MongoClient created afterwards"""
+    listener = MongoCommandMetrics()
+    monitoring.register(listener)
+    return listener
+
+
+def track_write_buffer(buffer):
+    """Publish a WriteBehindBuffer's depth and totals, read at scrape time"""
+    WRITE_BUFFER_PENDING.labels(buffer.name).set_function(lambda: buffer.pending)
+    WRITE_BUFFER_FLUSHED.labels(buffer.name).set_function(lambda: buffer.flushed)
+    WRITE_BUFFER_REJECTED.labels(buffer.name).set_function(lambda: buffer.rejected)
+
+
+def track_admission(limiter):
+    """Publish a RouteLimiter's occupancy, read at scrape time"""
+    ADMISSION_IN_FLIGHT.labels(limiter.name).set_function(lambda: limiter.in_flight)
+    ADMISSION_QUEUED.labels(limiter.name).set_function(lambda: limiter.queued)
+
+
+async def metrics_endpoint(request: Request) -> Response:
+    """Prometheus text exposition of every registered metric"""
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,118 @@
+"""Keyset pagination and NDJSON streaming for list endpoints.
+
+Pages are ordered by (created_at, id) and continued with an opaque cursor that
+encodes the last row's sort key, so every page is an index range scan no
+matter how deep the client pages. Clients that send
+`Accept: application/x-ndjson` get documents streamed straight from the
+storage backend instead of a buffered JSON array. Either way, documents are
+encoded directly rather than through a model per row.
+"""
+import base64
+import json
+from datetime import datetime
+from typing import Any, AsyncIterator, Callable, Dict, Optional
+
+from fastapi import HTTPException, Request
+from fastapi.responses import Response, StreamingResponse
+
+from documents import documents_response, dumps, shape_for
+from storage.base import Position
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+DEFAULT_PAGE_SIZE = 1000
+MAX_PAGE_SIZE = 1000
+# Documents per write when streaming NDJSON
+NDJSON_CHUNK_SIZE = 500
+
+
+def encode_cursor(doc: Dict[str, Any]) -> str:
+    payload = json.dumps({"created_at": doc["created_at"].isoformat(), "id": doc["id"]})
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Dict[str, Any]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return {"created_at": datetime.fromisoformat(payload["created_at"]), "id": str(payload["id"])}
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def cursor_position(cursor: Optional[str]) -> Optional[Position]:
+    """The (created_at, id) keyset position a cursor points after, if any"""
+    if not cursor:
+        return None
+    position = decode_cursor(cursor)
+    return position["created_at"], position["id"]
+
+
+def wants_ndjson(request: Request) -> bool:
+    return NDJSON_MEDIA_TYPE in request.headers.get("accept", "")
+
+
+async def _ndjson_lines(docs: AsyncIterator[Dict[str, Any]], model) -> AsyncIterator[bytes]:
+    shape = shape_for(model)
+    lines = []
+    async for doc in docs:
+        lines.append(dumps(shape(doc)))
+        if len(lines) >= NDJSON_CHUNK_SIZE:
+            yield b"\n".join(lines) + b"\n"
+            lines = []
+    if lines:
+        yield b"\n".join(lines) + b"\n"
+
+
+def ndjson_response(docs: AsyncIterator[Dict[str, Any]], model) -> StreamingResponse:
+    """Stream stored documents as newline-delimited JSON shaped like `model`"""
+    return StreamingResponse(_ndjson_lines(docs, model), media_type=NDJSON_MEDIA_TYPE)
+
+
+def _set_next_headers(request: Request, headers, last_doc, limit: int):
+    next_cursor = encode_cursor(last_doc)
+    headers["X-Next-Cursor"] = next_cursor
+    next_url = request.url.include_query_params(cursor=next_cursor, limit=limit)
+    headers["Link"] = f'<{next_url}>; rel="next"'
+
+
+async def list_page(request: Request, fetch: Callable[..., AsyncIterator[Dict[str, Any]]], model,
+                    cursor: Optional[str] = None, limit: Optional[int] = None) -> Response:
+    """Return one keyset page from `fetch(after, limit)`, or an NDJSON stream if the client asked for one.
+
+    `fetch` is a storage repository's page method; its documents are sent
+    as `model` without being revalidated (see documents.py). JSON pages
+    carry the cursor for the next page in the `X-Next-Cursor` header (and a
+    `Link: rel="next"` header) when more rows remain.
+    """
+    after = cursor_position(cursor)
+
+    if wants_ndjson(request):
+        return ndjson_response(fetch(after, limit), model)
+
+    limit = limit or DEFAULT_PAGE_SIZE
+    docs = [doc async for doc in fetch(after, limit + 1)]
+    headers = {}
+    if len(docs) > limit:
+        docs = docs[:limit]
+        _set_next_headers(request, headers, docs[-1], limit)
+    return documents_response(docs, model, headers)
+
+
+def page_models(request: Request, response, models, cursor: Optional[str] = None,
+                limit: Optional[int] = None):
+    """Keyset page over models already held in memory, sorted by (created_at, id)"""
+    after = cursor_position(cursor)
+    if after:
+        models = [model for model in models if (model.created_at, model.id) > after]
+
+    if wants_ndjson(request):
+        if limit:
+            models = models[:limit]
+        lines = "".join(model.model_dump_json() + "\n" for model in models)
+        return Response(content=lines, media_type=NDJSON_MEDIA_TYPE)
+
+    limit = limit or DEFAULT_PAGE_SIZE
+    if len(models) > limit:
+        models = models[:limit]
+        _set_next_headers(request, response.headers, models[-1].dict(), limit)
+    return models
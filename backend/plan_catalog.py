@@ -0,0 +1,75 @@
+"""In-process cache of the benefit plan catalog.
+
+The catalog is a handful of rows that almost never change, so it is loaded
+once, indexed by id and by plan type, and served from memory. Writes through
+the API invalidate it; a TTL picks up changes made outside the API (or by
+another worker process).
+"""
+import asyncio
+import hashlib
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+
+class PlanCatalog:
+    def __init__(self, loader: Callable[[], Awaitable[List[Dict[str, Any]]]], model, ttl_seconds: float = 300.0):
+        self._loader = loader
+        self._model = model
+        self.ttl_seconds = ttl_seconds
+        self._by_id: Dict[str, Any] = {}
+        self._active_by_type: Dict[str, List[Any]] = {}
+        self._active: List[Any] = []
+        self._loaded_at: Optional[float] = None
+        self._version: Optional[str] = None
+        self._lock = asyncio.Lock()
+
+    @property
+    def is_fresh(self) -> bool:
+        return self._loaded_at is not None and time.monotonic() - self._loaded_at < self.ttl_seconds
+
+    async def refresh(self):
+        """Reload the catalog from the database"""
+        docs = await self._loader()
+        plans = sorted((self._model(**doc) for doc in docs), key=lambda plan: (plan.created_at, plan.id))
+        by_id = {plan.id: plan for plan in plans}
+        active = [plan for plan in plans if plan.is_active]
+        active_by_type: Dict[str, List[Any]] = {}
+        for plan in active:
+            active_by_type.setdefault(plan.plan_type.value, []).append(plan)
+
+        # Content hash, so every worker derives the same version from the same plans
+        version = hashlib.sha256()
+        for plan in plans:
+            version.update(plan.model_dump_json().encode())
+
+        self._by_id, self._active, self._active_by_type = by_id, active, active_by_type
+        self._version = version.hexdigest()
+        self._loaded_at = time.monotonic()
+
+    async def _ensure_fresh(self):
+        if self.is_fresh:
+            return
+        async with self._lock:
+            # Another request may have reloaded while this one waited
+            if not self.is_fresh:
+                await self.refresh()
+
+    def invalidate(self):
+        self._loaded_at = None
+
+    async def version(self) -> str:
+        """Hash of the catalog contents; changes whenever a plan does"""
+        await self._ensure_fresh()
+        return self._version
+
+    async def get(self, plan_id: str):
+        """Plan by id, including inactive plans"""
+        await self._ensure_fresh()
+        return self._by_id.get(plan_id)
+
+    async def active(self, plan_type: Optional[str] = None) -> List[Any]:
+        """Active plans ordered by (created_at, id), optionally of one type"""
+        await self._ensure_fresh()
+        if plan_type is None:
+            return list(self._active)
+        return list(self._active_by_type.get(plan_type, []))
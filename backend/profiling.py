@@ -0,0 +1,91 @@
+"""Opt-in profiling of individual requests.
+
+Profiling is off unless `PROFILING_TOKEN` is set. A request is then profiled
+when it carries that token in an `X-Profile` header; it is never read from the
+query string, which ends up in access logs and browser history. The handler is
+sampled with pyinstrument and a speedscope profile is written to
+`PROFILE_DIR/<request id>.speedscope.json`. The request id is
+taken from `X-Request-ID` when the client sends one, and both it and the
+profile file name are echoed in the response headers. Requests without the
+token (or with a wrong one) run untouched.
+"""
+import asyncio
+import hmac
+import logging
+import os
+import re
+import uuid
+from pathlib import Path
+from typing import Optional
+
+from pyinstrument import Profiler
+from pyinstrument.renderers import SpeedscopeRenderer
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = b"x-profile"
+REQUEST_ID_HEADER = b"x-request-id"
+# Client-supplied request ids become file names, so only a safe subset is accepted
+REQUEST_ID_PATTERN = re.compile(r"^[A-Za-z0-9_.-]{1,128}$")
+DEFAULT_PROFILE_DIR = Path(__file__).parent / "profiles"
+
+
+class ProfilingMiddleware:
+    """ASGI middleware that samples requests carrying the profiling token"""
+
+    def __init__(self, app, token: Optional[str] = None, directory: Optional[str] = None,
+                 interval: Optional[float] = None, max_concurrent: Optional[int] = None):
+        self.app = app
+        self.token = token if token is not None else os.environ.get('PROFILING_TOKEN', '')
+        self.directory = Path(directory or os.environ.get('PROFILE_DIR', DEFAULT_PROFILE_DIR))
+        self.interval = interval or float(os.environ.get('PROFILE_INTERVAL_SECONDS', '0.001'))
+        self.max_concurrent = max_concurrent or int(os.environ.get('PROFILE_MAX_CONCURRENT', '2'))
+        self.active = 0
+
+    def _requested(self, scope) -> bool:
+        if not self.token:
+            return False
+        supplied = dict(scope["headers"]).get(PROFILE_HEADER, b"").decode("latin-1")
+        return bool(supplied) and hmac.compare_digest(supplied, self.token)
+
+    @staticmethod
+    def _request_id(scope) -> str:
+        supplied = dict(scope["headers"]).get(REQUEST_ID_HEADER, b"").decode("latin-1")
+        return supplied if REQUEST_ID_PATTERN.match(supplied) else uuid.uuid4().hex
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self._requested(scope):
+            await self.app(scope, receive, send)
+            return
+
+        request_id = self._request_id(scope)
+        if self.active >= self.max_concurrent:
+            await self.app(scope, receive, self._with_headers(send, [
+                (b"x-request-id", request_id.encode()), (b"x-profile-skipped", b"busy"),
+            ]))
+            return
+
+        filename = f"{request_id}.speedscope.json"
+        send = self._with_headers(send, [(b"x-request-id", request_id.encode()), (b"x-profile", filename.encode())])
+        profiler = Profiler(interval=self.interval, async_mode="enabled")
+        self.active += 1
+        profiler.start()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            profiler.stop()
+            self.active -= 1
+            await asyncio.to_thread(self._save, profiler, filename)
+            logger.info("Profiled %s %s as %s", scope["method"], scope["path"], self.directory / filename)
+
+    def _save(self, profiler: Profiler, filename: str):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        (self.directory / filename).write_text(profiler.output(renderer=SpeedscopeRenderer()))
+
+    @staticmethod
+    def _with_headers(send, headers):
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = [*message.get("headers", []), *headers]
+            await send(message)
+        return send_wrapper
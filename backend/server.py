@@ -1,30 +1,108 @@
-from fastapi import FastAPI, APIRouter, HTTPException, status
+import time
+# Taken before anything else is imported, for the startup-time breakdown
+IMPORT_STARTED = time.perf_counter()
+
+from fastapi import FastAPI, APIRouter, HTTPException, status, UploadFile, File, Header, Query, Request, Response
+from fastapi.responses import StreamingResponse
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
-from motor.motor_asyncio import AsyncIOMotorClient
 import os
+import io
+import csv
+import json
+import hashlib
+import asyncio
 import logging
 from pathlib import Path
-from pydantic import BaseModel, Field, EmailStr
-from typing import List, Optional, Dict, Any
+from pydantic import BaseModel, Field, EmailStr, ValidationError
+from typing import List, Optional, Dict, Any, Callable, Iterable, Tuple
 import uuid
-from datetime import datetime, date
+from contextlib import asynccontextmanager
+from datetime import datetime, date, timedelta
 from enum import Enum
 
+import eligibility
+import fica_engine
+from admission import AdmissionMiddleware
+from conditional import conditional_get
+from idempotency import IDEMPOTENCY_KEY_HEADER, IDEMPOTENCY_KEY_MAX_LENGTH, idempotent
+from jobs import Job, JobRegistry, JobState
+from metrics import PrometheusMiddleware, metrics_endpoint, register_mongo_listener, track_write_buffer
+from documents import document_response, documents_response
+import exports
+from exports import ExportFormat
+from pagination import list_page, page_models, MAX_PAGE_SIZE
+from plan_catalog import PlanCatalog
+from profiling import ProfilingMiddleware
+from storage import get_storage
+from storage.base import FunnelKey, application_counter, funnel_counts, funnel_key, roster_totals
+from write_buffer import BufferClosed, BufferFull, WriteBehindBuffer
+
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
-# MongoDB connection
-mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ['DB_NAME']]
+# Record timings for every MongoDB command issued from here on
+register_mongo_listener()
+
+# Storage backend (MongoDB unless STORAGE_BACKEND says otherwise)
+storage = get_storage()
+
+# Startup and shutdown run from the lifespan; both are defined at the end of this module
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await start_app()
+    try:
+        yield
+    finally:
+        await stop_app()
 
 # Create the main app without a prefix
-app = FastAPI(title="FICA Reduction Program API", version="1.0.0")
+app = FastAPI(title="FICA Reduction Program API", version="1.0.0", lifespan=lifespan)
+# Set once startup has finished and cleared when shutdown begins (see /api/ready)
+app.state.ready = False
 
 # Create a router with the /api prefix
 api_router = APIRouter(prefix="/api")
 
+# Background jobs started by the API (batch calculations and the like)
+job_registry = JobRegistry(
+    storage.jobs,
+    retention_seconds=float(os.environ.get('JOB_RETENTION_SECONDS', '86400')),
+    progress_interval=float(os.environ.get('JOB_PROGRESS_INTERVAL_SECONDS', '1')),
+)
+
+# Lead funnel rollups, counted as leads, owners and applications are written
+async def record_funnel(entries: Iterable[Tuple[FunnelKey, str, int]], batch_id: Optional[str] = None):
+    """Add (rollup key, counter, delta) entries to the daily funnel rollups, at most once per `batch_id`"""
+    await storage.funnel.increment(funnel_counts(entries), datetime.utcnow(), batch_id)
+
+def lead_funnel_entries(leads: List[Dict[str, Any]]):
+    return [
+        (funnel_key(lead["created_at"], lead.get("industry"), lead["number_of_employees"]), "leads", 1)
+        for lead in leads
+    ]
+
+async def store_leads(leads: List[Dict[str, Any]]):
+    """Insert a batch of leads and count them into the funnel rollups.
+
+    The write-behind buffer retries a failed batch as a whole; the batch id,
+    derived from the lead ids, keeps the retry from counting leads twice.
+    """
+    await storage.leads.insert_many(leads)
+    batch_id = hashlib.sha256("\x1f".join(lead["id"] for lead in leads).encode()).hexdigest()
+    await record_funnel(lead_funnel_entries(leads), batch_id)
+
+# Opt-in write-behind lead ingestion: leads are acknowledged once buffered and inserted in batches
+lead_buffer = WriteBehindBuffer(
+    "leads",
+    store_leads,
+    max_size=int(os.environ.get('LEAD_BUFFER_MAX_SIZE', '10000')),
+    batch_size=int(os.environ.get('LEAD_BUFFER_BATCH_SIZE', '500')),
+    flush_interval=float(os.environ.get('LEAD_BUFFER_FLUSH_INTERVAL_SECONDS', '0.25')),
+    put_timeout=float(os.environ.get('LEAD_BUFFER_PUT_TIMEOUT_SECONDS', '0.1')),
+) if os.environ.get('LEAD_WRITE_BEHIND', '').lower() in ('1', 'true', 'yes') else None
+LEAD_BUFFER_RETRY_AFTER_SECONDS = 1
+
 # Enums
 class BusinessType(str, Enum):
     CORPORATION = "corporation"
@@ -140,6 +218,17 @@ class EmployeeCreate(BaseModel):
     current_health_premium: Optional[float] = None
     current_life_premium: Optional[float] = None
 
+class EmployeeImportRowError(BaseModel):
+    row: int
+    errors: List[str]
+
+class EmployeeImportResult(BaseModel):
+    business_owner_id: str
+    total_rows: int = 0
+    imported: int = 0
+    failed: int = 0
+    errors: List[EmployeeImportRowError] = []
+
 class BenefitPlan(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     name: str
@@ -171,8 +260,54 @@ class FICACalculation(BaseModel):
     health_benefit_cost: float
     life_insurance_cost: float
     net_savings: float
+    social_security_savings: float = 0.0
+    medicare_savings: float = 0.0
+    employee_fica_savings: float = 0.0
+    roster_fingerprint: Optional[str] = None
+    # fica_engine.ENGINE_VERSION that produced the figures; None for calculations stored before it was recorded
+    engine_version: Optional[str] = None
     calculation_date: datetime = Field(default_factory=datetime.utcnow)
 
+class EmployeeFICABreakdown(BaseModel):
+    employee_id: str
+    name: str
+    annual_salary: float
+    pretax_benefits: float
+    social_security_savings: float
+    medicare_savings: float
+    employer_fica_savings: float
+    employee_fica_savings: float
+
+class FICACalculationDetail(FICACalculation):
+    employee_breakdown: List[EmployeeFICABreakdown] = []
+
+class FICABatchRequest(BaseModel):
+    owner_ids: Optional[List[str]] = None
+    health_plan_id: Optional[str] = None
+    life_plan_id: Optional[str] = None
+    concurrency: int = Field(default=4, ge=1, le=32)
+
+class FICAScenario(BaseModel):
+    rank: int = 0
+    health_plan_id: Optional[str] = None
+    health_plan_name: Optional[str] = None
+    life_plan_id: Optional[str] = None
+    life_plan_name: Optional[str] = None
+    projected_fica_savings: float
+    employee_fica_savings: float
+    health_benefit_cost: float
+    life_insurance_cost: float
+    # Employees' current annual premiums on the lines this scenario puts a plan on
+    replaced_premiums: float = 0.0
+    net_savings: float
+
+class FICAScenarioComparison(BaseModel):
+    business_owner_id: str
+    employee_count: int
+    total_employee_salaries: float
+    scenarios: List[FICAScenario]
+    selected_calculation: Optional[FICACalculation] = None
+
 class Application(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     business_owner_id: str
@@ -192,84 +327,469 @@ class ApplicationCreate(BaseModel):
     selected_life_plan_id: Optional[str] = None
     notes: Optional[str] = None
 
+# Status changes an application may make; anything else is rejected
+APPLICATION_TRANSITIONS: Dict[ApplicationStatus, List[ApplicationStatus]] = {
+    ApplicationStatus.DRAFT: [ApplicationStatus.SUBMITTED],
+    ApplicationStatus.SUBMITTED: [ApplicationStatus.UNDER_REVIEW, ApplicationStatus.DRAFT],
+    ApplicationStatus.UNDER_REVIEW: [ApplicationStatus.APPROVED, ApplicationStatus.REJECTED],
+    ApplicationStatus.REJECTED: [ApplicationStatus.DRAFT],
+    ApplicationStatus.APPROVED: [],
+}
+
+def statuses_leading_to(status: ApplicationStatus) -> List[str]:
+    """Statuses an application may move to `status` from"""
+    return [current.value for current, allowed in APPLICATION_TRANSITIONS.items() if status in allowed]
+
 class ApplicationUpdate(BaseModel):
     status: Optional[ApplicationStatus] = None
     selected_health_plan_id: Optional[str] = None
     selected_life_plan_id: Optional[str] = None
     notes: Optional[str] = None
 
+class ExportCollection(str, Enum):
+    BUSINESS_OWNERS = "business_owners"
+    EMPLOYEES = "employees"
+    FICA_CALCULATIONS = "fica_calculations"
+
+class ExportRequest(BaseModel):
+    collection: ExportCollection
+    format: ExportFormat = ExportFormat.PARQUET
+    business_owner_ids: Optional[List[str]] = None
+    industry: Optional[IndustryType] = None
+    state: Optional[str] = None
+    created_from: Optional[datetime] = None
+    created_to: Optional[datetime] = None
+
+class ApplicationTransitionRequest(BaseModel):
+    ids: List[str] = Field(min_length=1, max_length=1000)
+    status: ApplicationStatus
+
+class TransitionOutcome(str, Enum):
+    UPDATED = "updated"
+    UNCHANGED = "unchanged"
+    NOT_FOUND = "not_found"
+    INVALID_TRANSITION = "invalid_transition"
+    CONFLICT = "conflict"
+
+class ApplicationTransitionResult(BaseModel):
+    id: str
+    outcome: TransitionOutcome
+    previous_status: Optional[ApplicationStatus] = None
+    status: Optional[ApplicationStatus] = None
+
+class ApplicationTransitionSummary(BaseModel):
+    status: ApplicationStatus
+    updated: int
+    results: List[ApplicationTransitionResult]
+
+class RosterSummary(BaseModel):
+    employee_count: int = 0
+    total_salaries: float = 0.0
+    health_insured_count: int = 0
+    life_insured_count: int = 0
+    health_premium_total: float = 0.0
+    life_premium_total: float = 0.0
+
+class DashboardCalculation(BaseModel):
+    id: str
+    projected_fica_savings: float
+    annual_savings: float
+    net_savings: float
+    calculation_date: datetime
+
+class DashboardApplication(BaseModel):
+    id: str
+    status: ApplicationStatus
+    total_employees: int = 0
+    estimated_annual_savings: float = 0.0
+    submitted_at: Optional[datetime] = None
+    created_at: datetime
+
+class DashboardSummary(BaseModel):
+    business_name: str
+    employee_count: int
+    applications_count: int
+    latest_calculation: Optional[DashboardCalculation] = None
+    recent_applications: List[DashboardApplication] = []
+
+class EligibilityResult(BaseModel):
+    business_owner_id: str
+    business_name: str
+    industry: IndustryType
+    years_in_business: int
+    employee_count: int
+    eligible: bool
+    reasons: List[str]
+    rules_version: int
+    evaluated_at: datetime
+    created_at: datetime
+
+class EligibilityEvaluationRequest(BaseModel):
+    owner_ids: Optional[List[str]] = None
+
+class FunnelDimension(str, Enum):
+    DAY = "day"
+    INDUSTRY = "industry"
+    EMPLOYEE_BAND = "employee_band"
+
+class FunnelRow(BaseModel):
+    day: Optional[str] = None
+    industry: Optional[str] = None
+    employee_band: Optional[str] = None
+    leads: int = 0
+    business_owners: int = 0
+    applications: Dict[ApplicationStatus, int] = Field(
+        default_factory=lambda: dict.fromkeys(ApplicationStatus, 0)
+    )
+    owner_conversion_rate: Optional[float] = None
+
+class FunnelReport(BaseModel):
+    since: date
+    until: date
+    group_by: List[FunnelDimension]
+    rows: List[FunnelRow]
+    totals: FunnelRow
+
+DASHBOARD_RECENT_APPLICATIONS = 3
+DASHBOARD_CALCULATION_FIELDS = list(DashboardCalculation.model_fields)
+DASHBOARD_APPLICATION_FIELDS = list(DashboardApplication.model_fields)
+
+# Benefit plan catalog, served from memory and reloaded on writes or after the TTL
+plan_catalog = PlanCatalog(
+    storage.plans.all,
+    BenefitPlan,
+    ttl_seconds=float(os.environ.get('PLAN_CATALOG_TTL_SECONDS', '300')),
+)
+
+# Roster statistics
+async def aggregate_roster_summary(owner_id: str) -> RosterSummary:
+    """Compute an owner's roster totals from the employees themselves"""
+    totals = await storage.employees.summarize(owner_id)
+    return RosterSummary(**totals)
+
+def roster_delta(employees: List[Dict[str, Any]], sign: int = 1) -> Dict[str, Any]:
+    """Increment adding (or, with sign=-1, removing) employees from a rollup"""
+    return {field: sign * value for field, value in roster_totals(employees).items()}
+
+async def rebuild_roster_rollup(owner_id: str) -> RosterSummary:
+    """Recompute one owner's rollup from its employees and store it"""
+    summary = await aggregate_roster_summary(owner_id)
+    await storage.rollups.put(owner_id, summary.dict(), datetime.utcnow())
+    return summary
+
+async def apply_roster_delta(owner_id: str, delta: Dict[str, Any]) -> RosterSummary:
+    """Atomically adjust an owner's rollup after employees are written or removed; returns the new totals"""
+    rollup = await storage.rollups.increment(owner_id, delta, datetime.utcnow())
+    if rollup is None:
+        # Owners created before rollups existed get one built from scratch
+        return await rebuild_roster_rollup(owner_id)
+    return RosterSummary(**rollup)
+
+async def get_roster_summary(owner_id: str) -> RosterSummary:
+    """Headcount, payroll and insurance totals for an owner's roster, from its rollup document"""
+    rollup = await storage.rollups.get(owner_id)
+    if rollup is None:
+        return await rebuild_roster_rollup(owner_id)
+    return RosterSummary(**rollup)
+
+async def rebuild_all_roster_rollups() -> int:
+    """Rebuild every owner's rollup from the employees; returns the number rebuilt.
+
+    Owners whose totals the rebuild corrected get their dashboard version
+    bumped, and eligibility is re-evaluated, since it was stored from the
+    headcounts the rebuild may just have corrected.
+    """
+    rebuilt, changed = await storage.rollups.rebuild_all()
+    if changed:
+        await bump_owner_versions(changed, DASHBOARD_VERSION)
+    await evaluate_eligibility()
+    return rebuilt
+
+# Owner version markers, bumped by the writes that change what each polled view shows
+APPLICATIONS_VERSION = "applications"
+DASHBOARD_VERSION = "dashboard"
+# Bumped by every employee write; keys the FICA calculation memo
+ROSTER_VERSION = "roster"
+
+def format_version(record: Dict[str, Any], marker: str) -> str:
+    # Records created before a marker existed have not been bumped for it yet
+    return f'{record["epoch"]}:{record.get(marker, 0)}'
+
+async def owner_version(owner_id: str, marker: str) -> Optional[str]:
+    """The owner's current `marker` version, or None if the owner does not exist"""
+    version = await storage.versions.get(owner_id)
+    if version is None:
+        # Versions are created on first read, and only for owners that exist
+        if not await storage.owners.get(owner_id, ["id"]):
+            return None
+        version = await storage.versions.create(owner_id)
+    return format_version(version, marker)
+
+async def owner_versions(owner_ids: List[str], marker: str) -> Dict[str, str]:
+    """`marker` versions for owners known to exist, creating any missing records"""
+    records = {record["business_owner_id"]: record for record in await storage.versions.get_many(owner_ids)}
+    for owner_id in owner_ids:
+        if owner_id not in records:
+            records[owner_id] = await storage.versions.create(owner_id)
+    return {owner_id: format_version(records[owner_id], marker) for owner_id in owner_ids}
+
+async def bump_owner_versions(owner_ids: List[str], *markers: str):
+    await storage.versions.bump(owner_ids, markers)
+
+# Eligibility results, materialized per owner and refreshed as owners and rosters change
+async def store_eligibility(owner: Dict[str, Any], employee_count: int):
+    """Re-evaluate one owner from facts the caller already holds: its document and the headcount in its rollup"""
+    facts = eligibility.owner_facts(owner, employee_count)
+    await storage.eligibility.put_many([eligibility.eligibility_result(facts, datetime.utcnow())])
+
+# Owners evaluated and stored per write in a bulk evaluation
+ELIGIBILITY_BATCH_SIZE = 1000
+
+async def evaluate_eligibility(owner_ids: Optional[List[str]] = None,
+                               on_batch: Callable[[int], None] = lambda evaluated: None) -> Tuple[int, int]:
+    """Evaluate and store eligibility for many (or all) owners; returns (evaluated, eligible)"""
+    evaluated_at = datetime.utcnow()
+    evaluated = 0
+    eligible = 0
+    batch = []
+    
+    async def flush():
+        nonlocal batch, evaluated
+        await storage.eligibility.put_many(batch)
+        evaluated += len(batch)
+        on_batch(len(batch))
+        batch = []
+    
+    async for facts in storage.eligibility.facts(owner_ids):
+        result = eligibility.eligibility_result(facts, evaluated_at)
+        eligible += result["eligible"]
+        batch.append(result)
+        if len(batch) >= ELIGIBILITY_BATCH_SIZE:
+            await flush()
+    await flush()
+    return evaluated, eligible
+
+# Optional Idempotency-Key header accepted by the create endpoints
+IDEMPOTENCY_KEY = Header(None, alias=IDEMPOTENCY_KEY_HEADER, min_length=1, max_length=IDEMPOTENCY_KEY_MAX_LENGTH)
+
 # Lead Endpoints
-@api_router.post("/leads", response_model=Lead)
-async def create_lead(lead_data: LeadCreate):
-    """Capture a new lead"""
+async def capture_lead(lead_data: LeadCreate) -> Lead:
+    """Store a new lead, or buffer it when write-behind ingestion is enabled"""
     lead_dict = lead_data.dict()
     lead_obj = Lead(**lead_dict)
-    await db.leads.insert_one(lead_obj.dict())
+    if lead_buffer is None:
+        await storage.leads.insert(lead_obj.dict())
+        await record_funnel(lead_funnel_entries([lead_obj.dict()]))
+        return lead_obj
+    
+    try:
+        await lead_buffer.offer(lead_obj.dict())
+    except (BufferFull, BufferClosed):
+        raise HTTPException(
+            status_code=503,
+            detail="Lead intake is at capacity, please retry",
+            headers={"Retry-After": str(LEAD_BUFFER_RETRY_AFTER_SECONDS)}
+        )
     return lead_obj
 
+@api_router.post("/leads", response_model=Lead)
+async def create_lead(lead_data: LeadCreate, idempotency_key: Optional[str] = IDEMPOTENCY_KEY):
+    """Capture a new lead"""
+    return await idempotent(
+        storage.idempotency, "create_lead", idempotency_key, lead_data, lambda: capture_lead(lead_data)
+    )
+
 @api_router.get("/leads", response_model=List[Lead])
-async def get_leads():
-    """Get all leads"""
-    leads = await db.leads.find().sort("created_at", -1).to_list(1000)
-    return [Lead(**lead) for lead in leads]
+async def get_leads(
+    request: Request,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+):
+    """Get leads, newest first, one keyset page at a time"""
+    return await list_page(request, storage.leads.page, Lead, cursor, limit)
 
 # Business Owner Endpoints
-@api_router.post("/business-owners", response_model=BusinessOwner)
-async def create_business_owner(owner_data: BusinessOwnerCreate):
-    """Create a new business owner"""
+async def insert_business_owner(owner_data: BusinessOwnerCreate) -> BusinessOwner:
     owner_dict = owner_data.dict()
     owner_obj = BusinessOwner(**owner_dict)
-    await db.business_owners.insert_one(owner_obj.dict())
+    await storage.owners.insert(owner_obj.dict())
+    await storage.rollups.put(owner_obj.id, RosterSummary().dict(), owner_obj.created_at)
+    await record_funnel([(funnel_key(owner_obj.created_at, owner_obj.industry), "business_owners", 1)])
+    await store_eligibility(owner_obj.dict(), 0)
     return owner_obj
 
+@api_router.post("/business-owners", response_model=BusinessOwner)
+async def create_business_owner(owner_data: BusinessOwnerCreate, idempotency_key: Optional[str] = IDEMPOTENCY_KEY):
+    """Create a new business owner"""
+    return await idempotent(
+        storage.idempotency, "create_business_owner", idempotency_key, owner_data,
+        lambda: insert_business_owner(owner_data)
+    )
+
 @api_router.get("/business-owners/{owner_id}", response_model=BusinessOwner)
 async def get_business_owner(owner_id: str):
     """Get business owner by ID"""
-    owner = await db.business_owners.find_one({"id": owner_id})
+    owner = await storage.owners.get(owner_id)
     if not owner:
         raise HTTPException(status_code=404, detail="Business owner not found")
-    return BusinessOwner(**owner)
+    return document_response(owner, BusinessOwner)
 
 @api_router.get("/business-owners", response_model=List[BusinessOwner])
-async def get_business_owners():
-    """Get all business owners"""
-    owners = await db.business_owners.find().to_list(1000)
-    return [BusinessOwner(**owner) for owner in owners]
+async def get_business_owners(
+    request: Request,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+):
+    """Get business owners, one keyset page at a time"""
+    return await list_page(request, storage.owners.page, BusinessOwner, cursor, limit)
 
 # Employee Endpoints
-@api_router.post("/employees", response_model=Employee)
-async def create_employee(employee_data: EmployeeCreate):
-    """Create a new employee"""
+async def insert_employee(employee_data: EmployeeCreate) -> Employee:
     # Verify business owner exists
-    owner = await db.business_owners.find_one({"id": employee_data.business_owner_id})
+    owner = await storage.owners.get(employee_data.business_owner_id, eligibility.OWNER_FIELDS)
     if not owner:
         raise HTTPException(status_code=404, detail="Business owner not found")
     
     employee_dict = employee_data.dict()
     employee_obj = Employee(**employee_dict)
-    await db.employees.insert_one(employee_obj.dict())
+    await storage.employees.insert(employee_obj.dict())
+    summary = await apply_roster_delta(employee_obj.business_owner_id, roster_delta([employee_obj.dict()]))
+    await bump_owner_versions([employee_obj.business_owner_id], DASHBOARD_VERSION, ROSTER_VERSION)
+    await store_eligibility(owner, summary.employee_count)
     return employee_obj
 
+@api_router.post("/employees", response_model=Employee)
+async def create_employee(employee_data: EmployeeCreate, idempotency_key: Optional[str] = IDEMPOTENCY_KEY):
+    """Create a new employee"""
+    return await idempotent(
+        storage.idempotency, "create_employee", idempotency_key, employee_data,
+        lambda: insert_employee(employee_data)
+    )
+
+# Rows are inserted in chunks of this size during a bulk import
+EMPLOYEE_IMPORT_BATCH_SIZE = 500
+# Per-row errors beyond this are counted but not returned
+EMPLOYEE_IMPORT_MAX_ERRORS = 1000
+
+def _iter_import_rows(upload: UploadFile, file_format: str):
+    """Yield (row_number, row_dict) pairs from a CSV or NDJSON upload without reading it all"""
+    text = io.TextIOWrapper(upload.file, encoding="utf-8-sig", newline="")
+    if file_format == "csv":
+        reader = csv.DictReader(text)
+        for row in reader:
+            # Empty CSV cells mean "not provided" so optional fields fall back to their defaults
+            yield reader.line_num, {k: v for k, v in row.items() if k and v not in (None, "")}
+    else:
+        for line_number, line in enumerate(text, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                row = json.loads(line)
+            except json.JSONDecodeError as exc:
+                yield line_number, exc
+                continue
+            yield line_number, row
+
+def _import_format(upload: UploadFile, requested: Optional[str]) -> str:
+    if requested:
+        return requested
+    content_type = (upload.content_type or "").lower()
+    filename = (upload.filename or "").lower()
+    if "ndjson" in content_type or "jsonl" in content_type or filename.endswith((".ndjson", ".jsonl", ".json")):
+        return "ndjson"
+    return "csv"
+
+@api_router.post("/employees/import/{owner_id}", response_model=EmployeeImportResult)
+async def import_employees(
+    owner_id: str,
+    file: UploadFile = File(...),
+    file_format: Optional[str] = Query(None, alias="format", pattern="^(csv|ndjson)$"),
+):
+    """Bulk import employees for a business owner from a CSV or NDJSON upload"""
+    owner = await storage.owners.get(owner_id, eligibility.OWNER_FIELDS)
+    if not owner:
+        raise HTTPException(status_code=404, detail="Business owner not found")
+
+    result = EmployeeImportResult(business_owner_id=owner_id)
+    rows = _iter_import_rows(file, _import_format(file, file_format))
+    summary = None
+
+    def record_error(row_number, messages):
+        result.failed += 1
+        if len(result.errors) < EMPLOYEE_IMPORT_MAX_ERRORS:
+            result.errors.append(EmployeeImportRowError(row=row_number, errors=messages))
+
+    def parse_batch():
+        """Parse and validate rows until a batch is full or the upload ends; runs in a worker thread"""
+        batch = []
+        for row_number, row in rows:
+            result.total_rows += 1
+            if isinstance(row, Exception):
+                record_error(row_number, [f"Invalid JSON: {row}"])
+                continue
+            if not isinstance(row, dict):
+                record_error(row_number, ["Row must be an object"])
+                continue
+            try:
+                employee_data = EmployeeCreate(**{**row, "business_owner_id": owner_id})
+            except ValidationError as exc:
+                record_error(row_number, [
+                    f"{'.'.join(str(part) for part in error['loc'])}: {error['msg']}" for error in exc.errors()
+                ])
+                continue
+            batch.append(Employee(**employee_data.dict()).dict())
+            if len(batch) >= EMPLOYEE_IMPORT_BATCH_SIZE:
+                return batch, False
+        return batch, True
+
+    # Parsing and validation are CPU-bound, so they stay off the event loop
+    done = False
+    while not done:
+        batch, done = await asyncio.to_thread(parse_batch)
+        if batch:
+            await storage.employees.insert_many(batch)
+            summary = await apply_roster_delta(owner_id, roster_delta(batch))
+            await bump_owner_versions([owner_id], DASHBOARD_VERSION, ROSTER_VERSION)
+            result.imported += len(batch)
+
+    if summary is not None:
+        await store_eligibility(owner, summary.employee_count)
+    return result
+
 @api_router.get("/employees/business/{owner_id}", response_model=List[Employee])
-async def get_employees_by_business(owner_id: str):
-    """Get all employees for a business owner"""
-    employees = await db.employees.find({"business_owner_id": owner_id}).to_list(1000)
-    return [Employee(**employee) for employee in employees]
+async def get_employees_by_business(
+    owner_id: str,
+    request: Request,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+):
+    """Get employees for a business owner, one keyset page at a time"""
+    return await list_page(
+        request, lambda after, limit: storage.employees.page_for_owner(owner_id, after, limit),
+        Employee, cursor, limit
+    )
 
 @api_router.get("/employees/{employee_id}", response_model=Employee)
 async def get_employee(employee_id: str):
     """Get employee by ID"""
-    employee = await db.employees.find_one({"id": employee_id})
+    employee = await storage.employees.get(employee_id)
     if not employee:
         raise HTTPException(status_code=404, detail="Employee not found")
-    return Employee(**employee)
+    return document_response(employee, Employee)
 
 @api_router.delete("/employees/{employee_id}")
 async def delete_employee(employee_id: str):
     """Delete an employee"""
-    result = await db.employees.delete_one({"id": employee_id})
-    if result.deleted_count == 0:
+    employee = await storage.employees.delete(employee_id)
+    if not employee:
         raise HTTPException(status_code=404, detail="Employee not found")
+    owner_id = employee["business_owner_id"]
+    summary = await apply_roster_delta(owner_id, roster_delta([employee], sign=-1))
+    await bump_owner_versions([owner_id], DASHBOARD_VERSION, ROSTER_VERSION)
+    owner = await storage.owners.get(owner_id, eligibility.OWNER_FIELDS)
+    if owner:
+        await store_eligibility(owner, summary.employee_count)
     return {"message": "Employee deleted successfully"}
 
 # Benefit Plan Endpoints
@@ -278,232 +798,742 @@ async def create_benefit_plan(plan_data: BenefitPlanCreate):
     """Create a new benefit plan"""
     plan_dict = plan_data.dict()
     plan_obj = BenefitPlan(**plan_dict)
-    await db.benefit_plans.insert_one(plan_obj.dict())
+    await storage.plans.insert(plan_obj.dict())
+    plan_catalog.invalidate()
     return plan_obj
 
 @api_router.get("/benefit-plans", response_model=List[BenefitPlan])
-async def get_benefit_plans():
-    """Get all active benefit plans"""
-    plans = await db.benefit_plans.find({"is_active": True}).to_list(1000)
-    return [BenefitPlan(**plan) for plan in plans]
+async def get_benefit_plans(
+    request: Request,
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+):
+    """Get active benefit plans, one keyset page at a time"""
+    async def build():
+        return page_models(request, response, await plan_catalog.active(), cursor, limit)
+    return await conditional_get(request, response, await plan_catalog.version(), build)
 
 @api_router.get("/benefit-plans/{plan_type}", response_model=List[BenefitPlan])
-async def get_benefit_plans_by_type(plan_type: BenefitPlanType):
+async def get_benefit_plans_by_type(plan_type: BenefitPlanType, request: Request, response: Response):
     """Get benefit plans by type"""
-    plans = await db.benefit_plans.find({
-        "plan_type": plan_type.value,
-        "is_active": True
-    }).to_list(1000)
-    return [BenefitPlan(**plan) for plan in plans]
+    return await conditional_get(
+        request, response, await plan_catalog.version(), lambda: plan_catalog.active(plan_type.value)
+    )
 
 # FICA Calculation Endpoints
-@api_router.post("/fica-calculation/{owner_id}")
-async def calculate_fica_savings(owner_id: str, health_plan_id: Optional[str] = None, life_plan_id: Optional[str] = None):
-    """Calculate FICA savings for a business owner"""
-    # Get business owner
-    owner = await db.business_owners.find_one({"id": owner_id})
-    if not owner:
-        raise HTTPException(status_code=404, detail="Business owner not found")
-    
-    # Get employees
-    employees = await db.employees.find({"business_owner_id": owner_id}).to_list(1000)
-    if not employees:
-        raise HTTPException(status_code=400, detail="No employees found for this business")
-    
-    # Calculate total employee salaries
-    total_salaries = sum(emp["annual_salary"] for emp in employees)
-    
-    # FICA tax rate (Social Security + Medicare)
-    fica_rate = 0.0765  # 7.65% (6.2% Social Security + 1.45% Medicare)
-    current_fica_tax = total_salaries * fica_rate
-    
-    # Get benefit plan costs
-    health_cost = 0.0
-    life_cost = 0.0
+async def get_plan_premiums(health_plan_id: Optional[str], life_plan_id: Optional[str]):
+    """Monthly premiums for the selected plans, None where no plan applies"""
+    health_premium = None
+    life_premium = None
     
     if health_plan_id:
-        health_plan = await db.benefit_plans.find_one({"id": health_plan_id})
+        health_plan = await plan_catalog.get(health_plan_id)
         if health_plan:
-            health_cost = health_plan["monthly_premium_per_employee"] * len(employees) * 12
+            health_premium = health_plan.monthly_premium_per_employee
     
     if life_plan_id:
-        life_plan = await db.benefit_plans.find_one({"id": life_plan_id})
+        life_plan = await plan_catalog.get(life_plan_id)
         if life_plan:
-            life_cost = life_plan["monthly_premium_per_employee"] * len(employees) * 12
-    
-    # Calculate FICA savings (simplified calculation)
-    # In reality, this would depend on specific IRS regulations
-    total_benefit_cost = health_cost + life_cost
+            life_premium = life_plan.monthly_premium_per_employee
     
-    # Estimate 30% FICA savings on benefit costs (this is a simplified calculation)
-    projected_fica_savings = total_benefit_cost * 0.30
-    annual_savings = projected_fica_savings
-    net_savings = annual_savings - total_benefit_cost
-    
-    # Create calculation record
-    calculation = FICACalculation(
+    return health_premium, life_premium
+
+def build_fica_calculation(owner_id: str, result: Dict[str, Any], fingerprint: Optional[str] = None) -> FICACalculation:
+    """Build the stored calculation record from a fica_engine result"""
+    total_benefit_cost = result["health_benefit_cost"] + result["life_insurance_cost"]
+    annual_savings = result["projected_fica_savings"]
+    return FICACalculation(
         business_owner_id=owner_id,
-        total_employee_salaries=total_salaries,
-        current_fica_tax=current_fica_tax,
-        projected_fica_savings=projected_fica_savings,
+        roster_fingerprint=fingerprint,
+        engine_version=fica_engine.ENGINE_VERSION,
+        total_employee_salaries=result["total_employee_salaries"],
+        current_fica_tax=result["current_fica_tax"],
+        projected_fica_savings=result["projected_fica_savings"],
         annual_savings=annual_savings,
-        health_benefit_cost=health_cost,
-        life_insurance_cost=life_cost,
-        net_savings=net_savings
+        health_benefit_cost=result["health_benefit_cost"],
+        life_insurance_cost=result["life_insurance_cost"],
+        net_savings=annual_savings - total_benefit_cost,
+        social_security_savings=result["social_security_savings"],
+        medicare_savings=result["medicare_savings"],
+        employee_fica_savings=result["employee_fica_savings"]
+    )
+
+# Owners per grouped employee read in a batch calculation
+FICA_BATCH_OWNER_CHUNK = 200
+
+async def run_fica_batch(job: Job, request: FICABatchRequest):
+    """Recalculate FICA savings for many owners with bounded concurrency"""
+    health_premium, life_premium = await get_plan_premiums(request.health_plan_id, request.life_plan_id)
+    job.total = await storage.owners.count(request.owner_ids)
+
+    chunks: asyncio.Queue = asyncio.Queue(maxsize=request.concurrency * 2)
+    found_owner_ids = set()
+    written = 0
+    reused = 0
+    skipped = 0
+
+    async def produce():
+        chunk = []
+        async for owner_id in storage.owners.iter_ids(request.owner_ids):
+            found_owner_ids.add(owner_id)
+            chunk.append(owner_id)
+            if len(chunk) >= FICA_BATCH_OWNER_CHUNK:
+                await chunks.put(chunk)
+                chunk = []
+        if chunk:
+            await chunks.put(chunk)
+        for _ in range(request.concurrency):
+            await chunks.put(None)
+
+    def calculate_chunk(pending):
+        return [
+            build_fica_calculation(
+                owner_id, fica_engine.calculate(roster, health_premium, life_premium), fingerprint
+            ).dict()
+            for owner_id, (roster, fingerprint) in pending.items()
+        ]
+
+    async def work():
+        nonlocal written, reused, skipped
+        while (chunk := await chunks.get()) is not None:
+            # Owners whose roster and plans are unchanged already have a stored result, and their
+            # rosters are never read. Versions are read before rosters, so a result can only be
+            # stored under a version at least as old as the roster it was computed from.
+            versions = await owner_versions(chunk, ROSTER_VERSION)
+            fingerprints = {
+                owner_id: fica_engine.calculation_fingerprint(
+                    version, request.health_plan_id, request.life_plan_id, health_premium, life_premium
+                )
+                for owner_id, version in versions.items()
+            }
+            existing = await storage.calculations.stored_fingerprints(chunk, list(fingerprints.values()))
+            stale = [owner_id for owner_id in chunk if (owner_id, fingerprints[owner_id]) not in existing]
+
+            rosters: Dict[str, List[Dict[str, Any]]] = {owner_id: [] for owner_id in stale}
+            if stale:
+                async for employee in storage.employees.rosters(stale, fica_engine.EMPLOYEE_FIELDS):
+                    rosters[employee["business_owner_id"]].append(employee)
+            pending = {
+                owner_id: (fica_engine.Roster(employees), fingerprints[owner_id])
+                for owner_id, employees in rosters.items() if employees
+            }
+
+            records = await asyncio.to_thread(calculate_chunk, pending)
+            upserted = await storage.calculations.insert_many_if_absent(records)
+            if upserted:
+                await bump_owner_versions(list(pending), DASHBOARD_VERSION)
+            written += upserted
+            reused += len(chunk) - len(stale) + len(pending) - upserted
+            skipped += len(stale) - len(pending)
+            job.processed += len(chunk)
+            logger.info(
+                "FICA batch %s: %d/%d owners (%.1f owners/s)",
+                job.id, job.processed, job.total, job.throughput_per_second,
+            )
+
+    tasks = [asyncio.create_task(produce())]
+    tasks += [asyncio.create_task(work()) for _ in range(request.concurrency)]
+    try:
+        await asyncio.gather(*tasks)
+    finally:
+        for task in tasks:
+            task.cancel()
+    job.result = {
+        "calculations_written": written,
+        "calculations_reused": reused,
+        "owners_without_employees": skipped,
+        "missing_owner_ids": sorted(set(request.owner_ids or []) - found_owner_ids),
+    }
+
+@api_router.post("/fica-calculation/batch", response_model=Job, status_code=status.HTTP_202_ACCEPTED)
+async def start_fica_batch(batch_request: FICABatchRequest):
+    """Start a background FICA recalculation for many (or all) business owners"""
+    job = await job_registry.create("fica_batch", **batch_request.dict())
+    return job_registry.start(job, lambda job: run_fica_batch(job, batch_request))
+
+@api_router.get("/fica-calculation/batch/{job_id}", response_model=Job)
+async def get_fica_batch(job_id: str):
+    """Get progress for a batch FICA recalculation"""
+    job = await job_registry.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+async def read_fica_roster(owner_id: str) -> fica_engine.Roster:
+    """Read the columns the FICA engine needs for an owner's employees"""
+    employees = await storage.employees.roster(owner_id, fica_engine.EMPLOYEE_FIELDS)
+    if not employees:
+        raise HTTPException(status_code=400, detail="No employees found for this business")
+    return fica_engine.Roster(employees)
+
+async def load_fica_roster(owner_id: str) -> fica_engine.Roster:
+    """Load the columns the FICA engine needs for an existing owner's employees"""
+    owner = await storage.owners.get(owner_id, ["id"])
+    if not owner:
+        raise HTTPException(status_code=404, detail="Business owner not found")
+    return await read_fica_roster(owner_id)
+
+async def memoized_fica_calculation(
+    owner_id: str,
+    health_plan_id: Optional[str] = None,
+    life_plan_id: Optional[str] = None,
+    include_breakdown: bool = False,
+) -> FICACalculation:
+    """Return the stored calculation for this roster and plan selection, computing and storing it if needed"""
+    # Read before the roster, so a result is never stored under a version newer than its roster
+    roster_version = await owner_version(owner_id, ROSTER_VERSION)
+    if roster_version is None:
+        raise HTTPException(status_code=404, detail="Business owner not found")
+    health_premium, life_premium = await get_plan_premiums(health_plan_id, life_plan_id)
+    
+    # Reuse the stored result when the roster and plan selection are unchanged, without reading the roster
+    fingerprint = fica_engine.calculation_fingerprint(
+        roster_version, health_plan_id, life_plan_id, health_premium, life_premium
     )
+    cached = await storage.calculations.find_by_fingerprint(owner_id, fingerprint)
+    if cached and not include_breakdown:
+        return FICACalculation(**cached)
+    
+    roster = await read_fica_roster(owner_id)
+    result = fica_engine.calculate(roster, health_premium, life_premium, include_breakdown=include_breakdown)
+    if cached:
+        calculation = FICACalculation(**cached)
+    else:
+        calculation = build_fica_calculation(owner_id, result, fingerprint)
+        # A concurrent identical request may have stored the same result first
+        if await storage.calculations.insert_if_absent(calculation.dict()):
+            await bump_owner_versions([owner_id], DASHBOARD_VERSION)
+        else:
+            calculation = FICACalculation(**await storage.calculations.find_by_fingerprint(owner_id, fingerprint))
     
-    await db.fica_calculations.insert_one(calculation.dict())
+    if include_breakdown:
+        return FICACalculationDetail(**calculation.dict(), employee_breakdown=result["employee_breakdown"])
     return calculation
 
+@api_router.post("/fica-calculation/{owner_id}")
+async def calculate_fica_savings(
+    owner_id: str,
+    health_plan_id: Optional[str] = None,
+    life_plan_id: Optional[str] = None,
+    include_breakdown: bool = False,
+):
+    """Calculate FICA savings for a business owner.
+
+    Savings are the employer Social Security and Medicare tax saved on the
+    selected plans' premiums once they are paid pre-tax (see `fica_engine`),
+    not the flat 30% of benefit cost estimated before engine version 2025.1,
+    so figures are roughly a quarter of the old ones. With no plan selected
+    nothing new moves pre-tax: projected and net savings are 0. The result
+    carries the `engine_version` that produced it.
+    """
+    return await memoized_fica_calculation(owner_id, health_plan_id, life_plan_id, include_breakdown)
+
+HEALTH_PLAN_TYPES = (BenefitPlanType.HEALTH_BASIC, BenefitPlanType.HEALTH_PREMIUM)
+LIFE_PLAN_TYPES = (BenefitPlanType.LIFE_BASIC, BenefitPlanType.LIFE_PREMIUM)
+
+@api_router.post("/fica-calculation/{owner_id}/scenarios", response_model=FICAScenarioComparison)
+async def compare_fica_scenarios(owner_id: str, select: Optional[int] = Query(None, ge=1)):
+    """Rank every health/life plan combination (including none) by net savings.
+
+    Plans are compared like for like: a scenario's net savings are its FICA
+    savings less only the plan cost above the current premiums it replaces,
+    so a plan cheaper than today's coverage can outrank keeping it.
+
+    Nothing is stored unless `select` names a rank, in which case that
+    scenario is calculated and saved like a regular FICA calculation.
+    """
+    roster = await load_fica_roster(owner_id)
+    plans = await plan_catalog.active()
+    health_options = [None] + [plan for plan in plans if plan.plan_type in HEALTH_PLAN_TYPES]
+    life_options = [None] + [plan for plan in plans if plan.plan_type in LIFE_PLAN_TYPES]
+    combinations = [(health, life) for health in health_options for life in life_options]
+    
+    totals = fica_engine.sweep(
+        roster,
+        [health.monthly_premium_per_employee if health else None for health, _ in combinations],
+        [life.monthly_premium_per_employee if life else None for _, life in combinations],
+    )
+    scenarios = []
+    for k, (health, life) in enumerate(combinations):
+        savings = float(totals["projected_fica_savings"][k])
+        health_cost = float(totals["health_benefit_cost"][k])
+        life_cost = float(totals["life_insurance_cost"][k])
+        replaced = float(totals["replaced_premiums"][k])
+        scenarios.append(FICAScenario(
+            health_plan_id=health.id if health else None,
+            health_plan_name=health.name if health else None,
+            life_plan_id=life.id if life else None,
+            life_plan_name=life.name if life else None,
+            projected_fica_savings=savings,
+            employee_fica_savings=float(totals["employee_fica_savings"][k]),
+            health_benefit_cost=health_cost,
+            life_insurance_cost=life_cost,
+            replaced_premiums=replaced,
+            net_savings=savings - (health_cost + life_cost - replaced)
+        ))
+    scenarios.sort(key=lambda scenario: scenario.net_savings, reverse=True)
+    for rank, scenario in enumerate(scenarios, start=1):
+        scenario.rank = rank
+    
+    comparison = FICAScenarioComparison(
+        business_owner_id=owner_id,
+        employee_count=len(roster),
+        total_employee_salaries=float(roster.salaries.sum()),
+        scenarios=scenarios
+    )
+    if select is not None:
+        if select > len(scenarios):
+            raise HTTPException(status_code=400, detail=f"Scenario rank must be between 1 and {len(scenarios)}")
+        chosen = scenarios[select - 1]
+        comparison.selected_calculation = await memoized_fica_calculation(
+            owner_id, chosen.health_plan_id, chosen.life_plan_id
+        )
+    return comparison
+
 @api_router.get("/fica-calculation/history/{owner_id}", response_model=List[FICACalculation])
 async def get_fica_calculation_history(owner_id: str):
     """Get FICA calculation history for a business owner"""
-    calculations = await db.fica_calculations.find({
-        "business_owner_id": owner_id
-    }).sort("calculation_date", -1).to_list(100)
-    return [FICACalculation(**calc) for calc in calculations]
+    calculations = await storage.calculations.history(owner_id, 100)
+    return documents_response(calculations, FICACalculation)
 
 # Application Endpoints
-@api_router.post("/applications", response_model=Application)
-async def create_application(app_data: ApplicationCreate):
-    """Create a new application"""
+async def insert_application(app_data: ApplicationCreate) -> Application:
     # Verify business owner exists
-    owner = await db.business_owners.find_one({"id": app_data.business_owner_id})
+    owner = await storage.owners.get(app_data.business_owner_id, ["id", "industry"])
     if not owner:
         raise HTTPException(status_code=404, detail="Business owner not found")
     
     # Count employees
-    employee_count = await db.employees.count_documents({"business_owner_id": app_data.business_owner_id})
+    roster = await get_roster_summary(app_data.business_owner_id)
     
     app_dict = app_data.dict()
     app_obj = Application(
         **app_dict,
-        total_employees=employee_count
+        total_employees=roster.employee_count
     )
-    await db.applications.insert_one(app_obj.dict())
+    await storage.applications.insert(app_obj.dict())
+    await bump_owner_versions([app_obj.business_owner_id], APPLICATIONS_VERSION, DASHBOARD_VERSION)
+    await record_funnel([
+        (funnel_key(app_obj.created_at, owner["industry"]), application_counter(app_obj.status), 1)
+    ])
     return app_obj
 
+@api_router.post("/applications", response_model=Application)
+async def create_application(app_data: ApplicationCreate, idempotency_key: Optional[str] = IDEMPOTENCY_KEY):
+    """Create a new application"""
+    return await idempotent(
+        storage.idempotency, "create_application", idempotency_key, app_data,
+        lambda: insert_application(app_data)
+    )
+
 @api_router.get("/applications/business/{owner_id}", response_model=List[Application])
-async def get_applications_by_business(owner_id: str):
+async def get_applications_by_business(owner_id: str, request: Request, response: Response):
     """Get all applications for a business owner"""
-    applications = await db.applications.find({
-        "business_owner_id": owner_id
-    }).sort("created_at", -1).to_list(100)
-    return [Application(**app) for app in applications]
+    async def build():
+        applications = await storage.applications.list_for_owner(owner_id, 100)
+        return documents_response(applications, Application)
+    
+    version = await owner_version(owner_id, APPLICATIONS_VERSION)
+    if version is None:
+        return await build()
+    return await conditional_get(request, response, version, build)
 
 @api_router.get("/applications/{app_id}", response_model=Application)
 async def get_application(app_id: str):
     """Get application by ID"""
-    application = await db.applications.find_one({"id": app_id})
+    application = await storage.applications.get(app_id)
     if not application:
         raise HTTPException(status_code=404, detail="Application not found")
-    return Application(**application)
+    return document_response(application, Application)
+
+def status_changes(status: ApplicationStatus, now: datetime) -> Dict[str, Any]:
+    """Fields set when an application moves to `status`"""
+    changes: Dict[str, Any] = {"status": status.value, "updated_at": now}
+    if status == ApplicationStatus.SUBMITTED:
+        changes["submitted_at"] = now
+    return changes
 
 @api_router.put("/applications/{app_id}", response_model=Application)
 async def update_application(app_id: str, app_update: ApplicationUpdate):
-    """Update an application"""
-    # Get current application
-    current_app = await db.applications.find_one({"id": app_id})
-    if not current_app:
-        raise HTTPException(status_code=404, detail="Application not found")
-    
+    """Update an application.
+
+    A new `status` must be reachable from the current one under
+    APPLICATION_TRANSITIONS, otherwise the update is rejected with 409 and
+    nothing is changed. Setting the status the application already has is
+    allowed and leaves its status timestamps (e.g. `submitted_at`) as they are.
+    """
     # Prepare update data
     update_data = {k: v for k, v in app_update.dict().items() if v is not None}
     update_data["updated_at"] = datetime.utcnow()
     
-    # If status is being set to submitted, set submitted_at
-    if app_update.status == ApplicationStatus.SUBMITTED:
-        update_data["submitted_at"] = datetime.utcnow()
+    # If status is being set, set submitted_at as needed and only allow valid transitions
+    statuses = None
+    changes = update_data
+    if app_update.status is not None:
+        changes = {**update_data, **status_changes(app_update.status, update_data["updated_at"])}
+        statuses = [status for status in statuses_leading_to(app_update.status) if status != app_update.status.value]
     
-    # Update application
-    await db.applications.update_one(
-        {"id": app_id},
-        {"$set": update_data}
-    )
+    # Update application in one round trip, getting back its previous state
+    current_app = await storage.applications.update(app_id, changes, statuses)
+    if not current_app:
+        existing = await storage.applications.get(app_id)
+        if not existing:
+            raise HTTPException(status_code=404, detail="Application not found")
+        if existing["status"] != app_update.status.value:
+            raise HTTPException(
+                status_code=409,
+                detail=(
+                    f"Cannot move application from {ApplicationStatus(existing['status']).value} "
+                    f"to {app_update.status.value}"
+                )
+            )
+        # Already in the requested status: update the other fields, keeping its status timestamps
+        changes = update_data
+        current_app = await storage.applications.update(app_id, changes, [existing["status"]])
+        if not current_app:
+            raise HTTPException(status_code=409, detail="Application changed while it was being updated")
+    await bump_owner_versions([current_app["business_owner_id"]], APPLICATIONS_VERSION, DASHBOARD_VERSION)
+    if app_update.status is not None and app_update.status != current_app["status"]:
+        await record_status_changes([current_app], app_update.status)
+    return Application(**{**current_app, **changes})
+
+@api_router.post("/applications/transitions", response_model=ApplicationTransitionSummary)
+async def transition_applications(transition: ApplicationTransitionRequest):
+    """Move many applications to one status, reporting the outcome for each id"""
+    ids = list(dict.fromkeys(transition.ids))
+    target = transition.status
+    allowed_from = statuses_leading_to(target)
+    current = {
+        app["id"]: app for app in await storage.applications.get_many(
+            ids, ["id", "status", "business_owner_id", "created_at"]
+        )
+    }
     
-    # Return updated application
-    updated_app = await db.applications.find_one({"id": app_id})
-    return Application(**updated_app)
+    changes = status_changes(target, datetime.utcnow())
+    results: Dict[str, ApplicationTransitionResult] = {}
+    pending = []
+    for app_id in ids:
+        app = current.get(app_id)
+        if app is None:
+            results[app_id] = ApplicationTransitionResult(id=app_id, outcome=TransitionOutcome.NOT_FOUND)
+            continue
+        result = results[app_id] = ApplicationTransitionResult(
+            id=app_id, outcome=TransitionOutcome.UNCHANGED, previous_status=app["status"], status=app["status"]
+        )
+        if app["status"] == target:
+            continue
+        if app["status"] not in allowed_from:
+            result.outcome = TransitionOutcome.INVALID_TRANSITION
+            continue
+        pending.append((app_id, app["status"], changes))
+    
+    moved = await storage.applications.transition_many(pending)
+    for app_id, _, _ in pending:
+        if app_id in moved:
+            results[app_id].outcome = TransitionOutcome.UPDATED
+            results[app_id].status = target
+        else:
+            # Another request changed its status after it was read
+            results[app_id].outcome = TransitionOutcome.CONFLICT
+            results[app_id].status = None
+    
+    moved_apps = [current[app_id] for app_id in moved]
+    if moved_apps:
+        owner_ids = list({app["business_owner_id"] for app in moved_apps})
+        await bump_owner_versions(owner_ids, APPLICATIONS_VERSION, DASHBOARD_VERSION)
+        await record_status_changes(moved_apps, target)
+    return ApplicationTransitionSummary(status=target, updated=len(moved), results=list(results.values()))
 
-# Eligibility Check Endpoint
+async def record_status_changes(applications: List[Dict[str, Any]], new_status: ApplicationStatus):
+    """Move applications between status counters in their creation days' funnel rollups"""
+    owner_ids = list({application["business_owner_id"] for application in applications})
+    owners = await storage.owners.get_many(owner_ids, ["id", "industry"])
+    industries = {owner["id"]: owner["industry"] for owner in owners}
+    entries = []
+    for application in applications:
+        key = funnel_key(application["created_at"], industries.get(application["business_owner_id"]))
+        entries += [(key, application_counter(application["status"]), -1), (key, application_counter(new_status), 1)]
+    await record_funnel(entries)
+
+# Eligibility Endpoints
 @api_router.get("/eligibility-check/{owner_id}")
 async def check_eligibility(owner_id: str):
     """Check business eligibility for FICA reduction program"""
     # Get business owner
-    owner = await db.business_owners.find_one({"id": owner_id})
+    owner = await storage.owners.get(owner_id, ["industry", "years_in_business"])
     if not owner:
         raise HTTPException(status_code=404, detail="Business owner not found")
     
     # Get employee count
-    employee_count = await db.employees.count_documents({"business_owner_id": owner_id})
-    
-    # Eligibility criteria (simplified)
-    eligible = True
-    reasons = []
-    
-    # Must have at least 2 employees
-    if employee_count < 2:
-        eligible = False
-        reasons.append("Business must have at least 2 employees")
-    
-    # Must be in business for at least 1 year
-    if owner["years_in_business"] < 1:
-        eligible = False
-        reasons.append("Business must be operating for at least 1 year")
-    
-    # Some industries may not be eligible
-    restricted_industries = [IndustryType.OTHER]
-    if owner["industry"] in restricted_industries:
-        eligible = False
-        reasons.append("Industry type may require special review")
+    employee_count = (await get_roster_summary(owner_id)).employee_count
     
+    failures = eligibility.evaluate({**owner, "employee_count": employee_count})
     return {
-        "eligible": eligible,
+        "eligible": not failures,
         "employee_count": employee_count,
         "years_in_business": owner["years_in_business"],
         "industry": owner["industry"],
-        "reasons": reasons if not eligible else ["All eligibility criteria met"]
+        "reasons": failures or [eligibility.ALL_CRITERIA_MET]
     }
 
+async def run_eligibility_evaluation(job: Job, evaluation_request: EligibilityEvaluationRequest):
+    """Evaluate the rule set for many (or all) owners and store the results"""
+    job.total = await storage.owners.count(evaluation_request.owner_ids)
+    
+    def progress(evaluated: int):
+        job.processed += evaluated
+    
+    evaluated, eligible = await evaluate_eligibility(evaluation_request.owner_ids, progress)
+    job.result = {"evaluated": evaluated, "eligible": eligible, "rules_version": eligibility.RULES_VERSION}
+
+@api_router.post("/eligibility/evaluate", response_model=Job, status_code=status.HTTP_202_ACCEPTED)
+async def start_eligibility_evaluation(evaluation_request: EligibilityEvaluationRequest):
+    """Start a background evaluation of the eligibility rules for many (or all) business owners"""
+    job = await job_registry.create("eligibility_evaluation", **evaluation_request.dict())
+    return job_registry.start(job, lambda job: run_eligibility_evaluation(job, evaluation_request))
+
+@api_router.get("/eligibility/evaluate/{job_id}", response_model=Job)
+async def get_eligibility_evaluation(job_id: str):
+    """Get progress for a bulk eligibility evaluation"""
+    job = await job_registry.get(job_id)
+    if not job or job.kind != "eligibility_evaluation":
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@api_router.get("/eligibility", response_model=List[EligibilityResult])
+async def get_eligibility_results(
+    request: Request,
+    eligible: Optional[bool] = None,
+    industry: Optional[IndustryType] = None,
+    min_employees: Optional[int] = Query(None, ge=0),
+    max_employees: Optional[int] = Query(None, ge=0),
+    cursor: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+):
+    """Stored eligibility results, filtered, one keyset page at a time"""
+    match: Dict[str, Any] = {}
+    if eligible is not None:
+        match["eligible"] = eligible
+    if industry is not None:
+        match["industry"] = industry.value
+    return await list_page(
+        request,
+        lambda after, limit: storage.eligibility.page(match, min_employees, max_employees, after, limit),
+        EligibilityResult, cursor, limit
+    )
+
 # Dashboard/Summary Endpoints
-@api_router.get("/dashboard/{owner_id}")
-async def get_dashboard_summary(owner_id: str):
+@api_router.get("/dashboard/{owner_id}", response_model=DashboardSummary)
+async def get_dashboard_summary(owner_id: str, request: Request, response: Response):
     """Get dashboard summary for a business owner"""
-    # Get business owner
-    owner = await db.business_owners.find_one({"id": owner_id})
+    version = await owner_version(owner_id, DASHBOARD_VERSION)
+    if version is None:
+        raise HTTPException(status_code=404, detail="Business owner not found")
+    return await conditional_get(request, response, version, lambda: build_dashboard_summary(owner_id))
+
+async def build_dashboard_summary(owner_id: str) -> DashboardSummary:
+    # The reads are independent, so issue them together for one round trip of latency
+    owner, roster, applications_count, recent_applications, latest_calculation = await asyncio.gather(
+        storage.owners.get(owner_id, ["business_name"]),
+        get_roster_summary(owner_id),
+        storage.applications.count_for_owner(owner_id),
+        storage.applications.list_for_owner(owner_id, DASHBOARD_RECENT_APPLICATIONS, DASHBOARD_APPLICATION_FIELDS),
+        storage.calculations.latest(owner_id, DASHBOARD_CALCULATION_FIELDS),
+    )
     if not owner:
         raise HTTPException(status_code=404, detail="Business owner not found")
     
-    # Get employee count
-    employee_count = await db.employees.count_documents({"business_owner_id": owner_id})
+    return DashboardSummary(
+        business_name=owner["business_name"],
+        employee_count=roster.employee_count,
+        applications_count=applications_count,
+        latest_calculation=latest_calculation,
+        recent_applications=recent_applications
+    )
+
+# Analytics Endpoints
+FUNNEL_DEFAULT_DAYS = 30
+FUNNEL_MAX_DAYS = 400
+
+def summarize_funnel(rows: List[Dict[str, Any]], group_by: List[FunnelDimension]) -> List[FunnelRow]:
+    """Sum rollup rows into one FunnelRow per combination of the `group_by` dimensions"""
+    groups: Dict[tuple, FunnelRow] = {}
+    for row in rows:
+        dimensions = {dimension.value: row[dimension.value] for dimension in group_by}
+        group = groups.get(tuple(dimensions.values()))
+        if group is None:
+            group = groups[tuple(dimensions.values())] = FunnelRow(**dimensions)
+        group.leads += row["leads"]
+        group.business_owners += row["business_owners"]
+        for status_value, count in row["applications"].items():
+            group.applications[ApplicationStatus(status_value)] += count
+    for group in groups.values():
+        if group.leads:
+            group.owner_conversion_rate = group.business_owners / group.leads
+    return list(groups.values())
+
+@api_router.get("/analytics/funnel", response_model=FunnelReport)
+async def get_lead_funnel(
+    since: Optional[date] = None,
+    until: Optional[date] = None,
+    group_by: List[FunnelDimension] = Query([FunnelDimension.DAY]),
+):
+    """Lead volume and conversion into business owners and applications, from the daily rollups.
+
+    Only leads have an employee band, so owners and applications group under
+    "unknown" when grouping by `employee_band`. Applications count under their
+    current status on the day they were created.
+    """
+    until = until or datetime.utcnow().date()
+    since = since or until - timedelta(days=FUNNEL_DEFAULT_DAYS - 1)
+    if since > until:
+        raise HTTPException(status_code=400, detail="since must not be after until")
+    if (until - since).days >= FUNNEL_MAX_DAYS:
+        raise HTTPException(status_code=400, detail=f"Date range is limited to {FUNNEL_MAX_DAYS} days")
+    
+    group_by = list(dict.fromkeys(group_by))
+    rows = await storage.funnel.between(since.isoformat(), until.isoformat())
+    return FunnelReport(
+        since=since,
+        until=until,
+        group_by=group_by,
+        rows=summarize_funnel(rows, group_by),
+        totals=(summarize_funnel(rows, []) or [FunnelRow()])[0],
+    )
+
+async def run_funnel_rebuild(job: Job):
+    job.result = {"rollup_rows": await storage.funnel.rebuild()}
+
+@api_router.post("/analytics/funnel/rebuild", response_model=Job, status_code=status.HTTP_202_ACCEPTED)
+async def start_funnel_rebuild():
+    """Backfill the funnel rollups by recounting every lead, owner and application"""
+    job = await job_registry.create("funnel_rebuild")
+    return job_registry.start(job, run_funnel_rebuild)
+
+@api_router.get("/analytics/funnel/rebuild/{job_id}", response_model=Job)
+async def get_funnel_rebuild(job_id: str):
+    """Get the status of a funnel rollup backfill"""
+    job = await job_registry.get(job_id)
+    if not job or job.kind != "funnel_rebuild":
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+# Export Endpoints
+def export_source(export_request: ExportRequest):
+    """The repository and model an export reads, and the match filter for its request"""
+    match: Dict[str, Any] = {}
+    if export_request.collection == ExportCollection.BUSINESS_OWNERS:
+        repository, model = storage.owners, BusinessOwner
+        if export_request.business_owner_ids is not None:
+            match["id"] = export_request.business_owner_ids
+        if export_request.industry is not None:
+            match["industry"] = export_request.industry.value
+        if export_request.state is not None:
+            match["state"] = export_request.state
+        return repository, model, match
     
-    # Get applications
-    applications = await db.applications.find({
-        "business_owner_id": owner_id
-    }).sort("created_at", -1).to_list(10)
+    if export_request.industry is not None or export_request.state is not None:
+        raise HTTPException(status_code=400, detail="industry and state filters apply to business_owners exports only")
+    if export_request.collection == ExportCollection.EMPLOYEES:
+        repository, model = storage.employees, Employee
+    else:
+        repository, model = storage.calculations, FICACalculation
+    if export_request.business_owner_ids is not None:
+        match["business_owner_id"] = export_request.business_owner_ids
+    return repository, model, match
+
+async def run_export(job: Job, export_request: ExportRequest):
+    """Stream the selected documents into an export file and keep it in storage for download"""
+    repository, model, match = export_source(export_request)
+    path = exports.export_path(job.id, export_request.format)
+    docs = repository.export(
+        match, export_request.created_from, export_request.created_to,
+        list(model.model_fields), exports.EXPORT_CHUNK_SIZE
+    )
     
-    # Get latest FICA calculation
-    latest_calculation = await db.fica_calculations.find_one({
-        "business_owner_id": owner_id
-    }, sort=[("calculation_date", -1)])
+    def progress(rows: int):
+        job.processed = rows
     
-    return {
-        "business_name": owner["business_name"],
-        "employee_count": employee_count,
-        "applications_count": len(applications),
-        "latest_calculation": FICACalculation(**latest_calculation) if latest_calculation else None,
-        "recent_applications": [Application(**app) for app in applications[:3]]
+    rows = await exports.write_export(docs, model, path, export_request.format, progress)
+    try:
+        size_bytes = path.stat().st_size
+        # Any worker may be asked for the download, so the file cannot stay on this one's disk
+        await storage.exports.save(path.name, path)
+    finally:
+        path.unlink(missing_ok=True)
+    job.result = {
+        "rows": rows,
+        "file_name": path.name,
+        "size_bytes": size_bytes,
+        "media_type": exports.MEDIA_TYPES[export_request.format],
     }
 
-# Health check endpoint
+@api_router.post("/exports", response_model=Job, status_code=status.HTTP_202_ACCEPTED)
+async def start_export(export_request: ExportRequest):
+    """Start a background export of a collection to Parquet or gzipped CSV"""
+    # Reject bad filters now rather than in the background job
+    export_source(export_request)
+    await asyncio.to_thread(exports.prune_exports)
+    await storage.exports.prune(datetime.utcnow() - timedelta(seconds=exports.EXPORT_RETENTION_SECONDS))
+    job = await job_registry.create("export", **export_request.model_dump(mode="json"))
+    return job_registry.start(job, lambda job: run_export(job, export_request))
+
+async def get_export_job(job_id: str) -> Job:
+    job = await job_registry.get(job_id)
+    if not job or job.kind != "export":
+        raise HTTPException(status_code=404, detail="Export not found")
+    return job
+
+@api_router.get("/exports/{job_id}", response_model=Job)
+async def get_export(job_id: str):
+    """Get the status of an export"""
+    return await get_export_job(job_id)
+
+@api_router.get("/exports/{job_id}/download")
+async def download_export(job_id: str):
+    """Download a completed export file"""
+    job = await get_export_job(job_id)
+    if job.state == JobState.FAILED:
+        raise HTTPException(status_code=404, detail=f"Export failed: {job.error}")
+    if job.state != JobState.COMPLETED:
+        raise HTTPException(status_code=409, detail="Export is not finished yet", headers={"Retry-After": "5"})
+    file_name = job.result["file_name"]
+    chunks = await storage.exports.open(file_name)
+    if chunks is None:
+        raise HTTPException(status_code=410, detail="Export file has expired")
+    return StreamingResponse(chunks, media_type=job.result["media_type"], headers={
+        "Content-Disposition": f'attachment; filename="{file_name}"',
+        "Content-Length": str(job.result["size_bytes"]),
+    })
+
+# Health check endpoints
 @api_router.get("/health")
 async def health_check():
-    """Health check endpoint"""
+    """Liveness: the process is up and serving requests"""
     return {"status": "healthy", "timestamp": datetime.utcnow()}
 
+READINESS_TIMEOUT_SECONDS = float(os.environ.get('READINESS_TIMEOUT_SECONDS', '2'))
+
+@api_router.get("/ready")
+async def readiness_check():
+    """Readiness: startup has finished and the storage backend answers"""
+    if not app.state.ready:
+        raise HTTPException(status_code=503, detail="Not ready", headers={"Retry-After": "1"})
+    try:
+        await asyncio.wait_for(storage.ping(), READINESS_TIMEOUT_SECONDS)
+    except Exception as exc:
+        logger.warning("Readiness check failed: %r", exc)
+        raise HTTPException(status_code=503, detail="Storage is unavailable", headers={"Retry-After": "1"})
+    return {"status": "ready", "timestamp": datetime.utcnow(), "startup_seconds": startup_timings}
+
 # Include the router in the main app
 app.include_router(api_router)
 
+# Bounded concurrency, queueing and per-owner rates for expensive routes; added
+# first so it sits inside CORS and rejections still carry the CORS headers
+app.add_middleware(AdmissionMiddleware)
+
 app.add_middleware(
     CORSMiddleware,
     allow_credentials=True,
@@ -512,6 +1542,13 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Per-route request metrics, exposed with the MongoDB command metrics at /metrics
+app.add_middleware(PrometheusMiddleware)
+app.add_route("/metrics", metrics_endpoint, include_in_schema=False)
+
+# Requests carrying PROFILING_TOKEN are sampled and saved as speedscope profiles
+app.add_middleware(ProfilingMiddleware)
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -519,55 +1556,93 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-@app.on_event("shutdown")
-async def shutdown_db_client():
-    client.close()
+# Default benefit plans, seeded on every startup. Ids are derived from (plan_type, name),
+# so workers seeding a fresh database at the same moment insert the same documents
+DEFAULT_PLANS = [
+    BenefitPlan(
+        name="Basic Health Plan",
+        plan_type=BenefitPlanType.HEALTH_BASIC,
+        description="Essential health coverage with major medical benefits",
+        monthly_premium_per_employee=250.0,
+        coverage_amount=50000.0,
+        deductible=2500.0,
+        features=["Doctor visits", "Emergency care", "Prescription coverage", "Preventive care"]
+    ),
+    BenefitPlan(
+        name="Premium Health Plan",
+        plan_type=BenefitPlanType.HEALTH_PREMIUM,
+        description="Comprehensive health coverage with low deductibles",
+        monthly_premium_per_employee=450.0,
+        coverage_amount=100000.0,
+        deductible=500.0,
+        features=["All Basic features", "Specialist care", "Mental health", "Dental", "Vision"]
+    ),
+    BenefitPlan(
+        name="Basic Life Insurance",
+        plan_type=BenefitPlanType.LIFE_BASIC,
+        description="Term life insurance coverage",
+        monthly_premium_per_employee=25.0,
+        coverage_amount=50000.0,
+        features=["Term life coverage", "Accidental death benefit"]
+    ),
+    BenefitPlan(
+        name="Premium Life Insurance",
+        plan_type=BenefitPlanType.LIFE_PREMIUM,
+        description="Permanent life insurance with cash value",
+        monthly_premium_per_employee=75.0,
+        coverage_amount=100000.0,
+        features=["Permanent life coverage", "Cash value accumulation", "Loan option", "Disability waiver"]
+    ),
+]
+
+def default_plan_id(plan: BenefitPlan) -> str:
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, "benefit-plan:" + plan.plan_type.value + ":" + plan.name))
 
-# Seed some default benefit plans
-@app.on_event("startup")
 async def seed_benefit_plans():
-    """Seed default benefit plans if none exist"""
-    existing_plans = await db.benefit_plans.count_documents({})
-    
-    if existing_plans == 0:
-        default_plans = [
-            BenefitPlan(
-                name="Basic Health Plan",
-                plan_type=BenefitPlanType.HEALTH_BASIC,
-                description="Essential health coverage with major medical benefits",
-                monthly_premium_per_employee=250.0,
-                coverage_amount=50000.0,
-                deductible=2500.0,
-                features=["Doctor visits", "Emergency care", "Prescription coverage", "Preventive care"]
-            ),
-            BenefitPlan(
-                name="Premium Health Plan",
-                plan_type=BenefitPlanType.HEALTH_PREMIUM,
-                description="Comprehensive health coverage with low deductibles",
-                monthly_premium_per_employee=450.0,
-                coverage_amount=100000.0,
-                deductible=500.0,
-                features=["All Basic features", "Specialist care", "Mental health", "Dental", "Vision"]
-            ),
-            BenefitPlan(
-                name="Basic Life Insurance",
-                plan_type=BenefitPlanType.LIFE_BASIC,
-                description="Term life insurance coverage",
-                monthly_premium_per_employee=25.0,
-                coverage_amount=50000.0,
-                features=["Term life coverage", "Accidental death benefit"]
-            ),
-            BenefitPlan(
-                name="Premium Life Insurance",
-                plan_type=BenefitPlanType.LIFE_PREMIUM,
-                description="Permanent life insurance with cash value",
-                monthly_premium_per_employee=75.0,
-                coverage_amount=100000.0,
-                features=["Permanent life coverage", "Cash value accumulation", "Loan option", "Disability waiver"]
-            )
-        ]
-        
-        for plan in default_plans:
-            await db.benefit_plans.insert_one(plan.dict())
-        
-        logger.info("Seeded default benefit plans")
\ No newline at end of file
+    """Insert any default benefit plan whose (plan_type, name) is not stored yet"""
+    added = await storage.plans.seed([{**plan.dict(), "id": default_plan_id(plan)} for plan in DEFAULT_PLANS])
+    if added:
+        plan_catalog.invalidate()
+        logger.info("Seeded %d default benefit plans", added)
+
+async def warm_up():
+    """Load the plan catalog so the first requests are served from memory, and start the lead buffer"""
+    await plan_catalog.refresh()
+    if lead_buffer is not None:
+        track_write_buffer(lead_buffer)
+        lead_buffer.start()
+
+# Seconds spent in each startup phase, in order; logged and reported by /api/ready
+startup_timings: Dict[str, float] = {}
+
+async def timed(phase: str, step):
+    started = time.perf_counter()
+    await step
+    startup_timings[phase] = round(time.perf_counter() - started, 4)
+
+async def start_app():
+    """Connect, reconcile indexes, seed and warm up, timing each phase"""
+    startup_timings["imports"] = round(IMPORT_SECONDS, 4)
+    # Motor connects on first use; the ping makes connection failures surface here
+    await timed("connect", storage.ping())
+    # Create or reconcile indexes before anything queries them (the seed relies on id_unique)
+    await timed("indexes", storage.prepare(
+        verify_query_plans=os.environ.get('VERIFY_QUERY_PLANS', '').lower() in ('1', 'true', 'yes')
+    ))
+    await timed("seed", seed_benefit_plans())
+    await timed("warmup", warm_up())
+    app.state.ready = True
+    logger.info(
+        "Startup finished in %.3fs (%s)", sum(startup_timings.values()),
+        ", ".join(f"{phase} {seconds:.3f}s" for phase, seconds in startup_timings.items()),
+    )
+
+async def stop_app():
+    # Fail readiness first, so load balancers stop routing here while work drains
+    app.state.ready = False
+    await job_registry.shutdown()
+    if lead_buffer is not None:
+        await lead_buffer.drain(float(os.environ.get('LEAD_BUFFER_DRAIN_TIMEOUT_SECONDS', '30')))
+    await storage.close()
+
+IMPORT_SECONDS = time.perf_counter() - IMPORT_STARTED
@@ -0,0 +1,24 @@
+"""Storage backends behind a common repository interface.
+
+`STORAGE_BACKEND` selects the implementation: `mongo` (the default, using
+`MONGO_URL` and `DB_NAME`) or `memory`.
+"""
+import os
+
+from storage.base import Storage
+
+STORAGE_BACKENDS = ("mongo", "memory")
+
+
+def get_storage() -> Storage:
+    backend = os.environ.get('STORAGE_BACKEND', 'mongo').lower()
+    if backend == "memory":
+        from storage.memory import MemoryStorage
+        return MemoryStorage()
+    if backend == "mongo":
+        from storage.mongo import MongoStorage
+        return MongoStorage(os.environ['MONGO_URL'], os.environ['DB_NAME'])
+    raise ValueError(f"Unknown STORAGE_BACKEND {backend!r}; expected one of {', '.join(STORAGE_BACKENDS)}")
+
+
+__all__ = ["Storage", "STORAGE_BACKENDS", "get_storage"]
@@ -0,0 +1,435 @@
+"""Repository interfaces for every collection the API reads or writes.
+
+Handlers talk to these instead of a database driver so the backend can be
+swapped by configuration: `MongoStorage` keeps the production behaviour and
+`MemoryStorage` serves everything from indexed dicts, which lets request
+handling be profiled and benchmarked without any database latency.
+
+Documents cross this boundary as plain dicts shaped like the Pydantic models
+in server.py, without Mongo's `_id`.
+"""
+import uuid
+from abc import ABC, abstractmethod
+from datetime import datetime
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+# Keyset position of a row in (created_at, id) order
+Position = Tuple[datetime, str]
+Document = Dict[str, Any]
+Fields = Optional[Sequence[str]]
+# Field -> required value, or a list of accepted values
+Match = Dict[str, Any]
+
+ROSTER_TOTAL_FIELDS = (
+    "employee_count",
+    "total_salaries",
+    "health_insured_count",
+    "life_insured_count",
+    "health_premium_total",
+    "life_premium_total",
+)
+
+# Counters kept per owner by OwnerVersionRepository
+VERSION_MARKERS = ("applications", "dashboard", "roster")
+
+
+def new_version_record(owner_id: str) -> Dict[str, Any]:
+    return {"business_owner_id": owner_id, "epoch": uuid.uuid4().hex, **dict.fromkeys(VERSION_MARKERS, 0)}
+
+
+# Lead funnel rollup rows are keyed by (day, industry, employee_band)
+FunnelKey = Tuple[str, str, str]
+FunnelCounts = Dict[FunnelKey, Dict[str, int]]
+# Batch ids each funnel row remembers, so a retried write-behind batch is not counted twice
+RECENT_FUNNEL_BATCHES = 50
+UNKNOWN = "unknown"
+
+
+def funnel_day_key(day: str, industry: Optional[str], employee_band: Optional[str] = None) -> FunnelKey:
+    """A rollup key with the industry and band normalized as free-text lead fields need"""
+    return day, (industry or "").strip().lower() or UNKNOWN, (employee_band or "").strip() or UNKNOWN
+
+
+def funnel_key(created_at: datetime, industry: Optional[str], employee_band: Optional[str] = None) -> FunnelKey:
+    """The rollup row a record created at `created_at` counts toward"""
+    return funnel_day_key(created_at.strftime("%Y-%m-%d"), industry, employee_band)
+
+
+def application_counter(status: str) -> str:
+    # Concatenation rather than formatting, so str enums contribute their value
+    return "applications." + status
+
+
+def funnel_counts(entries: Iterable[Tuple[FunnelKey, str, int]]) -> FunnelCounts:
+    """Sum (key, counter, value) entries into per-row counters"""
+    counts: FunnelCounts = {}
+    for key, counter, value in entries:
+        counters = counts.setdefault(key, {})
+        counters[counter] = counters.get(counter, 0) + value
+    return counts
+
+
+def funnel_row(key: FunnelKey, counters: Dict[str, int]) -> Document:
+    """A rollup document from flat counters (`leads`, `business_owners`, `applications.<status>`)"""
+    day, industry, employee_band = key
+    row = {"day": day, "industry": industry, "employee_band": employee_band,
+           "leads": 0, "business_owners": 0, "applications": {}}
+    for counter, value in counters.items():
+        group, _, status = counter.partition(".")
+        if status:
+            row[group][status] = row[group].get(status, 0) + value
+        else:
+            row[group] += value
+    return row
+
+
+def roster_totals(employees: Iterable[Document]) -> Dict[str, Any]:
+    """Roster rollup totals for a set of employee documents"""
+    totals = dict.fromkeys(ROSTER_TOTAL_FIELDS, 0)
+    totals["total_salaries"] = 0.0
+    totals["health_premium_total"] = 0.0
+    totals["life_premium_total"] = 0.0
+    for emp in employees:
+        totals["employee_count"] += 1
+        totals["total_salaries"] += emp.get("annual_salary") or 0.0
+        if emp.get("has_current_health_insurance"):
+            totals["health_insured_count"] += 1
+            totals["health_premium_total"] += emp.get("current_health_premium") or 0.0
+        if emp.get("has_current_life_insurance"):
+            totals["life_insured_count"] += 1
+            totals["life_premium_total"] += emp.get("current_life_premium") or 0.0
+    return totals
+
+
+class LeadRepository(ABC):
+    @abstractmethod
+    async def insert(self, lead: Document) -> None: ...
+
+    @abstractmethod
+    async def insert_many(self, leads: List[Document]) -> None:
+        """Insert leads, skipping ids already stored so a retried batch is harmless"""
+
+    @abstractmethod
+    def page(self, after: Optional[Position] = None, limit: Optional[int] = None) -> AsyncIterator[Document]:
+        """Leads newest first, starting after `after`"""
+
+
+class BusinessOwnerRepository(ABC):
+    @abstractmethod
+    async def insert(self, owner: Document) -> None: ...
+
+    @abstractmethod
+    async def get(self, owner_id: str, fields: Fields = None) -> Optional[Document]: ...
+
+    @abstractmethod
+    async def get_many(self, owner_ids: List[str], fields: Fields = None) -> List[Document]:
+        """The owners among `owner_ids` that exist, in no particular order"""
+
+    @abstractmethod
+    def page(self, after: Optional[Position] = None, limit: Optional[int] = None) -> AsyncIterator[Document]:
+        """Owners oldest first, starting after `after`"""
+
+    @abstractmethod
+    async def count(self, owner_ids: Optional[List[str]] = None) -> int: ...
+
+    @abstractmethod
+    def iter_ids(self, owner_ids: Optional[List[str]] = None) -> AsyncIterator[str]:
+        """Ids of every owner, or of those in `owner_ids` that exist"""
+
+    @abstractmethod
+    def export(self, match: Match, since: Optional[datetime] = None, until: Optional[datetime] = None,
+               fields: Fields = None, batch_size: int = 1000) -> AsyncIterator[Document]:
+        """Every owner matching `match` and created in [since, until), streamed in batches"""
+
+
+class EmployeeRepository(ABC):
+    @abstractmethod
+    async def insert(self, employee: Document) -> None: ...
+
+    @abstractmethod
+    async def insert_many(self, employees: List[Document]) -> None: ...
+
+    @abstractmethod
+    async def get(self, employee_id: str) -> Optional[Document]: ...
+
+    @abstractmethod
+    async def delete(self, employee_id: str) -> Optional[Document]:
+        """Delete an employee, returning the deleted document (None if it did not exist)"""
+
+    @abstractmethod
+    def page_for_owner(self, owner_id: str, after: Optional[Position] = None,
+                       limit: Optional[int] = None) -> AsyncIterator[Document]:
+        """An owner's employees oldest first, starting after `after`"""
+
+    @abstractmethod
+    async def roster(self, owner_id: str, fields: Fields = None) -> List[Document]:
+        """Every employee of one owner"""
+
+    @abstractmethod
+    def rosters(self, owner_ids: List[str], fields: Fields = None) -> AsyncIterator[Document]:
+        """Every employee of several owners, in one grouped read"""
+
+    @abstractmethod
+    async def summarize(self, owner_id: str) -> Dict[str, Any]:
+        """Roster totals (see `roster_totals`) computed from the employees themselves"""
+
+    @abstractmethod
+    def export(self, match: Match, since: Optional[datetime] = None, until: Optional[datetime] = None,
+               fields: Fields = None, batch_size: int = 1000) -> AsyncIterator[Document]:
+        """Every employee matching `match` and created in [since, until), streamed in batches"""
+
+
+class RosterRollupRepository(ABC):
+    @abstractmethod
+    async def get(self, owner_id: str) -> Optional[Document]: ...
+
+    @abstractmethod
+    async def put(self, owner_id: str, totals: Dict[str, Any], updated_at: datetime) -> None: ...
+
+    @abstractmethod
+    async def increment(self, owner_id: str, delta: Dict[str, Any], updated_at: datetime) -> Optional[Document]:
+        """Atomically add `delta` to an existing rollup and return the result; None if the owner has none"""
+
+    @abstractmethod
+    async def rebuild_all(self) -> Tuple[int, List[str]]:
+        """Rebuild every rollup from the employees collection.
+
+        Returns the number of rollups and the owners whose totals the rebuild changed.
+        """
+
+
+class BenefitPlanRepository(ABC):
+    @abstractmethod
+    async def insert(self, plan: Document) -> None: ...
+
+    @abstractmethod
+    async def all(self) -> List[Document]: ...
+
+    @abstractmethod
+    async def count(self) -> int: ...
+
+    @abstractmethod
+    async def seed(self, plans: List[Document]) -> int:
+        """Insert each plan unless one with its (plan_type, name) is stored; returns how many were added"""
+
+
+class FICACalculationRepository(ABC):
+    @abstractmethod
+    async def find_by_fingerprint(self, owner_id: str, fingerprint: str) -> Optional[Document]: ...
+
+    @abstractmethod
+    async def insert_if_absent(self, calculation: Document) -> bool:
+        """Store a calculation unless one exists for its (owner, fingerprint); True if stored"""
+
+    @abstractmethod
+    async def insert_many_if_absent(self, calculations: List[Document]) -> int:
+        """Bulk `insert_if_absent`; returns how many were stored"""
+
+    @abstractmethod
+    async def stored_fingerprints(self, owner_ids: List[str],
+                                  fingerprints: List[str]) -> Set[Tuple[str, str]]:
+        """(owner_id, fingerprint) pairs among those given that already have a result"""
+
+    @abstractmethod
+    async def history(self, owner_id: str, limit: int) -> List[Document]:
+        """An owner's calculations, newest first"""
+
+    @abstractmethod
+    async def latest(self, owner_id: str, fields: Fields = None) -> Optional[Document]: ...
+
+    @abstractmethod
+    def export(self, match: Match, since: Optional[datetime] = None, until: Optional[datetime] = None,
+               fields: Fields = None, batch_size: int = 1000) -> AsyncIterator[Document]:
+        """Every calculation matching `match` with a calculation_date in [since, until), streamed in batches"""
+
+
+class ApplicationRepository(ABC):
+    @abstractmethod
+    async def insert(self, application: Document) -> None: ...
+
+    @abstractmethod
+    async def get(self, app_id: str) -> Optional[Document]: ...
+
+    @abstractmethod
+    async def get_many(self, app_ids: List[str], fields: Fields = None) -> List[Document]:
+        """The applications among `app_ids` that exist, in no particular order"""
+
+    @abstractmethod
+    async def update(self, app_id: str, changes: Dict[str, Any],
+                     statuses: Optional[Sequence[str]] = None) -> Optional[Document]:
+        """Atomically set `changes` if the application's status is in `statuses` (any, if None).
+
+        Returns the application as it was before the change, or None if no
+        application matched.
+        """
+
+    @abstractmethod
+    async def transition_many(self, transitions: List[Tuple[str, str, Dict[str, Any]]]) -> Set[str]:
+        """Apply each (app_id, expected status, changes) whose application still has that status.
+
+        `changes` must include the new `status` and an `updated_at` shared by
+        the batch. Returns the ids that were changed.
+        """
+
+    @abstractmethod
+    async def list_for_owner(self, owner_id: str, limit: Optional[int] = None,
+                             fields: Fields = None) -> List[Document]:
+        """An owner's applications, newest first"""
+
+    @abstractmethod
+    async def count_for_owner(self, owner_id: str) -> int: ...
+
+
+class IdempotencyRepository(ABC):
+    """Records of requests made with an Idempotency-Key, unique per (scope, key).
+
+    A record is `in_progress` while its request runs and `completed` once the
+    response is stored. Records past `expires_at`, and in-progress records
+    past `lease_expires_at` (their request died mid-flight), count as absent.
+    """
+
+    @abstractmethod
+    async def claim(self, record: Document, now: datetime) -> Optional[Document]:
+        """Store `record` unless a live record holds its (scope, key); returns that record if one does"""
+
+    @abstractmethod
+    async def complete(self, scope: str, key: str, response: str, expires_at: datetime) -> None:
+        """Mark a record completed with its encoded JSON response"""
+
+    @abstractmethod
+    async def release(self, scope: str, key: str) -> None:
+        """Drop an in-progress record so the request can be retried"""
+
+
+class JobRepository(ABC):
+    """Background job records, shared so any API worker can answer a poll.
+
+    Finished records carry an `expires_at` and count as absent once it has
+    passed; running records have none.
+    """
+
+    @abstractmethod
+    async def put(self, job: Document) -> None:
+        """Store the job's current state, replacing any earlier record of it"""
+
+    @abstractmethod
+    async def get(self, job_id: str) -> Optional[Document]: ...
+
+
+class ExportFileRepository(ABC):
+    """Finished export files, kept where every API worker can serve them"""
+
+    @abstractmethod
+    async def save(self, name: str, path: Path) -> None:
+        """Store the local file at `path` under `name`; the caller removes the local copy"""
+
+    @abstractmethod
+    async def open(self, name: str) -> Optional[AsyncIterator[bytes]]:
+        """The stored file's contents in chunks, or None if there is no such file"""
+
+    @abstractmethod
+    async def prune(self, older_than: datetime) -> None:
+        """Delete files stored before `older_than`"""
+
+
+class OwnerVersionRepository(ABC):
+    """Per-owner version counters bumped by writes, for deriving ETags.
+
+    Each owner's record holds a random `epoch`, fixed when the record is
+    created, plus one counter per marker in `VERSION_MARKERS`.
+    """
+
+    @abstractmethod
+    async def get(self, owner_id: str) -> Optional[Document]: ...
+
+    @abstractmethod
+    async def get_many(self, owner_ids: List[str]) -> List[Document]:
+        """The records that exist among `owner_ids`, in no particular order"""
+
+    @abstractmethod
+    async def create(self, owner_id: str) -> Document:
+        """Create the owner's record if it is missing and return it"""
+
+    @abstractmethod
+    async def bump(self, owner_ids: Sequence[str], markers: Sequence[str]) -> None:
+        """Increment `markers` for owners that have a record; owners without one need no bump"""
+
+
+class FunnelRollupRepository(ABC):
+    """Daily lead funnel counters, one row per (day, industry, employee_band).
+
+    Rows count `leads`, `business_owners` and `applications.<status>`. Only
+    leads carry an employee band; owners and applications count under
+    `UNKNOWN`, as does anything without an industry.
+    """
+
+    @abstractmethod
+    async def increment(self, counts: FunnelCounts, updated_at: datetime, batch_id: Optional[str] = None) -> None:
+        """Add `counts` to their rows, creating rows that do not exist yet.
+
+        With a `batch_id`, rows that already applied that batch are left as
+        they are, so a batch retried after a partial write is counted once.
+        """
+
+    @abstractmethod
+    async def between(self, since: str, until: str) -> List[Document]:
+        """Rows for days `since` through `until` (YYYY-MM-DD, inclusive)"""
+
+    @abstractmethod
+    async def rebuild(self) -> int:
+        """Recount every row from the leads, owners and applications; returns the number of rows"""
+
+
+class EligibilityRepository(ABC):
+    """Materialized eligibility results, one per owner, in the owner's (created_at, id) order.
+
+    Results carry the owner's id as both `id` and `business_owner_id`, and
+    its `created_at`, so they page like the owners themselves.
+    """
+
+    @abstractmethod
+    def facts(self, owner_ids: Optional[List[str]] = None) -> AsyncIterator[Document]:
+        """Every owner (or those in `owner_ids`) with its roster's employee_count, read in one pass.
+
+        Each document has the owner's id, created_at, business_name,
+        industry and years_in_business. Owners without a roster rollup count
+        as having no employees.
+        """
+
+    @abstractmethod
+    async def put_many(self, results: List[Document]) -> None:
+        """Store results, replacing any earlier result for the same owner"""
+
+    @abstractmethod
+    def page(self, match: Match, min_employees: Optional[int] = None, max_employees: Optional[int] = None,
+             after: Optional[Position] = None, limit: Optional[int] = None) -> AsyncIterator[Document]:
+        """Results matching `match` with employee_count in [min_employees, max_employees]"""
+
+
+class Storage(ABC):
+    """One repository per collection, plus lifecycle hooks for the backend"""
+
+    name: str
+    leads: LeadRepository
+    owners: BusinessOwnerRepository
+    employees: EmployeeRepository
+    rollups: RosterRollupRepository
+    plans: BenefitPlanRepository
+    calculations: FICACalculationRepository
+    applications: ApplicationRepository
+    idempotency: IdempotencyRepository
+    jobs: JobRepository
+    exports: ExportFileRepository
+    versions: OwnerVersionRepository
+    funnel: FunnelRollupRepository
+    eligibility: EligibilityRepository
+
+    async def prepare(self, verify_query_plans: bool = False) -> None:
+        """Create indexes or other structures the backend needs before serving"""
+
+    async def ping(self) -> None:
+        """Round-trip to the backend, raising if it cannot serve requests"""
+
+    async def close(self) -> None:
+        """Release connections held by the backend"""
@@ -0,0 +1,596 @@
+"""In-memory implementation of the storage repositories.
+
+Every collection is a dict keyed by id plus secondary indexes kept sorted with
+`bisect`, so lookups, keyset pages and per-owner reads cost about what the
+matching Mongo index scan would, minus the network. Data lives only as long as
+the process; this backend is meant for tests, benchmarks and profiling.
+"""
+import asyncio
+import bisect
+from datetime import datetime
+from pathlib import Path
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Optional, Sequence, Set, Tuple
+
+from storage.base import (
+    ApplicationRepository,
+    BenefitPlanRepository,
+    BusinessOwnerRepository,
+    Document,
+    EligibilityRepository,
+    EmployeeRepository,
+    ExportFileRepository,
+    FICACalculationRepository,
+    Fields,
+    FunnelCounts,
+    FunnelKey,
+    FunnelRollupRepository,
+    IdempotencyRepository,
+    JobRepository,
+    LeadRepository,
+    Match,
+    OwnerVersionRepository,
+    Position,
+    RECENT_FUNNEL_BATCHES,
+    ROSTER_TOTAL_FIELDS,
+    RosterRollupRepository,
+    Storage,
+    application_counter,
+    funnel_counts,
+    funnel_key,
+    funnel_row,
+    new_version_record,
+    roster_totals,
+)
+
+
+def project(doc: Document, fields: Fields = None) -> Document:
+    if fields is None:
+        return dict(doc)
+    return {field: doc[field] for field in fields if field in doc}
+
+
+class SortedIndex:
+    """Secondary index: group value -> row ids ordered by a sort key"""
+
+    def __init__(self, group: Callable[[Document], Any], sort_key: Callable[[Document], Tuple]):
+        self._group = group
+        self._sort_key = sort_key
+        self._entries: Dict[Any, List[Tuple]] = {}
+
+    def add(self, doc: Document):
+        bisect.insort(self._entries.setdefault(self._group(doc), []), (self._sort_key(doc), doc["id"]))
+
+    def remove(self, doc: Document):
+        entries = self._entries.get(self._group(doc), [])
+        entry = (self._sort_key(doc), doc["id"])
+        position = bisect.bisect_left(entries, entry)
+        if position < len(entries) and entries[position] == entry:
+            del entries[position]
+
+    def count(self, group) -> int:
+        return len(self._entries.get(group, []))
+
+    def ids(self, group, after: Optional[Tuple] = None, descending: bool = False) -> Iterator[str]:
+        entries = self._entries.get(group, [])
+        if descending:
+            end = bisect.bisect_left(entries, (after, "")) if after is not None else len(entries)
+            return (row_id for _, row_id in reversed(entries[:end]))
+        start = bisect.bisect_right(entries, (after, "\uffff")) if after is not None else 0
+        return (row_id for _, row_id in entries[start:])
+
+
+class Table:
+    """Rows by id plus any number of sorted secondary indexes"""
+
+    def __init__(self, **indexes: SortedIndex):
+        self.rows: Dict[str, Document] = {}
+        self.indexes = indexes
+
+    def insert(self, doc: Document):
+        doc = dict(doc)
+        self.rows[doc["id"]] = doc
+        for index in self.indexes.values():
+            index.add(doc)
+
+    def delete(self, row_id: str) -> Optional[Document]:
+        doc = self.rows.pop(row_id, None)
+        if doc is not None:
+            for index in self.indexes.values():
+                index.remove(doc)
+        return doc
+
+    def replace(self, row_id: str, changes: Dict[str, Any]) -> Document:
+        doc = self.delete(row_id)
+        self.insert({**doc, **changes})
+        return self.rows[row_id]
+
+    def scan(self, index: str, group=None, after: Optional[Tuple] = None, descending: bool = False,
+             limit: Optional[int] = None) -> List[Document]:
+        rows = []
+        for row_id in self.indexes[index].ids(group, after, descending):
+            rows.append(self.rows[row_id])
+            if limit and len(rows) >= limit:
+                break
+        return rows
+
+
+def created_order(doc: Document) -> Tuple:
+    return (doc["created_at"], doc["id"])
+
+
+def keyset_after(after: Optional[Position]) -> Optional[Tuple]:
+    # Index entries are ((created_at, id), id); the sort key alone orders them
+    return (after[0], after[1]) if after is not None else None
+
+
+async def _iterate(rows: List[Document]) -> AsyncIterator[Document]:
+    for row in rows:
+        yield dict(row)
+
+
+def _matches(doc: Document, match: Match) -> bool:
+    for field, value in match.items():
+        if isinstance(value, (list, tuple, set)):
+            if doc.get(field) not in value:
+                return False
+        elif doc.get(field) != value:
+            return False
+    return True
+
+
+async def _export(table: Table, match: Match, time_field: str, since: Optional[datetime],
+                  until: Optional[datetime], fields: Fields, batch_size: int) -> AsyncIterator[Document]:
+    rows = list(table.rows.values())
+    for start in range(0, len(rows), batch_size):
+        for doc in rows[start:start + batch_size]:
+            if not _matches(doc, match):
+                continue
+            if since is not None and doc[time_field] < since or until is not None and doc[time_field] >= until:
+                continue
+            yield project(doc, fields)
+        # Let other requests run between batches, as a database round trip would
+        await asyncio.sleep(0)
+
+
+class MemoryLeadRepository(LeadRepository):
+    def __init__(self):
+        self.table = Table(created=SortedIndex(lambda doc: None, created_order))
+
+    async def insert(self, lead: Document) -> None:
+        self.table.insert(lead)
+
+    async def insert_many(self, leads: List[Document]) -> None:
+        for lead in leads:
+            if lead["id"] not in self.table.rows:
+                self.table.insert(lead)
+
+    def page(self, after: Optional[Position] = None, limit: Optional[int] = None) -> AsyncIterator[Document]:
+        return _iterate(self.table.scan("created", None, keyset_after(after), descending=True, limit=limit))
+
+
+class MemoryBusinessOwnerRepository(BusinessOwnerRepository):
+    def __init__(self):
+        self.table = Table(created=SortedIndex(lambda doc: None, created_order))
+
+    async def insert(self, owner: Document) -> None:
+        self.table.insert(owner)
+
+    async def get(self, owner_id: str, fields: Fields = None) -> Optional[Document]:
+        owner = self.table.rows.get(owner_id)
+        return project(owner, fields) if owner is not None else None
+
+    async def get_many(self, owner_ids: List[str], fields: Fields = None) -> List[Document]:
+        rows = self.table.rows
+        return [project(rows[owner_id], fields) for owner_id in dict.fromkeys(owner_ids) if owner_id in rows]
+
+    def page(self, after: Optional[Position] = None, limit: Optional[int] = None) -> AsyncIterator[Document]:
+        return _iterate(self.table.scan("created", None, keyset_after(after), limit=limit))
+
+    async def count(self, owner_ids: Optional[List[str]] = None) -> int:
+        if owner_ids is None:
+            return len(self.table.rows)
+        return len({owner_id for owner_id in owner_ids if owner_id in self.table.rows})
+
+    async def iter_ids(self, owner_ids: Optional[List[str]] = None) -> AsyncIterator[str]:
+        ids = list(self.table.rows) if owner_ids is None else [
+            owner_id for owner_id in dict.fromkeys(owner_ids) if owner_id in self.table.rows
+        ]
+        for owner_id in ids:
+            yield owner_id
+
+    def export(self, match: Match, since: Optional[datetime] = None, until: Optional[datetime] = None,
+               fields: Fields = None, batch_size: int = 1000) -> AsyncIterator[Document]:
+        return _export(self.table, match, "created_at", since, until, fields, batch_size)
+
+
+class MemoryEmployeeRepository(EmployeeRepository):
+    def __init__(self):
+        self.table = Table(owner=SortedIndex(lambda doc: doc["business_owner_id"], created_order))
+
+    async def insert(self, employee: Document) -> None:
+        self.table.insert(employee)
+
+    async def insert_many(self, employees: List[Document]) -> None:
+        for employee in employees:
+            self.table.insert(employee)
+
+    async def get(self, employee_id: str) -> Optional[Document]:
+        employee = self.table.rows.get(employee_id)
+        return dict(employee) if employee is not None else None
+
+    async def delete(self, employee_id: str) -> Optional[Document]:
+        return self.table.delete(employee_id)
+
+    def page_for_owner(self, owner_id: str, after: Optional[Position] = None,
+                       limit: Optional[int] = None) -> AsyncIterator[Document]:
+        return _iterate(self.table.scan("owner", owner_id, keyset_after(after), limit=limit))
+
+    async def roster(self, owner_id: str, fields: Fields = None) -> List[Document]:
+        return [project(emp, fields) for emp in self.table.scan("owner", owner_id)]
+
+    async def rosters(self, owner_ids: List[str], fields: Fields = None) -> AsyncIterator[Document]:
+        if fields is not None and "business_owner_id" not in fields:
+            fields = [*fields, "business_owner_id"]
+        for owner_id in owner_ids:
+            for employee in self.table.scan("owner", owner_id):
+                yield project(employee, fields)
+
+    async def summarize(self, owner_id: str) -> Dict[str, Any]:
+        employees = self.table.scan("owner", owner_id)
+        return roster_totals(employees) if employees else {}
+
+    def export(self, match: Match, since: Optional[datetime] = None, until: Optional[datetime] = None,
+               fields: Fields = None, batch_size: int = 1000) -> AsyncIterator[Document]:
+        return _export(self.table, match, "created_at", since, until, fields, batch_size)
+
+
+class MemoryRosterRollupRepository(RosterRollupRepository):
+    def __init__(self, employees: MemoryEmployeeRepository):
+        self.rollups: Dict[str, Document] = {}
+        self.employees = employees
+
+    async def get(self, owner_id: str) -> Optional[Document]:
+        rollup = self.rollups.get(owner_id)
+        return dict(rollup) if rollup is not None else None
+
+    async def put(self, owner_id: str, totals: Dict[str, Any], updated_at: datetime) -> None:
+        self.rollups[owner_id] = {
+            **self.rollups.get(owner_id, {}), **totals, "business_owner_id": owner_id, "updated_at": updated_at
+        }
+
+    async def increment(self, owner_id: str, delta: Dict[str, Any], updated_at: datetime) -> Optional[Document]:
+        rollup = self.rollups.get(owner_id)
+        if rollup is None:
+            return None
+        for field, value in delta.items():
+            rollup[field] = rollup.get(field, 0) + value
+        rollup["updated_at"] = updated_at
+        return dict(rollup)
+
+    def _totals_by_owner(self) -> Dict[str, Tuple]:
+        return {
+            owner_id: tuple(rollup.get(field) for field in ROSTER_TOTAL_FIELDS)
+            for owner_id, rollup in self.rollups.items()
+        }
+
+    async def rebuild_all(self) -> Tuple[int, List[str]]:
+        before = self._totals_by_owner()
+        updated_at = datetime.utcnow()
+        by_owner: Dict[str, List[Document]] = {}
+        for employee in self.employees.table.rows.values():
+            by_owner.setdefault(employee["business_owner_id"], []).append(employee)
+        for owner_id in self.rollups.keys() - by_owner.keys():
+            await self.put(owner_id, {field: 0 for field in ROSTER_TOTAL_FIELDS}, updated_at)
+        for owner_id, employees in by_owner.items():
+            await self.put(owner_id, roster_totals(employees), updated_at)
+        after = self._totals_by_owner()
+        return len(after), [owner_id for owner_id, totals in after.items() if before.get(owner_id) != totals]
+
+
+class MemoryBenefitPlanRepository(BenefitPlanRepository):
+    def __init__(self):
+        self.table = Table()
+
+    async def insert(self, plan: Document) -> None:
+        self.table.insert(plan)
+
+    async def all(self) -> List[Document]:
+        return [dict(plan, features=list(plan.get("features", []))) for plan in self.table.rows.values()]
+
+    async def count(self) -> int:
+        return len(self.table.rows)
+
+    async def seed(self, plans: List[Document]) -> int:
+        # A list rather than a set: str enums and their values compare equal but hash differently
+        stored = [(plan["plan_type"], plan["name"]) for plan in self.table.rows.values()]
+        added = 0
+        for plan in plans:
+            if (plan["plan_type"], plan["name"]) not in stored:
+                self.table.insert(plan)
+                stored.append((plan["plan_type"], plan["name"]))
+                added += 1
+        return added
+
+
+class MemoryFICACalculationRepository(FICACalculationRepository):
+    def __init__(self):
+        self.table = Table(
+            owner=SortedIndex(lambda doc: doc["business_owner_id"], lambda doc: (doc["calculation_date"], doc["id"]))
+        )
+        self.by_fingerprint: Dict[Tuple[str, str], str] = {}
+
+    async def find_by_fingerprint(self, owner_id: str, fingerprint: str) -> Optional[Document]:
+        calc_id = self.by_fingerprint.get((owner_id, fingerprint))
+        return dict(self.table.rows[calc_id]) if calc_id is not None else None
+
+    async def insert_if_absent(self, calculation: Document) -> bool:
+        key = (calculation["business_owner_id"], calculation["roster_fingerprint"])
+        if key in self.by_fingerprint:
+            return False
+        self.table.insert(calculation)
+        self.by_fingerprint[key] = calculation["id"]
+        return True
+
+    async def insert_many_if_absent(self, calculations: List[Document]) -> int:
+        stored = 0
+        for calculation in calculations:
+            stored += await self.insert_if_absent(calculation)
+        return stored
+
+    async def stored_fingerprints(self, owner_ids: List[str],
+                                  fingerprints: List[str]) -> Set[Tuple[str, str]]:
+        owners = set(owner_ids)
+        return {
+            (owner_id, fingerprint) for fingerprint in fingerprints for owner_id in owners
+            if (owner_id, fingerprint) in self.by_fingerprint
+        }
+
+    async def history(self, owner_id: str, limit: int) -> List[Document]:
+        return [dict(calc) for calc in self.table.scan("owner", owner_id, descending=True, limit=limit)]
+
+    async def latest(self, owner_id: str, fields: Fields = None) -> Optional[Document]:
+        rows = self.table.scan("owner", owner_id, descending=True, limit=1)
+        return project(rows[0], fields) if rows else None
+
+    def export(self, match: Match, since: Optional[datetime] = None, until: Optional[datetime] = None,
+               fields: Fields = None, batch_size: int = 1000) -> AsyncIterator[Document]:
+        return _export(self.table, match, "calculation_date", since, until, fields, batch_size)
+
+
+class MemoryApplicationRepository(ApplicationRepository):
+    def __init__(self):
+        self.table = Table(owner=SortedIndex(lambda doc: doc["business_owner_id"], created_order))
+
+    async def insert(self, application: Document) -> None:
+        self.table.insert(application)
+
+    async def get(self, app_id: str) -> Optional[Document]:
+        application = self.table.rows.get(app_id)
+        return dict(application) if application is not None else None
+
+    async def get_many(self, app_ids: List[str], fields: Fields = None) -> List[Document]:
+        rows = self.table.rows
+        return [project(rows[app_id], fields) for app_id in dict.fromkeys(app_ids) if app_id in rows]
+
+    async def update(self, app_id: str, changes: Dict[str, Any],
+                     statuses: Optional[Sequence[str]] = None) -> Optional[Document]:
+        application = self.table.rows.get(app_id)
+        if application is None or statuses is not None and application["status"] not in statuses:
+            return None
+        before = dict(application)
+        self.table.replace(app_id, changes)
+        return before
+
+    async def transition_many(self, transitions: List[Tuple[str, str, Dict[str, Any]]]) -> Set[str]:
+        moved = set()
+        for app_id, status, changes in transitions:
+            application = self.table.rows.get(app_id)
+            if application is not None and application["status"] == status:
+                self.table.replace(app_id, changes)
+                moved.add(app_id)
+        return moved
+
+    async def list_for_owner(self, owner_id: str, limit: Optional[int] = None,
+                             fields: Fields = None) -> List[Document]:
+        return [project(app, fields) for app in self.table.scan("owner", owner_id, descending=True, limit=limit)]
+
+    async def count_for_owner(self, owner_id: str) -> int:
+        return self.table.indexes["owner"].count(owner_id)
+
+
+class MemoryIdempotencyRepository(IdempotencyRepository):
+    def __init__(self):
+        self.records: Dict[Tuple[str, str], Document] = {}
+
+    @staticmethod
+    def _live(record: Document, now: datetime) -> bool:
+        if record["expires_at"] < now:
+            return False
+        return record["state"] != "in_progress" or record["lease_expires_at"] >= now
+
+    async def claim(self, record: Document, now: datetime) -> Optional[Document]:
+        existing = self.records.get((record["scope"], record["key"]))
+        if existing is not None and self._live(existing, now):
+            return dict(existing)
+        self.records[(record["scope"], record["key"])] = dict(record)
+        return None
+
+    async def complete(self, scope: str, key: str, response: str, expires_at: datetime) -> None:
+        record = self.records.get((scope, key))
+        if record is not None:
+            record.update(state="completed", response=response, expires_at=expires_at)
+
+    async def release(self, scope: str, key: str) -> None:
+        record = self.records.get((scope, key))
+        if record is not None and record["state"] == "in_progress":
+            del self.records[(scope, key)]
+
+
+class MemoryJobRepository(JobRepository):
+    def __init__(self):
+        self.records: Dict[str, Document] = {}
+
+    async def put(self, job: Document) -> None:
+        now = datetime.utcnow()
+        if job.get("expires_at") is not None:
+            # Finishing a job is rare enough to sweep expired records then
+            for job_id in [key for key, record in self.records.items() if self._expired(record, now)]:
+                del self.records[job_id]
+        self.records[job["id"]] = dict(job)
+
+    async def get(self, job_id: str) -> Optional[Document]:
+        record = self.records.get(job_id)
+        if record is None or self._expired(record, datetime.utcnow()):
+            return None
+        return dict(record)
+
+    @staticmethod
+    def _expired(record: Document, now: datetime) -> bool:
+        return record.get("expires_at") is not None and record["expires_at"] < now
+
+
+class MemoryExportFileRepository(ExportFileRepository):
+    def __init__(self):
+        self.files: Dict[str, Tuple[bytes, datetime]] = {}
+
+    async def save(self, name: str, path: Path) -> None:
+        self.files[name] = (await asyncio.to_thread(path.read_bytes), datetime.utcnow())
+
+    async def open(self, name: str) -> Optional[AsyncIterator[bytes]]:
+        stored = self.files.get(name)
+        if stored is None:
+            return None
+
+        async def chunks():
+            yield stored[0]
+        return chunks()
+
+    async def prune(self, older_than: datetime) -> None:
+        for name in [name for name, (_, saved_at) in self.files.items() if saved_at < older_than]:
+            del self.files[name]
+
+
+class MemoryOwnerVersionRepository(OwnerVersionRepository):
+    def __init__(self):
+        self.records: Dict[str, Document] = {}
+
+    async def get(self, owner_id: str) -> Optional[Document]:
+        record = self.records.get(owner_id)
+        return dict(record) if record is not None else None
+
+    async def get_many(self, owner_ids: List[str]) -> List[Document]:
+        return [dict(self.records[owner_id]) for owner_id in set(owner_ids) if owner_id in self.records]
+
+    async def create(self, owner_id: str) -> Document:
+        record = self.records.setdefault(owner_id, new_version_record(owner_id))
+        return dict(record)
+
+    async def bump(self, owner_ids: Sequence[str], markers: Sequence[str]) -> None:
+        for owner_id in owner_ids:
+            record = self.records.get(owner_id)
+            if record is not None:
+                for marker in markers:
+                    record[marker] += 1
+
+
+class MemoryFunnelRollupRepository(FunnelRollupRepository):
+    def __init__(self, leads: MemoryLeadRepository, owners: MemoryBusinessOwnerRepository,
+                 applications: MemoryApplicationRepository):
+        self.counts: FunnelCounts = {}
+        self.batches: Dict[FunnelKey, List[str]] = {}
+        self.leads = leads
+        self.owners = owners
+        self.applications = applications
+
+    async def increment(self, counts: FunnelCounts, updated_at: datetime, batch_id: Optional[str] = None) -> None:
+        for key, counters in counts.items():
+            if batch_id is not None:
+                applied = self.batches.setdefault(key, [])
+                if batch_id in applied:
+                    continue
+                applied.append(batch_id)
+                del applied[:-RECENT_FUNNEL_BATCHES]
+            row = self.counts.setdefault(key, {})
+            for counter, value in counters.items():
+                row[counter] = row.get(counter, 0) + value
+
+    async def between(self, since: str, until: str) -> List[Document]:
+        return [funnel_row(key, counters) for key, counters in sorted(self.counts.items()) if since <= key[0] <= until]
+
+    async def rebuild(self) -> int:
+        owners = self.owners.table.rows
+        entries = [
+            (funnel_key(lead["created_at"], lead.get("industry"), lead.get("number_of_employees")), "leads", 1)
+            for lead in self.leads.table.rows.values()
+        ]
+        entries += [(funnel_key(owner["created_at"], owner["industry"]), "business_owners", 1) for owner in owners.values()]
+        entries += [
+            (
+                funnel_key(application["created_at"], owners.get(application["business_owner_id"], {}).get("industry")),
+                application_counter(application["status"]),
+                1,
+            )
+            for application in self.applications.table.rows.values()
+        ]
+        self.counts = funnel_counts(entries)
+        self.batches = {}
+        return len(self.counts)
+
+
+class MemoryEligibilityRepository(EligibilityRepository):
+    def __init__(self, owners: MemoryBusinessOwnerRepository, rollups: MemoryRosterRollupRepository):
+        self.table = Table(created=SortedIndex(lambda doc: None, created_order))
+        self.owners = owners
+        self.rollups = rollups
+
+    async def facts(self, owner_ids: Optional[List[str]] = None) -> AsyncIterator[Document]:
+        rows = self.owners.table.rows
+        for owner_id in list(rows) if owner_ids is None else owner_ids:
+            owner = rows.get(owner_id)
+            if owner is None:
+                continue
+            rollup = self.rollups.rollups.get(owner_id, {})
+            yield {
+                **project(owner, ["id", "created_at", "business_name", "industry", "years_in_business"]),
+                "employee_count": rollup.get("employee_count", 0),
+            }
+
+    async def put_many(self, results: List[Document]) -> None:
+        for result in results:
+            self.table.delete(result["id"])
+            self.table.insert(result)
+
+    async def page(self, match: Match, min_employees: Optional[int] = None, max_employees: Optional[int] = None,
+                   after: Optional[Position] = None, limit: Optional[int] = None) -> AsyncIterator[Document]:
+        returned = 0
+        for row_id in self.table.indexes["created"].ids(None, keyset_after(after)):
+            result = self.table.rows[row_id]
+            if not _matches(result, match):
+                continue
+            if min_employees is not None and result["employee_count"] < min_employees:
+                continue
+            if max_employees is not None and result["employee_count"] > max_employees:
+                continue
+            yield dict(result)
+            returned += 1
+            if limit and returned >= limit:
+                return
+
+
+class MemoryStorage(Storage):
+    name = "memory"
+
+    def __init__(self):
+        self.leads = MemoryLeadRepository()
+        self.owners = MemoryBusinessOwnerRepository()
+        self.employees = MemoryEmployeeRepository()
+        self.rollups = MemoryRosterRollupRepository(self.employees)
+        self.plans = MemoryBenefitPlanRepository()
+        self.calculations = MemoryFICACalculationRepository()
+        self.applications = MemoryApplicationRepository()
+        self.idempotency = MemoryIdempotencyRepository()
+        self.jobs = MemoryJobRepository()
+        self.exports = MemoryExportFileRepository()
+        self.versions = MemoryOwnerVersionRepository()
+        self.funnel = MemoryFunnelRollupRepository(self.leads, self.owners, self.applications)
+        self.eligibility = MemoryEligibilityRepository(self.owners, self.rollups)
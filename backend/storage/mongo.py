@@ -0,0 +1,679 @@
+"""MongoDB (Motor) implementation of the storage repositories"""
+import asyncio
+import logging
+from datetime import datetime
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence, Set, Tuple
+
+from gridfs.errors import NoFile
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorGridFSBucket
+from pymongo import ReplaceOne, ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+
+import indexes
+from storage.base import (
+    ApplicationRepository,
+    BenefitPlanRepository,
+    BusinessOwnerRepository,
+    Document,
+    EligibilityRepository,
+    EmployeeRepository,
+    ExportFileRepository,
+    FICACalculationRepository,
+    Fields,
+    FunnelCounts,
+    FunnelRollupRepository,
+    IdempotencyRepository,
+    JobRepository,
+    LeadRepository,
+    Match,
+    OwnerVersionRepository,
+    Position,
+    RECENT_FUNNEL_BATCHES,
+    ROSTER_TOTAL_FIELDS,
+    RosterRollupRepository,
+    Storage,
+    application_counter,
+    funnel_counts,
+    funnel_day_key,
+    funnel_row,
+    new_version_record,
+)
+
+logger = logging.getLogger(__name__)
+
+DUPLICATE_KEY = 11000
+
+# Per-employee contribution to each roster total, as aggregation expressions
+ROSTER_ACCUMULATORS = {
+    "employee_count": {"$sum": 1},
+    "total_salaries": {"$sum": "$annual_salary"},
+    "health_insured_count": {"$sum": {"$cond": ["$has_current_health_insurance", 1, 0]}},
+    "life_insured_count": {"$sum": {"$cond": ["$has_current_life_insurance", 1, 0]}},
+    "health_premium_total": {"$sum": {"$cond": [
+        "$has_current_health_insurance", {"$ifNull": ["$current_health_premium", 0]}, 0
+    ]}},
+    "life_premium_total": {"$sum": {"$cond": [
+        "$has_current_life_insurance", {"$ifNull": ["$current_life_premium", 0]}, 0
+    ]}},
+}
+
+
+def projection(fields: Fields) -> Dict[str, int]:
+    if fields is None:
+        return {"_id": 0}
+    return {"_id": 0, **{field: 1 for field in fields}}
+
+
+def keyset_query(query: Dict[str, Any], after: Optional[Position], descending: bool = False) -> Dict[str, Any]:
+    """Restrict `query` to rows after `after` in (created_at, id) order"""
+    if after is None:
+        return query
+    created_at, row_id = after
+    op = "$lt" if descending else "$gt"
+    condition = {"$or": [
+        {"created_at": {op: created_at}},
+        {"created_at": created_at, "id": {op: row_id}},
+    ]}
+    return {"$and": [query, condition]} if query else condition
+
+
+def keyset_cursor(collection, query: Dict[str, Any], after: Optional[Position], limit: Optional[int],
+                  descending: bool = False):
+    direction = -1 if descending else 1
+    cursor = collection.find(keyset_query(query, after, descending), {"_id": 0})
+    cursor = cursor.sort([("created_at", direction), ("id", direction)])
+    if limit:
+        cursor = cursor.limit(limit)
+    return cursor
+
+
+def export_cursor(collection, match: Match, time_field: str, since: Optional[datetime],
+                  until: Optional[datetime], fields: Fields, batch_size: int):
+    """An unsorted cursor over matching documents, fetched `batch_size` at a time"""
+    query: Dict[str, Any] = {
+        field: {"$in": list(value)} if isinstance(value, (list, tuple, set)) else value
+        for field, value in match.items()
+    }
+    window = {}
+    if since is not None:
+        window["$gte"] = since
+    if until is not None:
+        window["$lt"] = until
+    if window:
+        query[time_field] = window
+    return collection.find(query, projection(fields), batch_size=batch_size)
+
+
+class MongoLeadRepository(LeadRepository):
+    def __init__(self, db):
+        self.collection = db.leads
+
+    async def insert(self, lead: Document) -> None:
+        await self.collection.insert_one(dict(lead))
+
+    async def insert_many(self, leads: List[Document]) -> None:
+        if not leads:
+            return
+        try:
+            await self.collection.insert_many([dict(lead) for lead in leads], ordered=False)
+        except BulkWriteError as exc:
+            # A retried batch may already be partly stored; only duplicate ids are expected
+            if any(error["code"] != DUPLICATE_KEY for error in exc.details["writeErrors"]):
+                raise
+
+    def page(self, after: Optional[Position] = None, limit: Optional[int] = None) -> AsyncIterator[Document]:
+        return keyset_cursor(self.collection, {}, after, limit, descending=True)
+
+
+class MongoBusinessOwnerRepository(BusinessOwnerRepository):
+    def __init__(self, db):
+        self.collection = db.business_owners
+
+    async def insert(self, owner: Document) -> None:
+        await self.collection.insert_one(dict(owner))
+
+    async def get(self, owner_id: str, fields: Fields = None) -> Optional[Document]:
+        return await self.collection.find_one({"id": owner_id}, projection(fields))
+
+    async def get_many(self, owner_ids: List[str], fields: Fields = None) -> List[Document]:
+        return await self.collection.find({"id": {"$in": owner_ids}}, projection(fields)).to_list(None)
+
+    def page(self, after: Optional[Position] = None, limit: Optional[int] = None) -> AsyncIterator[Document]:
+        return keyset_cursor(self.collection, {}, after, limit)
+
+    async def count(self, owner_ids: Optional[List[str]] = None) -> int:
+        query = {"id": {"$in": owner_ids}} if owner_ids is not None else {}
+        return await self.collection.count_documents(query)
+
+    async def iter_ids(self, owner_ids: Optional[List[str]] = None) -> AsyncIterator[str]:
+        query = {"id": {"$in": owner_ids}} if owner_ids is not None else {}
+        async for owner in self.collection.find(query, {"_id": 0, "id": 1}):
+            yield owner["id"]
+
+    def export(self, match: Match, since: Optional[datetime] = None, until: Optional[datetime] = None,
+               fields: Fields = None, batch_size: int = 1000) -> AsyncIterator[Document]:
+        return export_cursor(self.collection, match, "created_at", since, until, fields, batch_size)
+
+
+class MongoEmployeeRepository(EmployeeRepository):
+    def __init__(self, db):
+        self.collection = db.employees
+
+    async def insert(self, employee: Document) -> None:
+        await self.collection.insert_one(dict(employee))
+
+    async def insert_many(self, employees: List[Document]) -> None:
+        if employees:
+            await self.collection.insert_many([dict(emp) for emp in employees], ordered=False)
+
+    async def get(self, employee_id: str) -> Optional[Document]:
+        return await self.collection.find_one({"id": employee_id}, {"_id": 0})
+
+    async def delete(self, employee_id: str) -> Optional[Document]:
+        return await self.collection.find_one_and_delete({"id": employee_id}, {"_id": 0})
+
+    def page_for_owner(self, owner_id: str, after: Optional[Position] = None,
+                       limit: Optional[int] = None) -> AsyncIterator[Document]:
+        return keyset_cursor(self.collection, {"business_owner_id": owner_id}, after, limit)
+
+    async def roster(self, owner_id: str, fields: Fields = None) -> List[Document]:
+        return await self.collection.find({"business_owner_id": owner_id}, projection(fields)).to_list(None)
+
+    def rosters(self, owner_ids: List[str], fields: Fields = None) -> AsyncIterator[Document]:
+        if fields is not None and "business_owner_id" not in fields:
+            fields = [*fields, "business_owner_id"]
+        return self.collection.find({"business_owner_id": {"$in": owner_ids}}, projection(fields))
+
+    async def summarize(self, owner_id: str) -> Dict[str, Any]:
+        pipeline = [
+            {"$match": {"business_owner_id": owner_id}},
+            {"$group": {"_id": None, **ROSTER_ACCUMULATORS}},
+            {"$project": {"_id": 0}},
+        ]
+        results = await self.collection.aggregate(pipeline).to_list(1)
+        return results[0] if results else {}
+
+    def export(self, match: Match, since: Optional[datetime] = None, until: Optional[datetime] = None,
+               fields: Fields = None, batch_size: int = 1000) -> AsyncIterator[Document]:
+        return export_cursor(self.collection, match, "created_at", since, until, fields, batch_size)
+
+
+class MongoRosterRollupRepository(RosterRollupRepository):
+    def __init__(self, db):
+        self.collection = db.roster_rollups
+        self.employees = db.employees
+
+    async def get(self, owner_id: str) -> Optional[Document]:
+        return await self.collection.find_one({"business_owner_id": owner_id}, {"_id": 0})
+
+    async def put(self, owner_id: str, totals: Dict[str, Any], updated_at: datetime) -> None:
+        await self.collection.update_one(
+            {"business_owner_id": owner_id},
+            {"$set": {**totals, "business_owner_id": owner_id, "updated_at": updated_at}},
+            upsert=True,
+        )
+
+    async def increment(self, owner_id: str, delta: Dict[str, Any], updated_at: datetime) -> Optional[Document]:
+        return await self.collection.find_one_and_update(
+            {"business_owner_id": owner_id},
+            {"$inc": delta, "$set": {"updated_at": updated_at}},
+            projection={"_id": 0},
+            return_document=ReturnDocument.AFTER,
+        )
+
+    async def _totals_by_owner(self) -> Dict[str, Tuple]:
+        projection = {"_id": 0, "business_owner_id": 1, **dict.fromkeys(ROSTER_TOTAL_FIELDS, 1)}
+        return {
+            rollup["business_owner_id"]: tuple(rollup.get(field) for field in ROSTER_TOTAL_FIELDS)
+            async for rollup in self.collection.find({}, projection)
+        }
+
+    async def rebuild_all(self) -> Tuple[int, List[str]]:
+        before = await self._totals_by_owner()
+        started_at = datetime.utcnow()
+        await self.employees.aggregate([
+            {"$group": {"_id": "$business_owner_id", **ROSTER_ACCUMULATORS}},
+            {"$project": {
+                "_id": 0,
+                "business_owner_id": "$_id",
+                **{field: 1 for field in ROSTER_ACCUMULATORS},
+                "updated_at": {"$literal": started_at},
+            }},
+            {"$merge": {
+                "into": self.collection.name,
+                "on": "business_owner_id",
+                "whenMatched": "replace",
+                "whenNotMatched": "insert",
+            }},
+        ]).to_list(None)
+        # Rollups not refreshed above belong to owners that no longer have employees
+        zeroed = {field: 0 for field in ROSTER_TOTAL_FIELDS}
+        await self.collection.update_many(
+            {"updated_at": {"$lt": started_at}},
+            {"$set": {**zeroed, "updated_at": started_at}},
+        )
+        after = await self._totals_by_owner()
+        return len(after), [owner_id for owner_id, totals in after.items() if before.get(owner_id) != totals]
+
+
+class MongoBenefitPlanRepository(BenefitPlanRepository):
+    def __init__(self, db):
+        self.collection = db.benefit_plans
+
+    async def insert(self, plan: Document) -> None:
+        await self.collection.insert_one(dict(plan))
+
+    async def all(self) -> List[Document]:
+        return await self.collection.find({}, {"_id": 0}).to_list(None)
+
+    async def count(self) -> int:
+        return await self.collection.count_documents({})
+
+    async def seed(self, plans: List[Document]) -> int:
+        if not plans:
+            return 0
+        try:
+            result = await self.collection.bulk_write(
+                [UpdateOne({"plan_type": plan["plan_type"], "name": plan["name"]},
+                           {"$setOnInsert": dict(plan)}, upsert=True) for plan in plans],
+                ordered=False,
+            )
+        except BulkWriteError as exc:
+            # Another worker seeding at the same moment inserted the same plan id first
+            if any(error["code"] != DUPLICATE_KEY for error in exc.details["writeErrors"]):
+                raise
+            return exc.details["nUpserted"]
+        return result.upserted_count
+
+
+class MongoFICACalculationRepository(FICACalculationRepository):
+    def __init__(self, db):
+        self.collection = db.fica_calculations
+
+    async def find_by_fingerprint(self, owner_id: str, fingerprint: str) -> Optional[Document]:
+        return await self.collection.find_one(
+            {"business_owner_id": owner_id, "roster_fingerprint": fingerprint}, {"_id": 0}
+        )
+
+    @staticmethod
+    def _memo_key(calculation: Document) -> Dict[str, Any]:
+        return {"business_owner_id": calculation["business_owner_id"],
+                "roster_fingerprint": calculation["roster_fingerprint"]}
+
+    async def insert_if_absent(self, calculation: Document) -> bool:
+        result = await self.collection.update_one(
+            self._memo_key(calculation), {"$setOnInsert": dict(calculation)}, upsert=True
+        )
+        return result.upserted_id is not None
+
+    async def insert_many_if_absent(self, calculations: List[Document]) -> int:
+        if not calculations:
+            return 0
+        result = await self.collection.bulk_write(
+            [UpdateOne(self._memo_key(calc), {"$setOnInsert": dict(calc)}, upsert=True) for calc in calculations],
+            ordered=False,
+        )
+        return result.upserted_count
+
+    async def stored_fingerprints(self, owner_ids: List[str],
+                                  fingerprints: List[str]) -> Set[Tuple[str, str]]:
+        stored = set()
+        async for calc in self.collection.find(
+            {"business_owner_id": {"$in": owner_ids}, "roster_fingerprint": {"$in": fingerprints}},
+            {"_id": 0, "business_owner_id": 1, "roster_fingerprint": 1},
+        ):
+            stored.add((calc["business_owner_id"], calc["roster_fingerprint"]))
+        return stored
+
+    async def history(self, owner_id: str, limit: int) -> List[Document]:
+        return await self.collection.find(
+            {"business_owner_id": owner_id}, {"_id": 0}
+        ).sort("calculation_date", -1).to_list(limit)
+
+    async def latest(self, owner_id: str, fields: Fields = None) -> Optional[Document]:
+        return await self.collection.find_one(
+            {"business_owner_id": owner_id}, projection(fields), sort=[("calculation_date", -1)]
+        )
+
+    def export(self, match: Match, since: Optional[datetime] = None, until: Optional[datetime] = None,
+               fields: Fields = None, batch_size: int = 1000) -> AsyncIterator[Document]:
+        return export_cursor(self.collection, match, "calculation_date", since, until, fields, batch_size)
+
+
+class MongoApplicationRepository(ApplicationRepository):
+    def __init__(self, db):
+        self.collection = db.applications
+
+    async def insert(self, application: Document) -> None:
+        await self.collection.insert_one(dict(application))
+
+    async def get(self, app_id: str) -> Optional[Document]:
+        return await self.collection.find_one({"id": app_id}, {"_id": 0})
+
+    async def get_many(self, app_ids: List[str], fields: Fields = None) -> List[Document]:
+        return await self.collection.find({"id": {"$in": app_ids}}, projection(fields)).to_list(None)
+
+    async def update(self, app_id: str, changes: Dict[str, Any],
+                     statuses: Optional[Sequence[str]] = None) -> Optional[Document]:
+        query: Dict[str, Any] = {"id": app_id}
+        if statuses is not None:
+            query["status"] = {"$in": list(statuses)}
+        return await self.collection.find_one_and_update(
+            query, {"$set": changes}, projection={"_id": 0}, return_document=ReturnDocument.BEFORE
+        )
+
+    async def transition_many(self, transitions: List[Tuple[str, str, Dict[str, Any]]]) -> Set[str]:
+        if not transitions:
+            return set()
+        result = await self.collection.bulk_write([
+            UpdateOne({"id": app_id, "status": status}, {"$set": changes})
+            for app_id, status, changes in transitions
+        ], ordered=False)
+        if result.modified_count == len(transitions):
+            return {app_id for app_id, _, _ in transitions}
+        # Some applications changed status since they were read; find the ones this batch moved
+        _, _, changes = transitions[0]
+        moved = self.collection.find(
+            {
+                "id": {"$in": [app_id for app_id, _, _ in transitions]},
+                "status": changes["status"],
+                "updated_at": changes["updated_at"],
+            },
+            {"_id": 0, "id": 1},
+        )
+        return {doc["id"] async for doc in moved}
+
+    async def list_for_owner(self, owner_id: str, limit: Optional[int] = None,
+                             fields: Fields = None) -> List[Document]:
+        cursor = self.collection.find({"business_owner_id": owner_id}, projection(fields)).sort("created_at", -1)
+        if limit:
+            cursor = cursor.limit(limit)
+        return await cursor.to_list(limit)
+
+    async def count_for_owner(self, owner_id: str) -> int:
+        return await self.collection.count_documents({"business_owner_id": owner_id})
+
+
+class MongoIdempotencyRepository(IdempotencyRepository):
+    def __init__(self, db):
+        self.collection = db.idempotency_keys
+
+    async def claim(self, record: Document, now: datetime) -> Optional[Document]:
+        selector = {"scope": record["scope"], "key": record["key"]}
+        try:
+            result = await self.collection.update_one(selector, {"$setOnInsert": dict(record)}, upsert=True)
+            if result.upserted_id is not None:
+                return None
+        except DuplicateKeyError:
+            # A concurrent request inserted the same key first
+            pass
+        # Take over a record that expired (ahead of the TTL monitor) or whose request died mid-flight
+        stale = {"$or": [
+            {"expires_at": {"$lt": now}},
+            {"state": "in_progress", "lease_expires_at": {"$lt": now}},
+        ]}
+        if await self.collection.find_one_and_replace({**selector, **stale}, dict(record)):
+            return None
+        existing = await self.collection.find_one(selector, {"_id": 0})
+        if existing is None:
+            # Removed between the two steps; start over
+            return await self.claim(record, now)
+        return existing
+
+    async def complete(self, scope: str, key: str, response: str, expires_at: datetime) -> None:
+        await self.collection.update_one(
+            {"scope": scope, "key": key},
+            {"$set": {"state": "completed", "response": response, "expires_at": expires_at}},
+        )
+
+    async def release(self, scope: str, key: str) -> None:
+        await self.collection.delete_one({"scope": scope, "key": key, "state": "in_progress"})
+
+
+class MongoJobRepository(JobRepository):
+    def __init__(self, db):
+        self.collection = db.jobs
+
+    async def put(self, job: Document) -> None:
+        await self.collection.replace_one({"id": job["id"]}, dict(job), upsert=True)
+
+    async def get(self, job_id: str) -> Optional[Document]:
+        # The TTL monitor runs about once a minute, so expiry is checked here too
+        return await self.collection.find_one(
+            {"id": job_id, "$or": [{"expires_at": None}, {"expires_at": {"$gte": datetime.utcnow()}}]},
+            {"_id": 0},
+        )
+
+
+class MongoExportFileRepository(ExportFileRepository):
+    """Export files in the `exports` GridFS bucket"""
+
+    def __init__(self, db):
+        self.db = db
+        self.files = db["exports.files"]
+        self._bucket = None
+
+    @property
+    def bucket(self) -> AsyncIOMotorGridFSBucket:
+        # Built on first use rather than at import, like the client's own connection
+        if self._bucket is None:
+            self._bucket = AsyncIOMotorGridFSBucket(self.db, bucket_name="exports")
+        return self._bucket
+
+    async def save(self, name: str, path: Path) -> None:
+        # Motor runs the upload, reads of `source` included, in its thread pool
+        with path.open("rb") as source:
+            await self.bucket.upload_from_stream(name, source)
+
+    async def open(self, name: str) -> Optional[AsyncIterator[bytes]]:
+        try:
+            # A MotorGridOut iterates over the file one GridFS chunk at a time
+            return await self.bucket.open_download_stream_by_name(name)
+        except NoFile:
+            return None
+
+    async def prune(self, older_than: datetime) -> None:
+        async for stored in self.files.find({"uploadDate": {"$lt": older_than}}, {"_id": 1}):
+            await self.bucket.delete(stored["_id"])
+
+
+class MongoOwnerVersionRepository(OwnerVersionRepository):
+    def __init__(self, db):
+        self.collection = db.owner_versions
+
+    async def get(self, owner_id: str) -> Optional[Document]:
+        return await self.collection.find_one({"business_owner_id": owner_id}, {"_id": 0})
+
+    async def get_many(self, owner_ids: List[str]) -> List[Document]:
+        return await self.collection.find({"business_owner_id": {"$in": owner_ids}}, {"_id": 0}).to_list(None)
+
+    async def create(self, owner_id: str) -> Document:
+        try:
+            return await self.collection.find_one_and_update(
+                {"business_owner_id": owner_id},
+                {"$setOnInsert": new_version_record(owner_id)},
+                projection={"_id": 0},
+                upsert=True,
+                return_document=ReturnDocument.AFTER,
+            )
+        except DuplicateKeyError:
+            # Created concurrently by another request
+            return await self.get(owner_id)
+
+    async def bump(self, owner_ids: Sequence[str], markers: Sequence[str]) -> None:
+        if owner_ids and markers:
+            await self.collection.update_many(
+                {"business_owner_id": {"$in": list(owner_ids)}},
+                {"$inc": dict.fromkeys(markers, 1)},
+            )
+
+
+def _funnel_group(industry, employee_band=None, status=None) -> Dict[str, Any]:
+    # Grouped on the raw values; funnel_day_key normalizes the (few) groups afterwards
+    return {"$group": {
+        "_id": {
+            "day": {"$dateToString": {"format": "%Y-%m-%d", "date": "$created_at"}},
+            "industry": industry,
+            "employee_band": employee_band,
+            "status": status,
+        },
+        "count": {"$sum": 1},
+    }}
+
+
+class MongoFunnelRollupRepository(FunnelRollupRepository):
+    def __init__(self, db):
+        self.db = db
+        self.collection = db.funnel_rollups
+
+    async def increment(self, counts: FunnelCounts, updated_at: datetime, batch_id: Optional[str] = None) -> None:
+        if not counts:
+            return
+        unapplied = {}
+        recorded = {}
+        if batch_id is not None:
+            unapplied = {"batches": {"$ne": batch_id}}
+            recorded = {"$push": {"batches": {"$each": [batch_id], "$slice": -RECENT_FUNNEL_BATCHES}}}
+        try:
+            await self.collection.bulk_write([
+                UpdateOne(
+                    {"day": day, "industry": industry, "employee_band": employee_band, **unapplied},
+                    {"$inc": counters, "$set": {"updated_at": updated_at}, **recorded},
+                    upsert=True,
+                )
+                for (day, industry, employee_band), counters in counts.items()
+            ], ordered=False)
+        except BulkWriteError as exc:
+            # A row that already applied the batch fails its upsert on the unique key; it is counted
+            if batch_id is None or any(error["code"] != DUPLICATE_KEY for error in exc.details["writeErrors"]):
+                raise
+
+    async def between(self, since: str, until: str) -> List[Document]:
+        cursor = self.collection.find({"day": {"$gte": since, "$lte": until}}, {"_id": 0, "updated_at": 0, "batches": 0})
+        cursor = cursor.sort([("day", 1), ("industry", 1), ("employee_band", 1)])
+        return [
+            {"leads": 0, "business_owners": 0, "applications": {}, **row} async for row in cursor
+        ]
+
+    async def rebuild(self) -> int:
+        """Recount into a staging collection and swap it in, so readers never see a partial rebuild.
+
+        Increments made while the counts are being taken can be lost, so run
+        it while lead and application traffic is quiet.
+        """
+        groups = await asyncio.gather(
+            self.db.leads.aggregate([
+                _funnel_group("$industry", "$number_of_employees"),
+            ]).to_list(None),
+            self.db.business_owners.aggregate([
+                _funnel_group("$industry"),
+            ]).to_list(None),
+            self.db.applications.aggregate([
+                {"$project": {"_id": 0, "created_at": 1, "status": 1, "business_owner_id": 1}},
+                {"$lookup": {
+                    "from": "business_owners", "localField": "business_owner_id", "foreignField": "id", "as": "owner",
+                }},
+                _funnel_group({"$arrayElemAt": ["$owner.industry", 0]}, status="$status"),
+            ]).to_list(None),
+        )
+        leads, owners, applications = groups
+        sources = [
+            (leads, lambda key: "leads"),
+            (owners, lambda key: "business_owners"),
+            (applications, lambda key: application_counter(key["status"])),
+        ]
+        counts = funnel_counts(
+            (
+                funnel_day_key(row["_id"]["day"], row["_id"].get("industry"), row["_id"].get("employee_band")),
+                counter(row["_id"]),
+                row["count"],
+            )
+            for rows, counter in sources for row in rows
+        )
+
+        updated_at = datetime.utcnow()
+        staging = self.db[f"{self.collection.name}_rebuild"]
+        await staging.drop()
+        await staging.create_indexes(indexes.INDEX_SPECS[self.collection.name])
+        if counts:
+            await staging.insert_many([
+                {**funnel_row(key, counters), "updated_at": updated_at} for key, counters in counts.items()
+            ])
+        await staging.rename(self.collection.name, dropTarget=True)
+        return len(counts)
+
+
+class MongoEligibilityRepository(EligibilityRepository):
+    def __init__(self, db):
+        self.collection = db.eligibility_results
+        self.owners = db.business_owners
+        self.rollups = db.roster_rollups
+
+    async def facts(self, owner_ids: Optional[List[str]] = None) -> AsyncIterator[Document]:
+        pipeline = [{"$match": {"id": {"$in": owner_ids}}}] if owner_ids is not None else []
+        pipeline += [
+            {"$project": {"_id": 0, "id": 1, "created_at": 1, "business_name": 1, "industry": 1,
+                          "years_in_business": 1}},
+            {"$lookup": {
+                "from": self.rollups.name, "localField": "id", "foreignField": "business_owner_id", "as": "rollup",
+            }},
+            {"$addFields": {
+                "employee_count": {"$ifNull": [{"$arrayElemAt": ["$rollup.employee_count", 0]}, 0]},
+            }},
+            {"$project": {"rollup": 0}},
+        ]
+        async for owner in self.owners.aggregate(pipeline):
+            yield owner
+
+    async def put_many(self, results: List[Document]) -> None:
+        if results:
+            await self.collection.bulk_write([
+                ReplaceOne({"business_owner_id": result["business_owner_id"]}, result, upsert=True)
+                for result in results
+            ], ordered=False)
+
+    def page(self, match: Match, min_employees: Optional[int] = None, max_employees: Optional[int] = None,
+             after: Optional[Position] = None, limit: Optional[int] = None) -> AsyncIterator[Document]:
+        query: Dict[str, Any] = dict(match)
+        employee_count = {}
+        if min_employees is not None:
+            employee_count["$gte"] = min_employees
+        if max_employees is not None:
+            employee_count["$lte"] = max_employees
+        if employee_count:
+            query["employee_count"] = employee_count
+        return keyset_cursor(self.collection, query, after, limit)
+
+
+class MongoStorage(Storage):
+    name = "mongo"
+
+    def __init__(self, mongo_url: str, db_name: str):
+        self.client = AsyncIOMotorClient(mongo_url)
+        self.db = self.client[db_name]
+        self.leads = MongoLeadRepository(self.db)
+        self.owners = MongoBusinessOwnerRepository(self.db)
+        self.employees = MongoEmployeeRepository(self.db)
+        self.rollups = MongoRosterRollupRepository(self.db)
+        self.plans = MongoBenefitPlanRepository(self.db)
+        self.calculations = MongoFICACalculationRepository(self.db)
+        self.applications = MongoApplicationRepository(self.db)
+        self.idempotency = MongoIdempotencyRepository(self.db)
+        self.jobs = MongoJobRepository(self.db)
+        self.exports = MongoExportFileRepository(self.db)
+        self.versions = MongoOwnerVersionRepository(self.db)
+        self.funnel = MongoFunnelRollupRepository(self.db)
+        self.eligibility = MongoEligibilityRepository(self.db)
+
+    async def prepare(self, verify_query_plans: bool = False) -> None:
+        await indexes.ensure_indexes(self.db)
+        if verify_query_plans:
+            plans = await indexes.verify_query_plans(self.db)
+            logger.info("Verified query plans for %d routes", len(plans))
+
+    async def ping(self) -> None:
+        await self.client.admin.command("ping")
+
+    async def close(self) -> None:
+        self.client.close()
@@ -0,0 +1,131 @@
+"""Write-behind buffering for high-volume inserts.
+
+`WriteBehindBuffer` accepts documents into a bounded in-process queue and a
+background task writes them in batches, flushing when `batch_size` documents
+are waiting or `flush_interval` seconds after the first one arrived. When the
+queue is full, `offer` waits up to `put_timeout` for room and then raises
+`BufferFull` so the caller can shed load. A failed write is retried with
+backoff rather than dropped, and `drain` flushes everything still queued
+before shutdown, so an accepted document is only lost if the process dies.
+
+The write callable must tolerate a batch being retried after a partial write.
+"""
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+MAX_RETRY_DELAY = 30.0
+
+
+class BufferFull(Exception):
+    """The buffer stayed full for longer than the put timeout"""
+
+
+class BufferClosed(Exception):
+    """The buffer is draining for shutdown and accepts no new documents"""
+
+
+class WriteBehindBuffer:
+    def __init__(
+        self,
+        name: str,
+        write: Callable[[List[Dict[str, Any]]], Awaitable[None]],
+        max_size: int = 10000,
+        batch_size: int = 500,
+        flush_interval: float = 0.25,
+        put_timeout: float = 0.1,
+        retry_delay: float = 0.5,
+    ):
+        self.name = name
+        self.write = write
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.put_timeout = put_timeout
+        self.retry_delay = retry_delay
+        self.accepted = 0
+        self.flushed = 0
+        self.rejected = 0
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max_size)
+        self._wakeup = asyncio.Event()
+        self._filled = asyncio.Event()
+        self._in_flight = 0
+        self._closed = False
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def pending(self) -> int:
+        """Documents accepted but not yet written"""
+        return self._queue.qsize() + self._in_flight
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def offer(self, doc: Dict[str, Any]):
+        """Queue a document for writing, waiting briefly for room if the buffer is full"""
+        if self._closed:
+            raise BufferClosed(self.name)
+        try:
+            await asyncio.wait_for(self._queue.put(doc), timeout=self.put_timeout)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            raise BufferFull(self.name)
+        self.accepted += 1
+        self._wakeup.set()
+        if self._queue.qsize() >= self.batch_size:
+            self._filled.set()
+
+    async def drain(self, timeout: float = 30.0):
+        """Stop accepting documents and wait for everything queued to be written"""
+        self._closed = True
+        self._wakeup.set()
+        self._filled.set()
+        if self._task is None:
+            return
+        try:
+            await asyncio.wait_for(asyncio.shield(self._task), timeout=timeout)
+        except asyncio.TimeoutError:
+            self._task.cancel()
+            logger.error("Gave up draining %s buffer after %.0fs; %d documents were not written",
+                         self.name, timeout, self.pending)
+        else:
+            logger.info("Drained %s buffer: %d documents written", self.name, self.flushed)
+
+    async def _next_batch(self) -> List[Dict[str, Any]]:
+        if self._queue.empty():
+            if self._closed:
+                return []
+            self._wakeup.clear()
+            await self._wakeup.wait()
+        # Give a partial batch until flush_interval to fill up
+        if self._queue.qsize() < self.batch_size and not self._closed:
+            self._filled.clear()
+            try:
+                await asyncio.wait_for(self._filled.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+        return [self._queue.get_nowait() for _ in range(min(self.batch_size, self._queue.qsize()))]
+
+    async def _flush(self, batch: List[Dict[str, Any]]):
+        self._in_flight = len(batch)
+        delay = self.retry_delay
+        while True:
+            try:
+                await self.write(batch)
+                break
+            except Exception:
+                logger.exception("Writing %d buffered %s failed; retrying in %.1fs", len(batch), self.name, delay)
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, MAX_RETRY_DELAY)
+        self._in_flight = 0
+        self.flushed += len(batch)
+
+    async def _run(self):
+        while True:
+            batch = await self._next_batch()
+            if batch:
+                await self._flush(batch)
+            elif self._closed:
+                return
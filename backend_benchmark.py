@@ -0,0 +1,495 @@
+"""Load-test and latency benchmark for the FICA Reduction Program API.
+
+Starts the FastAPI app behind a uvicorn server in its own process, seeds
+realistic data volumes, then drives a weighted mix of lead, employee, FICA
+calculation, dashboard and application traffic from concurrent async clients.
+Reports p50/p95/p99 latency and throughput per route and writes the results as
+JSON so runs can be compared against a baseline.
+
+--in-process instead calls the app over ASGI on the load generator's own event
+loop. That is quicker to start, but every request also waits behind the client
+coroutines and whichever handlers are busy, so its per-route percentiles are
+not comparable across routes (or with a separate-process run); the report is
+labelled accordingly.
+
+By default the app runs on the in-memory storage backend (STORAGE_BACKEND=memory);
+pass --mongo-url to benchmark against a real local MongoDB instead.
+
+    python backend_benchmark.py --output bench.json
+    python backend_benchmark.py --baseline bench.json --max-regression 10
+
+--serialization-rows N instead measures the per-row cost of turning stored
+documents into a response body, comparing the model + response_model path
+with the direct document path in backend/documents.py.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import List
+
+import httpx
+import numpy as np
+
+ROOT_DIR = Path(__file__).parent
+BACKEND_DIR = ROOT_DIR / "backend"
+
+INDUSTRIES = ["technology", "healthcare", "manufacturing", "retail", "construction",
+              "professional_services", "hospitality"]
+EMPLOYEE_BANDS = ["1-10", "11-25", "26-50", "51-100", "100+"]
+
+
+IN_PROCESS_CAVEAT = ("in-process: server and load generator share one event loop, "
+                     "so per-route latencies are not comparable across routes")
+SERVER_STARTUP_TIMEOUT = 60.0
+
+
+def app_environment(mongo_url=None, db_name=None):
+    """Environment pointing the server at a real Mongo or the in-memory storage backend"""
+    env = {
+        "STORAGE_BACKEND": "mongo" if mongo_url else "memory",
+        "MONGO_URL": mongo_url or "mongodb://localhost:27017",
+        "DB_NAME": db_name or f"benchmark_{uuid.uuid4().hex[:8]}",
+    }
+    # Per-owner rate limits would answer a few hot benchmark owners with 429s; opt back in to measure them
+    env["ADMISSION_CONTROL"] = os.environ.get("ADMISSION_CONTROL", "false")
+    return env
+
+
+def load_app(mongo_url=None, db_name=None):
+    """Import the server module into this process"""
+    os.environ.update(app_environment(mongo_url, db_name))
+    sys.path.insert(0, str(BACKEND_DIR))
+    import server
+
+    return server
+
+
+async def start_server_process(args):
+    """Run uvicorn in a child process and wait until /api/ready answers"""
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "server:app", "--host", "127.0.0.1", "--port", str(args.port),
+         "--log-level", "warning"],
+        cwd=BACKEND_DIR,
+        env={**os.environ, **app_environment(args.mongo_url, args.db_name)},
+    )
+    deadline = time.perf_counter() + SERVER_STARTUP_TIMEOUT
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{args.port}") as probe:
+        while True:
+            if process.poll() is not None:
+                raise RuntimeError(f"Server exited with status {process.returncode} during startup")
+            try:
+                if (await probe.get("/api/ready")).status_code == 200:
+                    return process
+            except httpx.TransportError:
+                pass
+            if time.perf_counter() > deadline:
+                process.terminate()
+                raise RuntimeError(f"Server did not become ready within {SERVER_STARTUP_TIMEOUT:.0f}s")
+            await asyncio.sleep(0.1)
+
+
+def stop_server_process(process):
+    process.terminate()
+    try:
+        process.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+
+def lead_payload(rng):
+    return {
+        "first_name": f"Lead{rng.randint(1, 10**6)}",
+        "last_name": "Benchmark",
+        "email": f"lead{rng.randint(1, 10**9)}@example.com",
+        "phone": "555-0100",
+        "business_name": f"Business {rng.randint(1, 10**6)}",
+        "number_of_employees": rng.choice(EMPLOYEE_BANDS),
+        "industry": rng.choice(INDUSTRIES),
+    }
+
+
+def owner_payload(rng, i):
+    return {
+        "first_name": f"Owner{i}",
+        "last_name": "Benchmark",
+        "email": f"owner{i}@example.com",
+        "phone": "555-0101",
+        "business_name": f"Benchmark Co {i}",
+        "business_type": rng.choice(["corporation", "llc", "partnership", "s_corp"]),
+        "industry": rng.choice(INDUSTRIES),
+        "tax_id": f"{rng.randint(10, 99)}-{rng.randint(1000000, 9999999)}",
+        "years_in_business": rng.randint(0, 30),
+        "address": "1 Main St",
+        "city": "Springfield",
+        "state": "IL",
+        "zip_code": "62701",
+    }
+
+
+def employee_payload(rng, owner_id, i):
+    has_health = rng.random() < 0.6
+    has_life = rng.random() < 0.3
+    return {
+        "business_owner_id": owner_id,
+        "first_name": f"Emp{i}",
+        "last_name": "Benchmark",
+        "email": f"emp{i}.{uuid.uuid4().hex[:6]}@example.com",
+        "phone": "555-0102",
+        "job_title": "Staff",
+        "annual_salary": round(rng.lognormvariate(11.0, 0.5), 2),
+        "hire_date": "2020-01-15T00:00:00",
+        "birth_date": "1988-06-01T00:00:00",
+        "has_current_health_insurance": has_health,
+        "has_current_life_insurance": has_life,
+        "current_health_premium": round(rng.uniform(150, 600), 2) if has_health else None,
+        "current_life_premium": round(rng.uniform(20, 90), 2) if has_life else None,
+    }
+
+
+def employees_csv(rng, owner_id, count, offset):
+    columns = ["first_name", "last_name", "email", "phone", "job_title", "annual_salary", "hire_date",
+               "birth_date", "has_current_health_insurance", "has_current_life_insurance",
+               "current_health_premium", "current_life_premium"]
+    lines = [",".join(columns)]
+    for i in range(count):
+        row = employee_payload(rng, owner_id, offset + i)
+        lines.append(",".join("" if row[c] is None else str(row[c]).lower() if isinstance(row[c], bool)
+                              else str(row[c]) for c in columns))
+    return "\n".join(lines) + "\n"
+
+
+async def seed(client, rng, owners, employees_per_owner, leads):
+    """Create owners, employees and leads through the API; returns the owner ids"""
+    owner_ids = []
+    for i in range(owners):
+        response = await client.post("/api/business-owners", json=owner_payload(rng, i))
+        response.raise_for_status()
+        owner_ids.append(response.json()["id"])
+
+    for n, owner_id in enumerate(owner_ids):
+        # Vary roster sizes around the requested mean
+        count = max(1, int(rng.expovariate(1 / employees_per_owner)))
+        csv_body = employees_csv(rng, owner_id, count, n * 100000)
+        response = await client.post(
+            f"/api/employees/import/{owner_id}", files={"file": ("roster.csv", csv_body, "text/csv")}
+        )
+        response.raise_for_status()
+
+    for _ in range(leads):
+        (await client.post("/api/leads", json=lead_payload(rng))).raise_for_status()
+
+    plans = (await client.get("/api/benefit-plans")).json()
+    return owner_ids, [plan["id"] for plan in plans]
+
+
+def traffic_mix(rng, owner_ids, plan_ids):
+    """Weighted (route template, request builder) pairs describing the mixed workload"""
+    def owner():
+        return rng.choice(owner_ids)
+
+    def fica_params():
+        params = {}
+        if plan_ids and rng.random() < 0.7:
+            params["health_plan_id"] = rng.choice(plan_ids)
+        return params
+
+    return [
+        (30, "POST /api/leads", lambda: ("POST", "/api/leads", {"json": lead_payload(rng)})),
+        (8, "GET /api/leads", lambda: ("GET", "/api/leads", {"params": {"limit": 100}})),
+        (8, "POST /api/employees", lambda: ("POST", "/api/employees",
+                                            {"json": employee_payload(rng, owner(), rng.randint(1, 10**9))})),
+        (10, "GET /api/employees/business/{owner_id}",
+         lambda: ("GET", f"/api/employees/business/{owner()}", {})),
+        (14, "POST /api/fica-calculation/{owner_id}",
+         lambda: ("POST", f"/api/fica-calculation/{owner()}", {"params": fica_params()})),
+        (16, "GET /api/dashboard/{owner_id}", lambda: ("GET", f"/api/dashboard/{owner()}", {})),
+        (6, "POST /api/applications", lambda: ("POST", "/api/applications",
+                                               {"json": {"business_owner_id": owner()}})),
+        (8, "GET /api/applications/business/{owner_id}",
+         lambda: ("GET", f"/api/applications/business/{owner()}", {})),
+    ]
+
+
+async def drive(client, rng, mix, concurrency, total_requests, duration):
+    """Run the workload from `concurrency` clients; returns per-route samples and wall time"""
+    weights = [weight for weight, _, _ in mix]
+    samples = {route: {"latencies": [], "errors": 0, "statuses": {}} for _, route, _ in mix}
+    issued = 0
+    deadline = time.perf_counter() + duration if duration else None
+
+    async def worker():
+        nonlocal issued
+        while True:
+            if deadline is not None and time.perf_counter() >= deadline:
+                return
+            if deadline is None and issued >= total_requests:
+                return
+            issued += 1
+            _, route, build = rng.choices(mix, weights=weights)[0]
+            method, path, kwargs = build()
+            started = time.perf_counter()
+            try:
+                response = await client.request(method, path, **kwargs)
+                status_code = response.status_code
+            except httpx.HTTPError:
+                status_code = 0
+            elapsed = time.perf_counter() - started
+            sample = samples[route]
+            sample["latencies"].append(elapsed)
+            sample["statuses"][str(status_code)] = sample["statuses"].get(str(status_code), 0) + 1
+            if not 200 <= status_code < 300:
+                sample["errors"] += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return samples, time.perf_counter() - started
+
+
+def summarize(samples, wall_time):
+    def stats(latencies, errors, count):
+        if not latencies:
+            return {"count": 0, "errors": errors}
+        ms = np.array(latencies) * 1000
+        return {
+            "count": count,
+            "errors": errors,
+            "throughput_rps": count / wall_time,
+            "mean_ms": float(ms.mean()),
+            "p50_ms": float(np.percentile(ms, 50)),
+            "p95_ms": float(np.percentile(ms, 95)),
+            "p99_ms": float(np.percentile(ms, 99)),
+            "max_ms": float(ms.max()),
+        }
+
+    routes = {}
+    for route, sample in samples.items():
+        routes[route] = stats(sample["latencies"], sample["errors"], len(sample["latencies"]))
+        routes[route]["statuses"] = sample["statuses"]
+    all_latencies = [latency for sample in samples.values() for latency in sample["latencies"]]
+    overall = stats(all_latencies, sum(s["errors"] for s in samples.values()), len(all_latencies))
+    return routes, overall
+
+
+def print_report(routes, overall, baseline=None, transport="process"):
+    if transport == "asgi":
+        print(f"NOTE: {IN_PROCESS_CAVEAT}")
+    header = f"{'route':<44} {'count':>7} {'err':>5} {'rps':>8} {'p50':>8} {'p95':>8} {'p99':>8}"
+    if baseline:
+        header += f" {'Δp95':>8} {'Δrps':>8}"
+    print(header)
+    print("-" * len(header))
+    for route, stats in list(routes.items()) + [("OVERALL", overall)]:
+        if not stats.get("count"):
+            continue
+        line = (f"{route:<44} {stats['count']:>7} {stats['errors']:>5} {stats['throughput_rps']:>8.1f} "
+                f"{stats['p50_ms']:>8.2f} {stats['p95_ms']:>8.2f} {stats['p99_ms']:>8.2f}")
+        base = (baseline.get("routes", {}).get(route) if route != "OVERALL" else baseline.get("overall")) \
+            if baseline else None
+        if base and base.get("count"):
+            line += f" {_pct(stats['p95_ms'], base['p95_ms']):>8} {_pct(stats['throughput_rps'], base['throughput_rps']):>8}"
+        print(line)
+
+
+def _pct(current, previous):
+    if not previous:
+        return "n/a"
+    return f"{(current - previous) / previous * 100:+.1f}%"
+
+
+def regressions(routes, baseline, max_regression):
+    """Routes whose p95 latency grew by more than `max_regression` percent over the baseline"""
+    failed = []
+    for route, stats in routes.items():
+        base = baseline.get("routes", {}).get(route)
+        if not base or not base.get("count") or not stats.get("count"):
+            continue
+        if stats["p95_ms"] > base["p95_ms"] * (1 + max_regression / 100):
+            failed.append(route)
+    return failed
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT_DIR, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def serialization_benchmark(server, rows, repeat, seed):
+    """Per-row microseconds to encode stored documents, via models and directly"""
+    from fastapi.responses import JSONResponse
+    from fastapi.routing import serialize_response
+    from fastapi.utils import create_response_field
+
+    import documents
+
+    rng = random.Random(seed)
+    owner_id = str(uuid.uuid4())
+    cases = {
+        "Lead": (server.Lead, [server.Lead(**lead_payload(rng)).dict() for _ in range(rows)]),
+        "BusinessOwner": (server.BusinessOwner,
+                          [server.BusinessOwner(**owner_payload(rng, i)).dict() for i in range(rows)]),
+        "Employee": (server.Employee,
+                     [server.Employee(**employee_payload(rng, owner_id, i)).dict() for i in range(rows)]),
+    }
+
+    results = {}
+    for name, (model, docs) in cases.items():
+        field = create_response_field(name=f"Response_{name}", type_=List[model])
+
+        async def via_models():
+            content = await serialize_response(field=field, response_content=[model(**doc) for doc in docs])
+            return JSONResponse(content).body
+
+        async def direct():
+            return documents.documents_response(docs, model).body
+
+        timings = {}
+        bodies = {}
+        for label, encode in (("models", via_models), ("direct", direct)):
+            best = float("inf")
+            for _ in range(repeat):
+                started = time.perf_counter()
+                bodies[label] = await encode()
+                best = min(best, time.perf_counter() - started)
+            timings[label] = best / rows * 1e6
+        results[name] = {
+            "rows": rows,
+            "models_us_per_row": timings["models"],
+            "direct_us_per_row": timings["direct"],
+            "speedup": timings["models"] / timings["direct"],
+            "identical_json": json.loads(bodies["models"]) == json.loads(bodies["direct"]),
+        }
+    return results
+
+
+def print_serialization_report(results):
+    header = f"{'model':<16} {'rows':>7} {'models µs/row':>14} {'direct µs/row':>14} {'speedup':>8} {'same':>5}"
+    print(header)
+    print("-" * len(header))
+    for name, stats in results.items():
+        print(f"{name:<16} {stats['rows']:>7} {stats['models_us_per_row']:>14.2f} "
+              f"{stats['direct_us_per_row']:>14.2f} {stats['speedup']:>7.1f}x {'yes' if stats['identical_json'] else 'NO':>5}")
+
+
+async def run(args):
+    rng = random.Random(args.seed)
+    process = lifespan = None
+
+    if args.in_process:
+        server = load_app(args.mongo_url, args.db_name)
+        lifespan = server.app.router.lifespan_context(server.app)
+        await lifespan.__aenter__()
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=server.app), base_url="http://benchmark",
+                                   timeout=args.timeout)
+    else:
+        process = await start_server_process(args)
+        client = httpx.AsyncClient(base_url=f"http://127.0.0.1:{args.port}", timeout=args.timeout,
+                                   limits=httpx.Limits(max_connections=args.concurrency))
+
+    try:
+        seed_started = time.perf_counter()
+        owner_ids, plan_ids = await seed(client, rng, args.owners, args.employees_per_owner, args.leads)
+        print(f"Seeded {args.owners} owners, ~{args.employees_per_owner} employees each and {args.leads} leads "
+              f"in {time.perf_counter() - seed_started:.1f}s")
+
+        mix = traffic_mix(rng, owner_ids, plan_ids)
+        if args.warmup:
+            await drive(client, rng, mix, args.concurrency, args.warmup, None)
+        samples, wall_time = await drive(client, rng, mix, args.concurrency, args.requests, args.duration)
+    finally:
+        await client.aclose()
+        if lifespan is not None:
+            await lifespan.__aexit__(None, None, None)
+        if process is not None:
+            stop_server_process(process)
+
+    routes, overall = summarize(samples, wall_time)
+    return {
+        "meta": {
+            "timestamp": datetime.utcnow().isoformat(),
+            "git_commit": git_commit(),
+            "python": platform.python_version(),
+            "backend": "mongodb" if args.mongo_url else "in-memory",
+            "transport": "asgi" if args.in_process else "process",
+            "concurrency": args.concurrency,
+            "requests": args.requests,
+            "duration": args.duration,
+            "owners": args.owners,
+            "employees_per_owner": args.employees_per_owner,
+            "leads": args.leads,
+            "seed": args.seed,
+            "wall_time_s": wall_time,
+        },
+        "routes": routes,
+        "overall": overall,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--mongo-url", help="benchmark against this MongoDB instead of the in-memory backend")
+    parser.add_argument("--db-name", help="database name (default: a fresh benchmark_* database)")
+    parser.add_argument("--in-process", action="store_true",
+                        help="call the app over ASGI in this process; per-route numbers are then not comparable")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--owners", type=int, default=50)
+    parser.add_argument("--employees-per-owner", type=int, default=40)
+    parser.add_argument("--leads", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=5000, help="total requests (ignored with --duration)")
+    parser.add_argument("--duration", type=float, help="run for this many seconds instead of a request count")
+    parser.add_argument("--warmup", type=int, default=200, help="requests to issue before measuring")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--output", help="write results JSON to this path")
+    parser.add_argument("--baseline", help="compare against a previous results JSON")
+    parser.add_argument("--max-regression", type=float,
+                        help="with --baseline, exit non-zero if any route's p95 grows by more than this percent")
+    parser.add_argument("--serialization-rows", type=int,
+                        help="benchmark per-row response encoding over this many documents instead of a load test")
+    parser.add_argument("--serialization-repeat", type=int, default=5, help="best-of repeats per encoding path")
+    args = parser.parse_args()
+
+    if args.serialization_rows:
+        server = load_app(args.mongo_url, args.db_name)
+        results = asyncio.run(serialization_benchmark(
+            server, args.serialization_rows, args.serialization_repeat, args.seed
+        ))
+        print_serialization_report(results)
+        if args.output:
+            Path(args.output).write_text(json.dumps({"serialization": results}, indent=2))
+            print(f"Results written to {args.output}")
+        return
+
+    results = asyncio.run(run(args))
+    baseline = json.loads(Path(args.baseline).read_text()) if args.baseline else None
+    transport = results["meta"]["transport"]
+    if baseline and baseline.get("meta", {}).get("transport") != transport:
+        print(f"WARNING: baseline used transport {baseline.get('meta', {}).get('transport')!r}, "
+              f"this run {transport!r}; the comparison is not like for like")
+    print_report(results["routes"], results["overall"], baseline, transport)
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2))
+        print(f"Results written to {args.output}")
+
+    if baseline and args.max_regression is not None:
+        failed = regressions(results["routes"], baseline, args.max_regression)
+        if failed:
+            print(f"p95 regressed by more than {args.max_regression}% on: {', '.join(failed)}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
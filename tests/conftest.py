@@ -0,0 +1,84 @@
+"""Shared fixtures: the API running on the in-memory storage backend.
+
+The app is imported once per session with `STORAGE_BACKEND=memory`, so the
+tests need no database. State is shared across tests; each test creates the
+owners it works with instead of relying on an empty store.
+"""
+import os
+import sys
+import tempfile
+import uuid
+from pathlib import Path
+
+import pytest
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+os.environ["STORAGE_BACKEND"] = "memory"
+os.environ.setdefault("EXPORT_DIR", tempfile.mkdtemp(prefix="exports-"))
+# Admission limits are exercised on their own in test_admission.py
+os.environ.setdefault("ADMISSION_CONTROL", "false")
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+import server  # noqa: E402
+
+
+def owner_payload(**overrides):
+    return {
+        "first_name": "Ada",
+        "last_name": "Owner",
+        "email": "ada@example.com",
+        "phone": "555-0100",
+        "business_name": f"Test Co {uuid.uuid4().hex[:6]}",
+        "business_type": "llc",
+        "industry": "technology",
+        "tax_id": "12-3456789",
+        "years_in_business": 5,
+        "address": "1 Main St",
+        "city": "Springfield",
+        "state": "IL",
+        "zip_code": "62701",
+        **overrides,
+    }
+
+
+def employee_payload(owner_id, **overrides):
+    return {
+        "business_owner_id": owner_id,
+        "first_name": "Emp",
+        "last_name": uuid.uuid4().hex[:6],
+        "email": f"emp.{uuid.uuid4().hex[:6]}@example.com",
+        "phone": "555-0101",
+        "job_title": "Staff",
+        "annual_salary": 60000.0,
+        "hire_date": "2020-01-15T00:00:00",
+        "birth_date": "1988-06-01T00:00:00",
+        "has_current_health_insurance": True,
+        "current_health_premium": 300.0,
+        **overrides,
+    }
+
+
+@pytest.fixture(scope="session")
+def client():
+    with TestClient(server.app) as client:
+        yield client
+
+
+@pytest.fixture
+def make_owner(client):
+    def make(**overrides) -> str:
+        response = client.post("/api/business-owners", json=owner_payload(**overrides))
+        assert response.status_code == 200, response.text
+        return response.json()["id"]
+    return make
+
+
+@pytest.fixture
+def make_employee(client):
+    def make(owner_id: str, **overrides) -> dict:
+        response = client.post("/api/employees", json=employee_payload(owner_id, **overrides))
+        assert response.status_code == 200, response.text
+        return response.json()
+    return make
@@ -0,0 +1,142 @@
+"""Admission control answers over-quota owners with 429 and a saturated route with 503"""
+import asyncio
+
+import httpx
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+from admission import AdmissionMiddleware
+
+ROUTE = "GET /owners/{owner_id}"
+
+
+def limited_app(limit, gate=None):
+    async def endpoint(request):
+        if gate is not None:
+            await gate.wait()
+        return JSONResponse({"owner_id": request.path_params["owner_id"]})
+
+    async def open_endpoint(request):
+        return JSONResponse({})
+
+    app = Starlette(routes=[Route("/owners/{owner_id}", endpoint), Route("/open", open_endpoint)])
+    app.add_middleware(AdmissionMiddleware, limits={ROUTE: limit}, enabled=True)
+    return app
+
+
+def limiter_of(app):
+    # Starlette builds its middleware stack on the first request
+    middleware = app.middleware_stack
+    while not isinstance(middleware, AdmissionMiddleware):
+        middleware = middleware.app
+    return middleware.limiters[ROUTE]
+
+
+def run(scenario, app):
+    async def main():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await scenario(client)
+    return asyncio.run(main())
+
+
+def test_owner_over_its_rate_gets_429_without_affecting_other_owners():
+    app = limited_app({"concurrency": 4, "queue_depth": 4, "owner_rate": 0.01, "owner_burst": 2})
+
+    async def scenario(client):
+        first = [(await client.get("/owners/a")).status_code for _ in range(3)]
+        other = await client.get("/owners/b")
+        throttled = await client.get("/owners/a")
+        return first, other, throttled
+
+    first, other, throttled = run(scenario, app)
+    assert first == [200, 200, 429]
+    assert other.status_code == 200
+    assert throttled.status_code == 429
+    assert int(throttled.headers["Retry-After"]) >= 1
+
+
+def test_full_route_gets_503_and_refunds_the_owner_token():
+    gate = asyncio.Event()
+    app = limited_app({"concurrency": 1, "queue_depth": 0, "owner_rate": 0.01, "owner_burst": 1}, gate)
+
+    async def scenario(client):
+        holder = asyncio.ensure_future(client.get("/owners/a"))
+        while app.middleware_stack is None or limiter_of(app).in_flight == 0:
+            await asyncio.sleep(0.01)
+        busy = await client.get("/owners/b")
+        gate.set()
+        held = await holder
+        # b's token was refunded with the 503, so its retry is admitted
+        retried = await client.get("/owners/b")
+        return busy, held, retried
+
+    busy, held, retried = run(scenario, app)
+    assert busy.status_code == 503
+    assert busy.headers["Retry-After"] == "1"
+    assert held.status_code == 200
+    assert retried.status_code == 200
+
+
+
+def test_queue_admits_up_to_its_depth_and_rejects_beyond_it():
+    gate = asyncio.Event()
+    app = limited_app({"concurrency": 1, "queue_depth": 1}, gate)
+
+    async def scenario(client):
+        holder = asyncio.ensure_future(client.get("/owners/a"))
+        while app.middleware_stack is None or limiter_of(app).in_flight == 0:
+            await asyncio.sleep(0.01)
+        queued = asyncio.ensure_future(client.get("/owners/b"))
+        while limiter_of(app).queued == 0:
+            await asyncio.sleep(0.01)
+        overflow = await client.get("/owners/c")
+        gate.set()
+        return overflow, await holder, await queued
+
+    overflow, held, queued = run(scenario, app)
+    assert overflow.status_code == 503
+    assert overflow.json() == {"detail": "Server is busy, please retry"}
+    assert (held.status_code, queued.status_code) == (200, 200)
+    # The queued request reports its wait
+    assert queued.headers["Server-Timing"].startswith("admission;dur=")
+    assert (limiter_of(app).queued, limiter_of(app).in_flight) == (0, 0)
+
+
+def test_request_queued_past_the_timeout_gets_503():
+    gate = asyncio.Event()
+    app = limited_app({"concurrency": 1, "queue_depth": 4, "queue_timeout": 0.05}, gate)
+
+    async def scenario(client):
+        holder = asyncio.ensure_future(client.get("/owners/a"))
+        while app.middleware_stack is None or limiter_of(app).in_flight == 0:
+            await asyncio.sleep(0.01)
+        timed_out = await client.get("/owners/b")
+        queued_after = limiter_of(app).queued
+        gate.set()
+        return timed_out, queued_after, await holder
+
+    timed_out, queued_after, held = run(scenario, app)
+    assert timed_out.status_code == 503
+    assert queued_after == 0
+    assert held.status_code == 200
+
+
+def test_routes_without_a_limit_are_not_queued():
+    gate = asyncio.Event()
+    app = limited_app({"concurrency": 1, "queue_depth": 0}, gate)
+
+    async def scenario(client):
+        holder = asyncio.ensure_future(client.get("/owners/a"))
+        while app.middleware_stack is None or limiter_of(app).in_flight == 0:
+            await asyncio.sleep(0.01)
+        # The limited route is full, with no queue
+        unlimited = await client.get("/open")
+        gate.set()
+        return unlimited, await holder
+
+    unlimited, held = run(scenario, app)
+    assert unlimited.status_code == 200
+    assert "Server-Timing" not in unlimited.headers
+    assert held.status_code == 200
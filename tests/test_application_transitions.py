@@ -0,0 +1,104 @@
+"""Application status transitions: each id in a bulk request gets its own outcome"""
+import server
+
+
+def create_applications(client, owner_id, count):
+    return [client.post("/api/applications", json={"business_owner_id": owner_id}).json()["id"] for _ in range(count)]
+
+
+def transition(client, ids, status):
+    response = client.post("/api/applications/transitions", json={"ids": ids, "status": status})
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def outcomes(summary):
+    return {result["id"]: (result["outcome"], result["previous_status"], result["status"])
+            for result in summary["results"]}
+
+
+def test_bulk_transition_reports_updated_unchanged_and_not_found(client, make_owner):
+    owner_id = make_owner()
+    draft, submitted = create_applications(client, owner_id, 2)
+    assert client.put(f"/api/applications/{submitted}", json={"status": "submitted"}).status_code == 200
+
+    summary = transition(client, [draft, submitted, "nope", draft], "submitted")
+
+    assert summary["updated"] == 1
+    # One result per distinct id, in request order
+    assert [result["id"] for result in summary["results"]] == [draft, submitted, "nope"]
+    assert outcomes(summary) == {
+        draft: ("updated", "draft", "submitted"),
+        submitted: ("unchanged", "submitted", "submitted"),
+        "nope": ("not_found", None, None),
+    }
+    stored = client.get(f"/api/applications/{draft}").json()
+    assert stored["status"] == "submitted"
+    assert stored["submitted_at"] is not None
+
+
+def test_bulk_transition_rejects_moves_the_workflow_does_not_allow(client, make_owner):
+    owner_id = make_owner()
+    (draft,) = create_applications(client, owner_id, 1)
+
+    summary = transition(client, [draft], "approved")
+
+    assert summary["updated"] == 0
+    assert outcomes(summary) == {draft: ("invalid_transition", "draft", "draft")}
+    assert client.get(f"/api/applications/{draft}").json()["status"] == "draft"
+
+
+def test_application_changed_after_it_was_read_is_a_conflict(client, make_owner, monkeypatch):
+    owner_id = make_owner()
+    (draft,) = create_applications(client, owner_id, 1)
+
+    async def moved_elsewhere(transitions):
+        return set()
+    monkeypatch.setattr(server.storage.applications, "transition_many", moved_elsewhere)
+
+    summary = transition(client, [draft], "submitted")
+    assert summary["updated"] == 0
+    assert outcomes(summary) == {draft: ("conflict", "draft", None)}
+
+
+def test_single_update_is_409_for_an_invalid_transition_and_404_when_missing(client, make_owner):
+    owner_id = make_owner()
+    (draft,) = create_applications(client, owner_id, 1)
+
+    response = client.put(f"/api/applications/{draft}", json={"status": "approved"})
+    assert response.status_code == 409
+    assert response.json()["detail"] == "Cannot move application from draft to approved"
+    assert client.put("/api/applications/nope", json={"status": "submitted"}).status_code == 404
+
+
+def test_bulk_transition_invalidates_cached_application_lists(client, make_owner):
+    owner_id = make_owner()
+    (draft,) = create_applications(client, owner_id, 1)
+    url = f"/api/applications/business/{owner_id}"
+    etag = client.get(url).headers["ETag"]
+
+    transition(client, [draft], "submitted")
+    assert client.get(url, headers={"If-None-Match": etag}).status_code == 200
+
+
+def test_invalid_single_update_changes_nothing(client, make_owner):
+    owner_id = make_owner()
+    (draft,) = create_applications(client, owner_id, 1)
+
+    response = client.put(f"/api/applications/{draft}", json={"status": "approved", "notes": "skip review"})
+    assert response.status_code == 409
+    stored = client.get(f"/api/applications/{draft}").json()
+    assert (stored["status"], stored["notes"]) == ("draft", None)
+
+
+def test_setting_the_current_status_keeps_submitted_at(client, make_owner):
+    owner_id = make_owner()
+    (application,) = create_applications(client, owner_id, 1)
+    submitted_at = client.put(f"/api/applications/{application}", json={"status": "submitted"}).json()["submitted_at"]
+
+    response = client.put(f"/api/applications/{application}", json={"status": "submitted", "notes": "resent"})
+
+    assert response.status_code == 200
+    assert (response.json()["submitted_at"], response.json()["notes"]) == (submitted_at, "resent")
+    stored = client.get(f"/api/applications/{application}").json()
+    assert (stored["status"], stored["submitted_at"], stored["notes"]) == ("submitted", submitted_at, "resent")
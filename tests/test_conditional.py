@@ -0,0 +1,57 @@
+"""Conditional GETs answer 304 until a write bumps the version behind the ETag"""
+import server
+
+
+def revalidate(client, url, etag):
+    return client.get(url, headers={"If-None-Match": etag})
+
+
+def test_dashboard_is_not_modified_until_the_roster_changes(client, make_owner, make_employee):
+    owner_id = make_owner()
+    url = f"/api/dashboard/{owner_id}"
+    first = client.get(url)
+    etag = first.headers["ETag"]
+
+    unchanged = revalidate(client, url, etag)
+    assert unchanged.status_code == 304
+    assert unchanged.content == b""
+    assert unchanged.headers["ETag"] == etag
+
+    make_employee(owner_id)
+    changed = revalidate(client, url, etag)
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] != etag
+    assert changed.json()["employee_count"] == 1
+
+
+def test_applications_are_invalidated_by_a_new_application(client, make_owner):
+    owner_id = make_owner()
+    url = f"/api/applications/business/{owner_id}"
+    etag = client.get(url).headers["ETag"]
+    assert revalidate(client, url, etag).status_code == 304
+
+    assert client.post("/api/applications", json={"business_owner_id": owner_id}).status_code == 200
+    changed = revalidate(client, url, etag)
+    assert changed.status_code == 200
+    assert len(changed.json()) == 1
+
+
+def test_query_string_is_part_of_the_tag(client, make_owner):
+    owner_id = make_owner()
+    url = f"/api/applications/business/{owner_id}"
+    etag = client.get(url).headers["ETag"]
+    assert revalidate(client, f"{url}?limit=1", etag).status_code == 200
+
+
+def test_rollup_rebuild_invalidates_dashboards_it_corrects(client, make_owner, make_employee):
+    owner_id = make_owner()
+    make_employee(owner_id)
+    url = f"/api/dashboard/{owner_id}"
+    server.storage.rollups.rollups[owner_id]["employee_count"] = 5
+    etag = client.get(url).headers["ETag"]
+    assert revalidate(client, url, etag).status_code == 304
+
+    client.portal.call(server.rebuild_all_roster_rollups)
+    changed = revalidate(client, url, etag)
+    assert changed.status_code == 200
+    assert changed.json()["employee_count"] == 1
@@ -0,0 +1,68 @@
+"""Stored documents encoded directly with orjson match what `response_model` would send, byte for byte"""
+import asyncio
+import uuid
+from datetime import datetime
+from typing import List
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+
+import documents
+import server
+from tests.conftest import employee_payload, owner_payload
+
+
+def via_response_model(model, docs):
+    """The body FastAPI sends for `docs` built into `model`s and returned with `response_model=List[model]`"""
+    field = create_response_field(name=f"Response_{model.__name__}", type_=List[model])
+    content = asyncio.run(serialize_response(field=field, response_content=[model(**doc) for doc in docs]))
+    return JSONResponse(content).body
+
+
+def one_via_response_model(model, doc):
+    field = create_response_field(name=f"Response_{model.__name__}", type_=model)
+    return JSONResponse(asyncio.run(serialize_response(field=field, response_content=model(**doc)))).body
+
+
+def stored(model, **data):
+    return model(**data).dict()
+
+
+def test_direct_encoding_matches_response_model_bytes():
+    owner_id = str(uuid.uuid4())
+    cases = {
+        server.BusinessOwner: [stored(server.BusinessOwner, **owner_payload(first_name="Zoë", city="Malmö"))],
+        server.Employee: [
+            stored(server.Employee, **employee_payload(owner_id)),
+            stored(server.Employee, **employee_payload(owner_id, annual_salary=123456.78,
+                                                       has_current_health_insurance=False,
+                                                       current_health_premium=None)),
+        ],
+        server.Application: [
+            stored(server.Application, business_owner_id=owner_id),
+            stored(server.Application, business_owner_id=owner_id, status=server.ApplicationStatus.SUBMITTED,
+                   submitted_at=datetime(2025, 3, 1, 12, 30), notes="Résumé attached"),
+        ],
+    }
+    for model, docs in cases.items():
+        assert documents.documents_response(docs, model).body == via_response_model(model, docs), model.__name__
+        assert documents.document_response(docs[0], model).body == one_via_response_model(model, docs[0])
+
+
+def test_documents_missing_newer_fields_get_the_model_defaults():
+    calculation = stored(server.FICACalculation, business_owner_id=str(uuid.uuid4()), total_employee_salaries=60000.0,
+                         current_fica_tax=4590.0, projected_fica_savings=275.4, annual_savings=275.4,
+                         health_benefit_cost=3600.0, life_insurance_cost=0.0, net_savings=-3324.6)
+    # Written before engine_version and the employee FICA breakdown existed
+    legacy = {k: v for k, v in calculation.items() if k not in ("engine_version", "employee_fica_savings")}
+
+    assert documents.documents_response([legacy], server.FICACalculation).body \
+        == via_response_model(server.FICACalculation, [legacy])
+
+
+def test_extra_stored_fields_are_not_sent():
+    employee = {**stored(server.Employee, **employee_payload(str(uuid.uuid4()))), "_id": "internal", "legacy": 1}
+
+    assert documents.documents_response([employee], server.Employee).body \
+        == via_response_model(server.Employee, [employee])
@@ -0,0 +1,56 @@
+"""Stored eligibility results follow owner and roster writes"""
+import pytest
+
+import eligibility
+import server
+
+
+def stored_result(client, owner_id):
+    results = client.get("/api/eligibility", params={"limit": 1000}).json()
+    return next(result for result in results if result["business_owner_id"] == owner_id)
+
+
+@pytest.fixture
+def no_facts_aggregation(monkeypatch):
+    def unexpected(*args, **kwargs):
+        raise AssertionError("write path re-read eligibility facts")
+    monkeypatch.setattr(server.storage.eligibility, "facts", unexpected)
+
+
+def test_roster_writes_update_the_stored_result_from_the_rollup(client, make_owner, make_employee,
+                                                                no_facts_aggregation):
+    owner_id = make_owner()
+    assert stored_result(client, owner_id)["employee_count"] == 0
+
+    make_employee(owner_id)
+    assert stored_result(client, owner_id)["eligible"] is False
+    second = make_employee(owner_id)
+    result = stored_result(client, owner_id)
+    assert (result["eligible"], result["employee_count"]) == (True, eligibility.MIN_EMPLOYEES)
+    assert result["reasons"] == [eligibility.ALL_CRITERIA_MET]
+
+    client.delete(f"/api/employees/{second['id']}")
+    assert stored_result(client, owner_id)["eligible"] is False
+
+
+def test_import_updates_the_stored_result(client, make_owner, no_facts_aggregation):
+    owner_id = make_owner()
+    csv_body = "first_name,last_name,email,phone,job_title,annual_salary,hire_date,birth_date\n" + "".join(
+        f"E,{i},e{i}@example.com,555,Staff,40000,2021-01-01T00:00:00,1990-01-01T00:00:00\n" for i in range(3)
+    )
+    client.post(f"/api/employees/import/{owner_id}", files={"file": ("roster.csv", csv_body, "text/csv")})
+    result = stored_result(client, owner_id)
+    assert (result["eligible"], result["employee_count"]) == (True, 3)
+
+
+def test_rollup_rebuild_re_evaluates_eligibility(client, make_owner, make_employee):
+    owner_id = make_owner()
+    make_employee(owner_id)
+    make_employee(owner_id)
+    # A drifted rollup, stored eligibility included
+    server.storage.rollups.rollups[owner_id]["employee_count"] = 0
+    client.portal.call(server.evaluate_eligibility, [owner_id])
+    assert stored_result(client, owner_id)["eligible"] is False
+
+    client.portal.call(server.rebuild_all_roster_rollups)
+    assert stored_result(client, owner_id)["eligible"] is True
@@ -0,0 +1,78 @@
+"""Bulk employee import: valid rows are stored, invalid ones reported by row number"""
+import json
+import threading
+
+import server
+
+CSV_HEADER = "first_name,last_name,email,phone,job_title,annual_salary,hire_date,birth_date\n"
+
+
+def csv_row(email="emp@example.com", salary="55000"):
+    return f"Emp,Row,{email},555-0101,Staff,{salary},2020-01-15,1988-06-01\n"
+
+
+def upload(client, owner_id, body, file_name, **params):
+    return client.post(f"/api/employees/import/{owner_id}", files={"file": (file_name, body)}, params=params)
+
+
+def test_csv_rows_with_errors_are_reported_and_the_rest_imported(client, make_owner):
+    owner_id = make_owner()
+    body = CSV_HEADER + csv_row() + csv_row(email="not-an-email") + csv_row(salary="lots") + csv_row()
+    response = upload(client, owner_id, body, "roster.csv")
+
+    assert response.status_code == 200
+    result = response.json()
+    assert (result["total_rows"], result["imported"], result["failed"]) == (4, 2, 2)
+    # Row numbers are file lines, the header being line 1
+    assert [error["row"] for error in result["errors"]] == [3, 4]
+    assert result["errors"][0]["errors"][0].startswith("email:")
+    assert result["errors"][1]["errors"][0].startswith("annual_salary:")
+    assert len(client.get(f"/api/employees/business/{owner_id}").json()) == 2
+
+
+def test_ndjson_rows_that_are_not_objects_are_reported(client, make_owner):
+    owner_id = make_owner()
+    valid = {"first_name": "Emp", "last_name": "Row", "email": "emp@example.com", "phone": "555-0101",
+             "job_title": "Staff", "annual_salary": 55000, "hire_date": "2020-01-15", "birth_date": "1988-06-01"}
+    body = "\n".join([json.dumps(valid), "{not json", "", json.dumps([1, 2]), json.dumps({"first_name": "Only"})])
+    response = upload(client, owner_id, body, "roster.ndjson")
+
+    result = response.json()
+    assert (result["total_rows"], result["imported"], result["failed"]) == (4, 1, 3)
+    errors = {error["row"]: error["errors"] for error in result["errors"]}
+    assert list(errors) == [2, 4, 5]
+    assert errors[2][0].startswith("Invalid JSON")
+    assert errors[4] == ["Row must be an object"]
+    assert any(message.startswith("last_name:") for message in errors[5])
+
+
+def test_error_list_is_capped_but_failures_are_all_counted(client, make_owner, monkeypatch):
+    monkeypatch.setattr(server, "EMPLOYEE_IMPORT_MAX_ERRORS", 2)
+    owner_id = make_owner()
+    body = CSV_HEADER + csv_row(salary="lots") * 5
+    result = upload(client, owner_id, body, "roster.csv").json()
+
+    assert (result["failed"], len(result["errors"])) == (5, 2)
+
+
+def test_rows_are_parsed_off_the_event_loop_one_batch_at_a_time(client, make_owner, monkeypatch):
+    monkeypatch.setattr(server, "EMPLOYEE_IMPORT_BATCH_SIZE", 2)
+    threads = []
+
+    class RecordingEmployeeCreate(server.EmployeeCreate):
+        def __init__(self, **data):
+            threads.append(threading.get_ident())
+            super().__init__(**data)
+    monkeypatch.setattr(server, "EmployeeCreate", RecordingEmployeeCreate)
+
+    owner_id = make_owner()
+    loop_thread = client.portal.call(threading.get_ident)
+    result = upload(client, owner_id, CSV_HEADER + csv_row() * 5, "roster.csv").json()
+
+    assert (result["total_rows"], result["imported"]) == (5, 5)
+    assert len(threads) == 5 and loop_thread not in threads
+    assert len(client.get(f"/api/employees/business/{owner_id}").json()) == 5
+
+
+def test_import_for_unknown_owner_is_404(client):
+    assert upload(client, "nope", CSV_HEADER + csv_row(), "roster.csv").status_code == 404
@@ -0,0 +1,45 @@
+"""Finished exports are served from storage, not from the disk of the worker that wrote them"""
+import csv
+import gzip
+import io
+import time
+from datetime import datetime, timedelta
+
+import exports
+import server
+
+
+def finished_export(client, body, timeout=5.0):
+    job_id = client.post("/api/exports", json=body).json()["id"]
+    deadline = time.monotonic() + timeout
+    while True:
+        job = client.get(f"/api/exports/{job_id}").json()
+        if job["state"] in ("completed", "failed") or time.monotonic() > deadline:
+            return job
+        time.sleep(0.02)
+
+
+def test_download_is_served_from_storage(client, make_owner, make_employee):
+    owner_id = make_owner()
+    employee = make_employee(owner_id)
+    job = finished_export(client, {"collection": "employees", "format": "csv", "business_owner_ids": [owner_id]})
+    assert job["state"] == "completed"
+    assert job["result"]["rows"] == 1
+    # The staging file is gone; only the stored copy remains
+    assert not (exports.EXPORT_DIR / job["result"]["file_name"]).exists()
+
+    download = client.get(f"/api/exports/{job['id']}/download")
+    assert download.status_code == 200
+    assert download.headers["content-type"] == "application/gzip"
+    assert job["result"]["file_name"] in download.headers["content-disposition"]
+    rows = list(csv.DictReader(io.StringIO(gzip.decompress(download.content).decode())))
+    assert [row["id"] for row in rows] == [employee["id"]]
+
+
+def test_pruned_export_is_gone(client, make_owner, make_employee):
+    owner_id = make_owner()
+    make_employee(owner_id)
+    job = finished_export(client, {"collection": "employees", "business_owner_ids": [owner_id]})
+    client.portal.call(server.storage.exports.prune, datetime.utcnow() + timedelta(seconds=1))
+
+    assert client.get(f"/api/exports/{job['id']}/download").status_code == 410
@@ -0,0 +1,92 @@
+"""FICA engine tax math: the Social Security wage base, additional Medicare and pre-tax caps"""
+import numpy as np
+import pytest
+
+import fica_engine
+
+
+def roster(*salaries, health_premium=None):
+    return fica_engine.Roster([
+        {
+            "id": str(index),
+            "annual_salary": salary,
+            "has_current_health_insurance": health_premium is not None,
+            "current_health_premium": health_premium,
+        }
+        for index, salary in enumerate(salaries)
+    ])
+
+
+def test_employer_social_security_stops_at_the_wage_base():
+    social_security, medicare = fica_engine.employer_fica(np.array([50_000.0, 176_100.0, 300_000.0, -10.0]))
+
+    assert social_security.tolist() == pytest.approx([3_100.0, 10_918.2, 10_918.2, 0.0])
+    # Medicare has no cap
+    assert medicare.tolist() == pytest.approx([725.0, 2_553.45, 4_350.0, 0.0])
+
+
+def test_employee_fica_adds_medicare_above_the_threshold():
+    taxes = fica_engine.employee_fica(np.array([200_000.0, 300_000.0]))
+
+    assert taxes.tolist() == pytest.approx([10_918.2 + 2_900.0, 10_918.2 + 4_350.0 + 900.0])
+
+
+def test_savings_across_the_wage_base_and_medicare_threshold():
+    # $500 a month moves $6,000 a year pre-tax for each employee
+    result = fica_engine.calculate(roster(250_000.0, 178_000.0, 60_000.0), health_monthly_premium=500.0,
+                                   include_breakdown=True)
+    by_id = {row["employee_id"]: row for row in result["employee_breakdown"]}
+
+    # Still above the wage base after the reduction: only Medicare is saved
+    assert by_id["0"]["social_security_savings"] == pytest.approx(0.0)
+    assert by_id["0"]["medicare_savings"] == pytest.approx(87.0)
+    assert by_id["0"]["employee_fica_savings"] == pytest.approx(87.0 + 54.0)
+    # Only the wages pushed below the wage base save Social Security
+    assert by_id["1"]["social_security_savings"] == pytest.approx((176_100.0 - 172_000.0) * 0.062)
+    assert by_id["1"]["employee_fica_savings"] == pytest.approx(254.2 + 87.0)
+    assert by_id["2"]["employer_fica_savings"] == pytest.approx(6_000.0 * 0.0765)
+
+    assert result["projected_fica_savings"] == pytest.approx(sum(row["employer_fica_savings"] for row in by_id.values()))
+    assert result["health_benefit_cost"] == pytest.approx(500.0 * 3 * 12)
+    # Largest employer savings first
+    assert [row["employee_id"] for row in result["employee_breakdown"]] == ["2", "1", "0"]
+
+
+def test_pretax_benefits_never_exceed_salary():
+    result = fica_engine.calculate(roster(3_000.0), health_monthly_premium=500.0)
+
+    assert result["total_pretax_benefits"] == pytest.approx(3_000.0)
+    assert result["projected_fica_savings"] == pytest.approx(result["current_fica_tax"])
+
+
+def test_no_plan_means_no_new_savings():
+    # Current premiums are already what they are; without a plan nothing new moves pre-tax
+    result = fica_engine.calculate(roster(60_000.0, health_premium=250.0))
+
+    assert result["total_pretax_benefits"] == 0.0
+    assert result["projected_fica_savings"] == 0.0
+    assert result["employee_fica_savings"] == 0.0
+    assert result["health_benefit_cost"] == 0.0
+
+
+def test_no_plan_calculation_reports_zero_savings_and_its_engine_version(client, make_owner, make_employee):
+    owner_id = make_owner()
+    make_employee(owner_id)
+
+    response = client.post(f"/api/fica-calculation/{owner_id}")
+    assert response.status_code == 200
+    body = response.json()
+    assert body["projected_fica_savings"] == 0.0
+    assert body["net_savings"] == 0.0
+    assert body["engine_version"] == fica_engine.ENGINE_VERSION
+
+
+def test_sweep_matches_single_calculations():
+    staff = roster(250_000.0, 178_000.0, 60_000.0, health_premium=100.0)
+    premiums = [None, 200.0, 800.0]
+    swept = fica_engine.sweep(staff, premiums, [None] * len(premiums))
+
+    for k, premium in enumerate(premiums):
+        single = fica_engine.calculate(staff, health_monthly_premium=premium)
+        assert swept["projected_fica_savings"][k] == pytest.approx(single["projected_fica_savings"])
+        assert swept["employee_fica_savings"][k] == pytest.approx(single["employee_fica_savings"])
@@ -0,0 +1,94 @@
+"""FICA calculations are memoized on the owner's roster version"""
+import server
+
+
+def calculate(client, owner_id, **params):
+    response = client.post(f"/api/fica-calculation/{owner_id}", params=params)
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def test_repeat_request_returns_stored_calculation_without_reading_roster(client, make_owner, make_employee,
+                                                                          monkeypatch):
+    owner_id = make_owner()
+    make_employee(owner_id)
+    first = calculate(client, owner_id)
+
+    async def unexpected_read(*args, **kwargs):
+        raise AssertionError("roster read on a memo hit")
+    monkeypatch.setattr(server.storage.employees, "roster", unexpected_read)
+
+    assert calculate(client, owner_id)["id"] == first["id"]
+
+
+def test_plan_selection_is_part_of_the_memo_key(client, make_owner, make_employee):
+    owner_id = make_owner()
+    make_employee(owner_id)
+    plan_id = client.get("/api/benefit-plans").json()[0]["id"]
+
+    without_plan = calculate(client, owner_id)
+    with_plan = calculate(client, owner_id, health_plan_id=plan_id)
+    assert with_plan["id"] != without_plan["id"]
+    assert calculate(client, owner_id, health_plan_id=plan_id)["id"] == with_plan["id"]
+
+
+def test_creating_an_employee_invalidates_the_memo(client, make_owner, make_employee):
+    owner_id = make_owner()
+    make_employee(owner_id, annual_salary=50000.0)
+    first = calculate(client, owner_id)
+
+    make_employee(owner_id, annual_salary=70000.0)
+    second = calculate(client, owner_id)
+    assert second["id"] != first["id"]
+    assert second["total_employee_salaries"] == 120000.0
+
+
+def test_deleting_an_employee_invalidates_the_memo(client, make_owner, make_employee):
+    owner_id = make_owner()
+    make_employee(owner_id, annual_salary=50000.0)
+    removed = make_employee(owner_id, annual_salary=70000.0)
+    first = calculate(client, owner_id)
+
+    assert client.delete(f"/api/employees/{removed['id']}").status_code == 200
+    second = calculate(client, owner_id)
+    assert second["id"] != first["id"]
+    assert second["total_employee_salaries"] == 50000.0
+
+
+def test_importing_employees_invalidates_the_memo(client, make_owner, make_employee):
+    owner_id = make_owner()
+    make_employee(owner_id, annual_salary=50000.0)
+    first = calculate(client, owner_id)
+
+    csv_body = (
+        "first_name,last_name,email,phone,job_title,annual_salary,hire_date,birth_date\n"
+        "Imp,Orted,imp@example.com,555-0102,Staff,30000,2021-01-01T00:00:00,1990-01-01T00:00:00\n"
+    )
+    response = client.post(f"/api/employees/import/{owner_id}",
+                           files={"file": ("roster.csv", csv_body, "text/csv")})
+    assert response.json()["imported"] == 1
+    assert calculate(client, owner_id)["total_employee_salaries"] == 80000.0
+    assert calculate(client, owner_id)["id"] != first["id"]
+
+
+def test_unknown_owner_and_empty_roster(client, make_owner):
+    assert client.post("/api/fica-calculation/missing-owner").status_code == 404
+    assert client.post(f"/api/fica-calculation/{make_owner()}").status_code == 400
+
+
+def test_batch_recalculation_reuses_memoized_results(client, make_owner, make_employee):
+    calculated, changed = make_owner(), make_owner()
+    make_employee(calculated)
+    make_employee(changed)
+    calculate(client, calculated)
+    calculate(client, changed)
+    make_employee(changed)
+
+    job = client.post("/api/fica-calculation/batch", json={"owner_ids": [calculated, changed]}).json()
+    for _ in range(100):
+        job = client.get(f"/api/fica-calculation/batch/{job['id']}").json()
+        if job["state"] in ("completed", "failed"):
+            break
+    assert job["state"] == "completed", job
+    assert job["result"]["calculations_reused"] == 1
+    assert job["result"]["calculations_written"] == 1
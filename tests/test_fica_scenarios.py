@@ -0,0 +1,37 @@
+"""Scenario ranking: plans are charged only for the cost above the premiums they replace"""
+import pytest
+
+
+def compare(client, owner_id, **params):
+    response = client.post(f"/api/fica-calculation/{owner_id}/scenarios", params=params)
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def test_plan_cheaper_than_current_coverage_beats_keeping_it(client, make_owner, make_employee):
+    owner_id = make_owner()
+    for _ in range(3):
+        make_employee(owner_id, current_health_premium=600.0)
+
+    comparison = compare(client, owner_id, select=1)
+    best = comparison["scenarios"][0]
+    baseline = next(scenario for scenario in comparison["scenarios"]
+                    if scenario["health_plan_id"] is None and scenario["life_plan_id"] is None)
+
+    assert best["health_plan_id"] is not None
+    assert best["replaced_premiums"] == pytest.approx(600.0 * 3 * 12)
+    assert best["net_savings"] == pytest.approx(
+        best["projected_fica_savings"]
+        - (best["health_benefit_cost"] + best["life_insurance_cost"] - best["replaced_premiums"])
+    )
+    assert best["net_savings"] > baseline["net_savings"] == 0.0
+    assert comparison["selected_calculation"]["projected_fica_savings"] == pytest.approx(best["projected_fica_savings"])
+
+
+def test_lines_without_a_plan_replace_nothing(client, make_owner, make_employee):
+    owner_id = make_owner()
+    make_employee(owner_id, current_health_premium=600.0)
+
+    for scenario in compare(client, owner_id)["scenarios"]:
+        expected = 600.0 * 12 if scenario["health_plan_id"] is not None else 0.0
+        assert scenario["replaced_premiums"] == pytest.approx(expected)
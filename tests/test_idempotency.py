@@ -0,0 +1,74 @@
+"""Idempotency-Key: repeats replay the first response, conflicting reuse is rejected"""
+import uuid
+from datetime import datetime, timedelta
+
+import idempotency
+import server
+from tests.conftest import employee_payload, owner_payload
+
+
+def post(client, url, body, key):
+    return client.post(url, json=body, headers={"Idempotency-Key": key})
+
+
+def test_repeat_replays_the_first_response(client):
+    key = uuid.uuid4().hex
+    body = owner_payload()
+    first = post(client, "/api/business-owners", body, key)
+    repeat = post(client, "/api/business-owners", body, key)
+
+    assert first.status_code == repeat.status_code == 200
+    assert "Idempotent-Replayed" not in first.headers
+    assert repeat.headers["Idempotent-Replayed"] == "true"
+    assert repeat.json() == first.json()
+    # No second owner was created under the same business name
+    owners = client.get("/api/business-owners", params={"limit": 1000}).json()
+    assert [owner["id"] for owner in owners if owner["business_name"] == body["business_name"]] == [first.json()["id"]]
+
+
+def test_same_key_with_a_different_body_is_422(client):
+    key = uuid.uuid4().hex
+    assert post(client, "/api/business-owners", owner_payload(), key).status_code == 200
+
+    response = post(client, "/api/business-owners", owner_payload(), key)
+    assert response.status_code == 422
+    assert "different request" in response.json()["detail"]
+
+
+def test_repeat_while_the_first_is_running_is_409(client):
+    key = uuid.uuid4().hex
+    body = owner_payload()
+    now = datetime.utcnow()
+    # The first request has claimed the key and not yet finished
+    client.portal.call(server.storage.idempotency.claim, {
+        "scope": "create_business_owner",
+        "key": key,
+        "request_fingerprint": idempotency.request_fingerprint(server.BusinessOwnerCreate(**body)),
+        "state": "in_progress",
+        "response": None,
+        "created_at": now,
+        "lease_expires_at": now + timedelta(minutes=1),
+        "expires_at": now + timedelta(hours=1),
+    }, now)
+
+    response = post(client, "/api/business-owners", body, key)
+    assert response.status_code == 409
+    assert response.headers["Retry-After"] == "1"
+
+
+def test_failed_request_releases_its_key(client):
+    key = uuid.uuid4().hex
+    body = employee_payload("no-such-owner")
+    assert post(client, "/api/employees", body, key).status_code == 404
+    # Not replayed and not held as in progress: the retry runs again
+    assert post(client, "/api/employees", body, key).status_code == 404
+
+
+def test_keys_are_scoped_per_endpoint(client, make_owner):
+    key = uuid.uuid4().hex
+    owner_id = make_owner()
+    assert post(client, "/api/employees", employee_payload(owner_id), key).status_code == 200
+
+    response = post(client, "/api/applications", {"business_owner_id": owner_id}, key)
+    assert response.status_code == 200
+    assert "Idempotent-Replayed" not in response.headers
@@ -0,0 +1,68 @@
+"""Job records are stored, so a poll answered by another API worker still finds the job"""
+import asyncio
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+import server
+from jobs import JobRegistry, JobState
+from storage.memory import MemoryJobRepository
+
+
+def wait_for(client, url, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while True:
+        job = client.get(url).json()
+        if job["state"] in ("completed", "failed") or time.monotonic() > deadline:
+            return job
+        time.sleep(0.02)
+
+
+def test_batch_job_is_found_by_a_worker_that_did_not_run_it(client, make_owner, make_employee):
+    owner_id = make_owner()
+    make_employee(owner_id)
+    job_id = client.post("/api/fica-calculation/batch", json={"owner_ids": [owner_id, "nope"]}).json()["id"]
+    finished = wait_for(client, f"/api/fica-calculation/batch/{job_id}")
+    assert finished["state"] == "completed"
+
+    # Another worker's registry holds no task or in-memory record for the job
+    other_worker = JobRegistry(server.storage.jobs)
+    stored = client.portal.call(other_worker.get, job_id)
+    assert stored.state == JobState.COMPLETED
+    assert stored.result == finished["result"]
+    assert stored.result["missing_owner_ids"] == ["nope"]
+    assert client.portal.call(other_worker.get, "unknown") is None
+
+
+def test_running_job_progress_is_stored():
+    store = MemoryJobRepository()
+    registry = JobRegistry(store, progress_interval=0.01)
+
+    async def scenario():
+        release = asyncio.Event()
+
+        async def runner(job):
+            job.total = 10
+            job.processed = 4
+            await release.wait()
+            job.processed = 10
+
+        job = registry.start(await registry.create("test"), runner)
+        await asyncio.sleep(0.05)
+        running = await store.get(job.id)
+        release.set()
+        await asyncio.sleep(0.01)
+        return running, await store.get(job.id)
+
+    running, finished = asyncio.run(scenario())
+    assert (running["state"], running["processed"], running["expires_at"]) == (JobState.RUNNING, 4, None)
+    assert (finished["state"], finished["processed"]) == (JobState.COMPLETED, 10)
+    assert finished["expires_at"] > datetime.utcnow()
+
+
+@pytest.mark.parametrize("offset, found", [(timedelta(hours=1), True), (-timedelta(seconds=1), False)])
+def test_finished_records_expire(offset, found):
+    store = MemoryJobRepository()
+    asyncio.run(store.put({"id": "job", "expires_at": datetime.utcnow() + offset}))
+    assert (asyncio.run(store.get("job")) is not None) is found
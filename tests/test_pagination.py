@@ -0,0 +1,65 @@
+"""Keyset pages continue from the cursor without skipping or repeating rows"""
+import json
+
+
+def walk(client, url, limit):
+    """Every page of `url` by following X-Next-Cursor; returns the pages of ids"""
+    pages = []
+    params = {"limit": limit}
+    while True:
+        response = client.get(url, params=params)
+        assert response.status_code == 200
+        pages.append([row["id"] for row in response.json()])
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            return pages
+        assert 'rel="next"' in response.headers["Link"]
+        params = {"limit": limit, "cursor": cursor}
+
+
+def test_pages_cover_every_row_once_in_order(client, make_owner, make_employee):
+    owner_id = make_owner()
+    created = [make_employee(owner_id)["id"] for _ in range(7)]
+    url = f"/api/employees/business/{owner_id}"
+
+    pages = walk(client, url, 3)
+    assert [len(page) for page in pages] == [3, 3, 1]
+    assert [employee_id for page in pages for employee_id in page] == created
+
+
+def test_rows_written_between_pages_are_not_skipped_or_repeated(client, make_owner, make_employee):
+    owner_id = make_owner()
+    created = [make_employee(owner_id)["id"] for _ in range(4)]
+    url = f"/api/employees/business/{owner_id}"
+    first = client.get(url, params={"limit": 2})
+
+    created.append(make_employee(owner_id)["id"])
+    rest = client.get(url, params={"limit": 10, "cursor": first.headers["X-Next-Cursor"]})
+
+    assert [row["id"] for row in first.json() + rest.json()] == created
+    assert "X-Next-Cursor" not in rest.headers
+
+
+def test_exact_final_page_has_no_next_cursor(client, make_owner, make_employee):
+    owner_id = make_owner()
+    for _ in range(4):
+        make_employee(owner_id)
+
+    assert [len(page) for page in walk(client, f"/api/employees/business/{owner_id}", 2)] == [2, 2]
+
+
+def test_ndjson_stream_resumes_from_a_cursor(client, make_owner, make_employee):
+    owner_id = make_owner()
+    created = [make_employee(owner_id)["id"] for _ in range(5)]
+    url = f"/api/employees/business/{owner_id}"
+    cursor = client.get(url, params={"limit": 2}).headers["X-Next-Cursor"]
+
+    response = client.get(url, params={"cursor": cursor}, headers={"Accept": "application/x-ndjson"})
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    assert [json.loads(line)["id"] for line in response.text.splitlines()] == created[2:]
+
+
+def test_invalid_cursor_is_400(client, make_owner):
+    owner_id = make_owner()
+    response = client.get(f"/api/employees/business/{owner_id}", params={"cursor": "not-a-cursor"})
+    assert response.status_code == 400
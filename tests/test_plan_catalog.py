@@ -0,0 +1,81 @@
+"""Benefit plan catalog cache: served from memory, reloaded on writes and after its TTL"""
+import asyncio
+from datetime import datetime, timedelta
+
+import server
+from plan_catalog import PlanCatalog
+
+
+def plan(plan_id, plan_type="health_basic", is_active=True, minutes=0, premium=100.0):
+    return server.BenefitPlan(
+        id=plan_id, name=f"Plan {plan_id}", plan_type=plan_type, description="",
+        monthly_premium_per_employee=premium, is_active=is_active,
+        created_at=datetime(2025, 1, 1) + timedelta(minutes=minutes),
+    ).dict()
+
+
+def counting_catalog(docs, ttl_seconds=300.0):
+    loads = []
+
+    async def loader():
+        loads.append(1)
+        return list(docs)
+    return PlanCatalog(loader, server.BenefitPlan, ttl_seconds=ttl_seconds), loads
+
+
+def test_catalog_loads_once_and_indexes_by_id_and_type():
+    docs = [plan("b", minutes=2), plan("a", minutes=1), plan("life", "life_basic"), plan("old", is_active=False)]
+    catalog, loads = counting_catalog(docs)
+
+    async def scenario():
+        return (await catalog.active(), await catalog.active("health_basic"), await catalog.get("old"),
+                await catalog.get("missing"))
+
+    active, health, inactive, missing = asyncio.run(scenario())
+    assert loads == [1]
+    assert [p.id for p in active] == ["life", "a", "b"]
+    assert [p.id for p in health] == ["a", "b"]
+    assert inactive.id == "old" and missing is None
+
+
+def test_invalidate_and_ttl_reload_and_change_the_version():
+    docs = [plan("a")]
+    catalog, loads = counting_catalog(docs)
+    expired, expired_loads = counting_catalog(docs, ttl_seconds=0)
+
+    async def scenario():
+        before = await catalog.version()
+        docs[0] = plan("a", premium=150.0)
+        cached = await catalog.version()
+        catalog.invalidate()
+        after = await catalog.version()
+        await expired.active()
+        await expired.active()
+        return before, cached, after
+
+    before, cached, after = asyncio.run(scenario())
+    assert before == cached != after
+    assert len(loads) == 2
+    assert len(expired_loads) == 2
+
+
+def test_concurrent_misses_share_one_load():
+    catalog, loads = counting_catalog([plan("a")])
+
+    async def scenario():
+        await asyncio.gather(*(catalog.active() for _ in range(10)))
+
+    asyncio.run(scenario())
+    assert loads == [1]
+
+
+def test_creating_a_plan_through_the_api_invalidates_the_catalog(client):
+    before = client.get("/api/benefit-plans")
+    created = client.post("/api/benefit-plans", json={
+        "name": "Cached Plan", "plan_type": "life_premium", "description": "",
+        "monthly_premium_per_employee": 90.0,
+    }).json()
+
+    after = client.get("/api/benefit-plans", headers={"If-None-Match": before.headers["ETag"]})
+    assert after.status_code == 200
+    assert created["id"] in [p["id"] for p in after.json()]
@@ -0,0 +1,19 @@
+"""Request profiling is opted into only with the token in the X-Profile header"""
+from profiling import ProfilingMiddleware
+
+
+def scope(headers=(), query_string=b""):
+    return {"type": "http", "headers": list(headers), "query_string": query_string}
+
+
+def test_token_in_the_header_requests_a_profile():
+    middleware = ProfilingMiddleware(app=None, token="secret")
+
+    assert middleware._requested(scope([(b"x-profile", b"secret")]))
+    assert not middleware._requested(scope([(b"x-profile", b"wrong")]))
+
+
+def test_token_in_the_query_string_is_ignored():
+    middleware = ProfilingMiddleware(app=None, token="secret")
+
+    assert not middleware._requested(scope(query_string=b"profile=secret"))
@@ -0,0 +1,76 @@
+"""Roster rollups: writes adjust them by $inc, a missing one is rebuilt from the employees"""
+import asyncio
+from datetime import datetime
+
+import pytest
+
+import server
+
+
+def rollup(client, owner_id):
+    return client.portal.call(server.storage.rollups.get, owner_id)
+
+
+def test_insert_and_delete_increment_the_rollup_without_a_rebuild(client, make_owner, make_employee, monkeypatch):
+    owner_id = make_owner()
+    deltas = []
+    increment = server.storage.rollups.increment
+
+    async def recording_increment(owner_id, delta, updated_at):
+        deltas.append(delta)
+        return await increment(owner_id, delta, updated_at)
+
+    async def no_rebuild(owner_id):
+        raise AssertionError("the rollup should be adjusted, not rebuilt")
+    monkeypatch.setattr(server.storage.rollups, "increment", recording_increment)
+    monkeypatch.setattr(server, "rebuild_roster_rollup", no_rebuild)
+
+    make_employee(owner_id, annual_salary=50_000.0, current_health_premium=200.0)
+    removed = make_employee(owner_id, annual_salary=70_000.0, has_current_life_insurance=True,
+                            current_life_premium=40.0)
+    after_inserts = rollup(client, owner_id)
+    assert client.delete(f"/api/employees/{removed['id']}").status_code == 200
+    after_delete = rollup(client, owner_id)
+
+    assert [delta["employee_count"] for delta in deltas] == [1, 1, -1]
+    assert deltas[2]["total_salaries"] == -70_000.0
+    assert (after_inserts["employee_count"], after_inserts["total_salaries"], after_inserts["life_insured_count"]) \
+        == (2, 120_000.0, 1)
+    assert (after_delete["employee_count"], after_delete["total_salaries"], after_delete["life_insured_count"],
+            after_delete["health_premium_total"]) == (1, 50_000.0, 0, 200.0)
+
+
+def test_missing_rollup_is_rebuilt_from_the_employees(client, make_owner, make_employee):
+    owner_id = make_owner()
+    make_employee(owner_id, annual_salary=40_000.0)
+    make_employee(owner_id, annual_salary=60_000.0)
+    # An owner created before rollups existed
+    del server.storage.rollups.rollups[owner_id]
+
+    summary = client.portal.call(server.get_roster_summary, owner_id)
+
+    assert (summary.employee_count, summary.total_salaries) == (2, 100_000.0)
+    assert rollup(client, owner_id)["employee_count"] == 2
+    # The next write increments the rebuilt rollup
+    del server.storage.rollups.rollups[owner_id]
+    make_employee(owner_id, annual_salary=10_000.0)
+    assert (rollup(client, owner_id)["employee_count"], rollup(client, owner_id)["total_salaries"]) == (3, 110_000.0)
+
+
+def test_mongo_increment_applies_the_delta_atomically():
+    mongomock_motor = pytest.importorskip("mongomock_motor")
+    from storage.mongo import MongoRosterRollupRepository
+
+    async def scenario():
+        repository = MongoRosterRollupRepository(mongomock_motor.AsyncMongoMockClient()["rollup_test"])
+        now = datetime.utcnow()
+        missing = await repository.increment("owner", {"employee_count": 1}, now)
+        await repository.put("owner", server.RosterSummary(employee_count=2, total_salaries=100.0).dict(), now)
+        added = await repository.increment("owner", {"employee_count": 1, "total_salaries": 50.0}, now)
+        removed = await repository.increment("owner", {"employee_count": -2, "total_salaries": -120.0}, now)
+        return missing, added, removed
+
+    missing, added, removed = asyncio.run(scenario())
+    assert missing is None
+    assert (added["employee_count"], added["total_salaries"]) == (3, 150.0)
+    assert (removed["employee_count"], removed["total_salaries"]) == (1, 30.0)
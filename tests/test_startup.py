@@ -0,0 +1,136 @@
+"""Startup: default plans are seeded once however often it runs, and readiness follows it"""
+import asyncio
+import uuid
+
+import pytest
+
+import server
+from storage.memory import MemoryBenefitPlanRepository
+
+
+def default_plans():
+    return [{**plan.dict(), "id": server.default_plan_id(plan)} for plan in server.DEFAULT_PLANS]
+
+
+def test_repeated_seeding_adds_nothing(client):
+    # The session's startup has seeded already
+    before = client.get("/api/benefit-plans").json()
+    client.portal.call(server.seed_benefit_plans)
+    client.portal.call(server.seed_benefit_plans)
+    after = client.get("/api/benefit-plans").json()
+
+    assert sorted(plan["id"] for plan in after) == sorted(plan["id"] for plan in before)
+    assert {plan["id"] for plan in after} >= {plan["id"] for plan in default_plans()}
+
+
+def test_plan_ids_are_the_same_on_every_worker():
+    plan = server.DEFAULT_PLANS[0]
+    assert server.default_plan_id(plan) == server.default_plan_id(plan.model_copy())
+    assert len({plan["id"] for plan in default_plans()}) == len(server.DEFAULT_PLANS)
+
+
+def test_plans_stored_under_other_ids_are_not_duplicated():
+    repository = MemoryBenefitPlanRepository()
+    existing = {**default_plans()[0], "id": str(uuid.uuid4())}
+
+    async def scenario():
+        await repository.insert(existing)
+        return await repository.seed(default_plans()), await repository.seed(default_plans())
+
+    assert asyncio.run(scenario()) == (len(server.DEFAULT_PLANS) - 1, 0)
+    assert asyncio.run(repository.count()) == len(server.DEFAULT_PLANS)
+
+
+def test_concurrent_seeding_on_mongo_stores_each_plan_once():
+    mongomock_motor = pytest.importorskip("mongomock_motor")
+    import indexes
+    from storage.mongo import MongoBenefitPlanRepository
+
+    async def scenario():
+        db = mongomock_motor.AsyncMongoMockClient()["seed_test"]
+        await db.benefit_plans.create_indexes(indexes.INDEX_SPECS["benefit_plans"])
+        repository = MongoBenefitPlanRepository(db)
+        added = await asyncio.gather(repository.seed(default_plans()), repository.seed(default_plans()))
+        return sum(added), await repository.count()
+
+    assert asyncio.run(scenario()) == (len(server.DEFAULT_PLANS), len(server.DEFAULT_PLANS))
+
+
+def test_ready_reports_startup_phases(client):
+    response = client.get("/api/ready")
+    assert response.status_code == 200
+    assert list(response.json()["startup_seconds"]) == ["imports", "connect", "indexes", "seed", "warmup"]
+
+
+def test_not_ready_once_shutdown_begins(client, monkeypatch):
+    monkeypatch.setattr(server.app.state, "ready", False)
+    response = client.get("/api/ready")
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+
+
+def changed_index_db(mongomock_motor):
+    """A mongomock database whose leads.created_at_desc index has an old definition"""
+    import indexes
+    from pymongo import ASCENDING, IndexModel
+
+    async def setup():
+        db = mongomock_motor.AsyncMongoMockClient()[f"index_test_{uuid.uuid4().hex}"]
+        await db.leads.create_indexes([IndexModel([("created_at", ASCENDING)], name="created_at_desc")])
+        return db
+    return indexes, asyncio.run(setup())
+
+
+def index_keys(db, collection_name, name):
+    async def read():
+        async for index in db[collection_name].list_indexes():
+            if index["name"] == name:
+                return list(index["key"].items())
+    return asyncio.run(read())
+
+
+def test_startup_only_creates_missing_indexes():
+    mongomock_motor = pytest.importorskip("mongomock_motor")
+    indexes, db = changed_index_db(mongomock_motor)
+
+    created = asyncio.run(indexes.ensure_indexes(db))
+
+    assert created["leads"] == ["id_unique"]
+    # The changed definition is left for `manage.py ensure-indexes`
+    assert index_keys(db, "leads", "created_at_desc") == [("created_at", 1)]
+
+
+def test_rebuild_replaces_changed_indexes_and_tolerates_a_concurrent_drop(monkeypatch):
+    mongomock_motor = pytest.importorskip("mongomock_motor")
+    from pymongo.errors import OperationFailure
+    indexes, db = changed_index_db(mongomock_motor)
+    collection_type = type(db.leads)
+    drop_index = collection_type.drop_index
+
+    async def dropped_by_another_worker(self, name):
+        await drop_index(self, name)
+        raise OperationFailure("index not found", code=indexes.INDEX_NOT_FOUND)
+    monkeypatch.setattr(collection_type, "drop_index", dropped_by_another_worker)
+
+    created = asyncio.run(indexes.ensure_indexes(db, rebuild=True))
+
+    assert sorted(created["leads"]) == ["created_at_desc", "id_unique"]
+    assert index_keys(db, "leads", "created_at_desc") == [("created_at", -1), ("id", -1)]
+
+
+def test_indexes_created_concurrently_are_not_an_error(monkeypatch):
+    mongomock_motor = pytest.importorskip("mongomock_motor")
+    from pymongo.errors import OperationFailure
+    indexes, db = changed_index_db(mongomock_motor)
+    collection_type = type(db.leads)
+    create_indexes = collection_type.create_indexes
+
+    async def raced(self, models):
+        if self.name == "leads" and len(models) > 1:
+            raise OperationFailure("index already exists", code=85)
+        return await create_indexes(self, models)
+    monkeypatch.setattr(collection_type, "create_indexes", raced)
+
+    asyncio.run(indexes.ensure_indexes(db, rebuild=True))
+
+    assert index_keys(db, "leads", "id_unique") == [("id", 1)]
@@ -0,0 +1,105 @@
+"""Write-behind buffer: batches by size or interval, retries failed writes, drains before shutdown"""
+import asyncio
+
+import pytest
+
+from write_buffer import BufferClosed, BufferFull, WriteBehindBuffer
+
+
+def recorder(failures=0):
+    """A write callable recording each batch, failing its first `failures` calls"""
+    batches, attempts = [], []
+
+    async def write(batch):
+        attempts.append([doc["n"] for doc in batch])
+        if len(attempts) <= failures:
+            raise RuntimeError("database unavailable")
+        batches.append([doc["n"] for doc in batch])
+    return write, batches, attempts
+
+
+async def wait_until(condition):
+    while not condition():
+        await asyncio.sleep(0.005)
+
+
+def test_full_batches_flush_without_waiting_for_the_interval():
+    write, batches, _ = recorder()
+
+    async def scenario():
+        buffer = WriteBehindBuffer("docs", write, batch_size=3, flush_interval=60)
+        buffer.start()
+        for n in range(6):
+            await buffer.offer({"n": n})
+        await asyncio.wait_for(wait_until(lambda: buffer.flushed == 6), timeout=1)
+        return buffer
+
+    buffer = asyncio.run(scenario())
+    assert batches == [[0, 1, 2], [3, 4, 5]]
+    assert (buffer.accepted, buffer.pending) == (6, 0)
+
+
+def test_partial_batch_flushes_after_the_interval():
+    write, batches, _ = recorder()
+
+    async def scenario():
+        buffer = WriteBehindBuffer("docs", write, batch_size=100, flush_interval=0.02)
+        buffer.start()
+        await buffer.offer({"n": 0})
+        await buffer.offer({"n": 1})
+        await asyncio.wait_for(wait_until(lambda: buffer.flushed == 2), timeout=1)
+
+    asyncio.run(scenario())
+    assert batches == [[0, 1]]
+
+
+def test_failed_write_is_retried_until_it_succeeds():
+    write, batches, attempts = recorder(failures=2)
+
+    async def scenario():
+        buffer = WriteBehindBuffer("docs", write, batch_size=2, flush_interval=0.01, retry_delay=0.01)
+        buffer.start()
+        await buffer.offer({"n": 0})
+        await buffer.offer({"n": 1})
+        await asyncio.wait_for(wait_until(lambda: buffer.flushed == 2), timeout=1)
+        return buffer
+
+    buffer = asyncio.run(scenario())
+    # The same batch is retried, not dropped or split
+    assert attempts == [[0, 1]] * 3
+    assert batches == [[0, 1]]
+    assert buffer.pending == 0
+
+
+def test_drain_writes_everything_queued_and_then_refuses_more():
+    write, batches, _ = recorder()
+
+    async def scenario():
+        buffer = WriteBehindBuffer("docs", write, batch_size=100, flush_interval=60)
+        buffer.start()
+        for n in range(3):
+            await buffer.offer({"n": n})
+        await buffer.drain(timeout=1)
+        with pytest.raises(BufferClosed):
+            await buffer.offer({"n": 3})
+        return buffer
+
+    buffer = asyncio.run(scenario())
+    assert batches == [[0, 1, 2]]
+    assert buffer.flushed == 3
+
+
+def test_full_buffer_rejects_after_the_put_timeout():
+    write, _, _ = recorder()
+
+    async def scenario():
+        # Not started, so nothing makes room
+        buffer = WriteBehindBuffer("docs", write, max_size=1, put_timeout=0.01)
+        await buffer.offer({"n": 0})
+        with pytest.raises(BufferFull):
+            await buffer.offer({"n": 1})
+        return buffer
+
+    buffer = asyncio.run(scenario())
+    assert (buffer.accepted, buffer.rejected) == (1, 1)
+